@@ -0,0 +1,240 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+# Module Name:
+#
+#        codec.py
+#
+# Abstract:
+#
+#        Per-frame encode/decode cost of common SMB2 frames
+#
+
+"""
+Codec benchmark
+
+Reports the average cost in microseconds of serializing and parsing a
+single netbios frame for the most common SMB2 commands, and the memory
+held by a READ request waiting for its response.
+
+Usage::
+
+    python benchmarks/codec.py [iterations]
+"""
+
+from __future__ import print_function
+
+import array
+import struct
+import sys
+import timeit
+
+import pike.core as core
+import pike.netbios as netbios
+import pike.ntstatus as ntstatus
+import pike.smb2 as smb2
+
+FILE_ID = (0x200003900000115, 0x23900000001)
+N_DIR_ENTRIES = 32
+
+
+class BogusContext(object):
+    """Minimal connection stand-in used to resolve query directory requests"""
+
+    def __init__(self, request=None):
+        self.request = request
+
+    def get_request(self, message_id):
+        return self.request
+
+
+def request(cls, **attrs):
+    nb = netbios.Netbios()
+    smb_req = smb2.Smb2(nb)
+    smb_req.credit_charge = 1
+    smb_req.credit_request = 10
+    smb_req.message_id = 1
+    smb_req.tree_id = 1
+    smb_req.session_id = 0x1234
+    req = cls(smb_req)
+    for name, value in attrs.items():
+        setattr(req, name, value)
+    return nb
+
+
+def response(command, body):
+    header = struct.pack(
+        "<4sHHLHHLLQQQ16s",
+        b"\xfeSMB",
+        64,
+        1,
+        ntstatus.STATUS_SUCCESS,
+        command,
+        1,
+        smb2.SMB2_FLAGS_SERVER_TO_REDIR,
+        0,
+        1,
+        0xFEFF | 1 << 32,
+        0x1234,
+        b"\0" * 16,
+    )
+    packet = header + body
+    return array.array("B", struct.pack(">L", len(packet)) + packet)
+
+
+def dir_entries(count):
+    entries = b""
+    name = "file_name_0000.txt".encode("utf-16le")
+    for ix in range(count):
+        entry = struct.pack(
+            "<LLQQQQQQLLLBB24sHQ",
+            0,
+            ix,
+            1,
+            2,
+            3,
+            4,
+            4096,
+            8192,
+            smb2.FILE_ATTRIBUTE_ARCHIVE,
+            len(name),
+            0,
+            0,
+            0,
+            b"\0" * 24,
+            0,
+            ix,
+        )
+        entry += name
+        if ix < count - 1:
+            entry += b"\0" * (-len(entry) % 8)
+            entry = struct.pack("<L", len(entry)) + entry[4:]
+        entries += entry
+    return entries
+
+
+def encoders():
+    frames = {
+        "READ request": request(
+            smb2.ReadRequest, length=65536, offset=0, file_id=FILE_ID
+        ),
+        "WRITE request (4k)": request(
+            smb2.WriteRequest, offset=0, file_id=FILE_ID, buffer=b"\xa5" * 4096
+        ),
+        "CREATE request": request(
+            smb2.CreateRequest, name="dir\\subdir\\file.txt", desired_access=0x1
+        ),
+        "QUERY_DIRECTORY request": request(
+            smb2.QueryDirectoryRequest,
+            file_id=FILE_ID,
+            file_name="*",
+            file_information_class=smb2.FILE_ID_BOTH_DIR_INFORMATION,
+            output_buffer_length=65536,
+        ),
+    }
+    encoders = dict((name, nb.serialize) for name, nb in frames.items())
+
+    pool = core.BufferPool()
+    write_64k = request(
+        smb2.WriteRequest, offset=0, file_id=FILE_ID, buffer=b"\xa5" * 65536
+    )
+
+    def pooled():
+        pool.put(write_64k.serialize(pool))
+
+    encoders["WRITE request (64k)"] = write_64k.serialize
+    encoders["WRITE request (64k, pooled)"] = pooled
+    return encoders
+
+
+def decoders():
+    read_buf = response(
+        smb2.SMB2_READ, struct.pack("<HBBLLL", 17, 80, 0, 4096, 0, 0) + b"\xa5" * 4096
+    )
+    write_buf = response(smb2.SMB2_WRITE, struct.pack("<HHLLHH", 17, 0, 4096, 0, 0, 0))
+    create_buf = response(
+        smb2.SMB2_CREATE,
+        struct.pack(
+            "<HBBLQQQQQQLLQQLL",
+            89,
+            0,
+            0,
+            1,
+            1,
+            2,
+            3,
+            4,
+            4096,
+            8192,
+            smb2.FILE_ATTRIBUTE_ARCHIVE,
+            0,
+            FILE_ID[0],
+            FILE_ID[1],
+            0,
+            0,
+        )
+        + b"\0" * 8,
+    )
+    entries = dir_entries(N_DIR_ENTRIES)
+    query_buf = response(
+        smb2.SMB2_QUERY_DIRECTORY, struct.pack("<HHL", 9, 72, len(entries)) + entries
+    )
+    query_req = request(
+        smb2.QueryDirectoryRequest,
+        file_information_class=smb2.FILE_ID_BOTH_DIR_INFORMATION,
+    )[0]
+
+    def parse(buf, context=None, lazy_decode=False):
+        return lambda: netbios.Netbios(context=context, lazy_decode=lazy_decode).parse(
+            buf
+        )
+
+    return {
+        "READ response (4k)": parse(read_buf),
+        "WRITE response": parse(write_buf),
+        "CREATE response": parse(create_buf),
+        "QUERY_DIRECTORY response (%d entries)"
+        % N_DIR_ENTRIES: parse(query_buf, BogusContext(query_req)),
+        "QUERY_DIRECTORY response (lazy)": parse(
+            query_buf, BogusContext(query_req), lazy_decode=True
+        ),
+    }
+
+
+def read_request_size(count):
+    """Return the bytes allocated per serialized READ request"""
+    import tracemalloc
+
+    tracemalloc.start()
+    frames = [
+        request(smb2.ReadRequest, length=65536, offset=0, file_id=FILE_ID)
+        for _ in range(count)
+    ]
+    for nb in frames:
+        nb.serialize()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return allocated / float(count)
+
+
+def main(iterations=20000):
+    for label, table in (("encode", encoders()), ("decode", decoders())):
+        for name, fn in sorted(table.items()):
+            elapsed = min(timeit.repeat(fn, number=iterations, repeat=3))
+            print(
+                "{:7} {:38} {:8.2f} us/frame".format(
+                    label, name, elapsed / iterations * 1e6
+                )
+            )
+    if sys.version_info >= (3, 4):
+        print(
+            "{:7} {:38} {:8.0f} bytes/request".format(
+                "memory", "READ request", read_request_size(iterations)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,149 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+# Module Name:
+#
+#        credits.py
+#
+# Abstract:
+#
+#        Credit window growth on a fresh connection
+#
+
+
+"""
+Credit policy benchmark
+
+Queues requests charged like 1 MiB reads on a fresh
+L{pike.model.Connection}.  A local server answers each request after a
+fixed round trip time, granting the credits asked for up to a total
+limit.  For each L{pike.model.CreditPolicy} reports the time until the
+requests in flight use the server's full credit limit and the request
+rate over the whole run.
+
+Usage::
+
+    python benchmarks/credits.py [requests] [rtt_ms] [limit]
+"""
+
+from __future__ import print_function
+
+import collections
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+
+import pike.model as model
+import pike.netbios as netbios
+import pike.ntstatus as ntstatus
+import pike.smb2 as smb2
+import pike.transport as transport
+
+# credits charged for a 1 MiB read
+CHARGE = (1 << 20) // smb2.BYTES_PER_CREDIT
+
+
+def echo_response(message_id, charge, grant):
+    nb = netbios.Netbios()
+    smb_res = smb2.Smb2(nb)
+    smb_res.credit_charge = charge
+    smb_res.credit_response = grant
+    smb_res.status = ntstatus.STATUS_SUCCESS
+    smb_res.message_id = message_id
+    smb_res.flags = smb2.SMB2_FLAGS_SERVER_TO_REDIR
+    smb2.EchoResponse(smb_res)
+    return nb.serialize().tobytes()
+
+
+def serve(listener, rtt, limit):
+    """Answer each request after rtt seconds, granting up to limit credits"""
+    sock, _ = listener.accept()
+    pending = collections.deque()
+    data = b""
+    # credits granted to the client and not yet charged
+    balance = 0
+    while True:
+        timeout = max(pending[0][0] - time.time(), 0) if pending else None
+        if select.select([sock], [], [], timeout)[0]:
+            received = sock.recv(1 << 20)
+            if not received:
+                break
+            data += received
+            while len(data) >= 4:
+                size = 4 + struct.unpack(">L", data[:4])[0]
+                if len(data) < size:
+                    break
+                charge, request = struct.unpack_from("<2xH6xH", data, 8)
+                (message_id,) = struct.unpack_from("<Q", data, 28)
+                data = data[size:]
+                balance -= charge
+                grant = max(min(request, limit - balance), 0)
+                balance += grant
+                response = echo_response(message_id, charge, grant)
+                pending.append((time.time() + rtt, response))
+        now = time.time()
+        out = []
+        while pending and pending[0][0] <= now:
+            out.append(pending.popleft()[1])
+        if out:
+            sock.sendall(b"".join(out))
+    sock.close()
+
+
+def measure(policy, requests, rtt, limit):
+    """Return (seconds to full window or None, seconds for all requests)"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    server = threading.Thread(target=serve, args=(listener, rtt, limit))
+    server.start()
+    poller = transport.new_poller()
+    client = model.Client(poller=poller)
+    conn = model.Connection(client, "127.0.0.1", listener.getsockname()[1])
+    conn.connection_future.wait(timeout=5)
+    conn.credit_policy = policy
+    futures = []
+    start = time.time()
+    with conn.batch():
+        for _ in range(requests):
+            smb_req = conn.request()
+            smb_req.credit_charge = CHARGE
+            smb2.EchoRequest(smb_req)
+            futures.extend(conn.submit(smb_req.parent))
+    full = None
+    while not futures[-1].response:
+        poller.poll(1)
+        if full is None and len(conn._future_map) * CHARGE >= limit * 0.9:
+            full = time.time() - start
+    elapsed = time.time() - start
+    conn.close()
+    server.join()
+    listener.close()
+    return full, elapsed
+
+
+def main(requests=2000, rtt_ms=2, limit=512):
+    rtt = rtt_ms / 1000.0
+    print(
+        "{} requests of {} credits, {} ms round trip, {} credit limit".format(
+            requests, CHARGE, rtt_ms, limit
+        )
+    )
+    for policy in (model.CreditPolicy(), model.AdaptiveCreditPolicy()):
+        full, elapsed = measure(policy, requests, rtt, limit)
+        print(
+            "{:22} {:>14} to full window {:10.0f} requests/s".format(
+                type(policy).__name__,
+                "never" if full is None else "{:.1f} ms".format(full * 1e3),
+                requests / elapsed,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,85 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+# Module Name:
+#
+#        enums.py
+#
+# Abstract:
+#
+#        Cost of enum construction and of decoding an SMB2 header
+#
+
+"""
+Enum benchmark
+
+Reports the average cost in microseconds of enum attribute access,
+enum construction from a value, and Smb2._decode of a bare header
+(ECHO response), which builds several enums per frame.
+
+Usage::
+
+    python benchmarks/enums.py [iterations]
+"""
+
+from __future__ import print_function
+
+import array
+import struct
+import sys
+import timeit
+
+import pike.core as core
+import pike.ntstatus as ntstatus
+import pike.smb2 as smb2
+
+
+def echo_response():
+    header = struct.pack(
+        "<4sHHLHHLLQQQ16s",
+        b"\xfeSMB",
+        64,
+        1,
+        ntstatus.STATUS_SUCCESS,
+        smb2.SMB2_ECHO,
+        1,
+        smb2.SMB2_FLAGS_SERVER_TO_REDIR | smb2.SMB2_FLAGS_SIGNED,
+        0,
+        1,
+        0xFEFF,
+        0x1234,
+        b"\0" * 16,
+    )
+    return array.array("B", header + struct.pack("<HH", 4, 0))
+
+
+def cases():
+    buf = echo_response()
+    access = smb2.FILE_READ_DATA | smb2.FILE_WRITE_DATA | smb2.DELETE | smb2.SYNCHRONIZE
+
+    def decode_header():
+        cur = core.Cursor(buf, 0)
+        smb2.Smb2(None).decode(cur)
+
+    return [
+        ("attribute Flags.SMB2_FLAGS_SIGNED", lambda: smb2.Flags.SMB2_FLAGS_SIGNED),
+        ("construct CommandId(SMB2_READ)", lambda: smb2.CommandId(8)),
+        ("construct Flags(0x9)", lambda: smb2.Flags(0x9)),
+        ("construct Status(STATUS_PENDING)", lambda: ntstatus.Status(0x103)),
+        ("validate Access mask", lambda: smb2.Access.validate(access)),
+        ("Access | Access", lambda: smb2.GENERIC_READ | smb2.GENERIC_WRITE),
+        ("str(Access)", lambda: str(access)),
+        ("Smb2._decode (ECHO response)", decode_header),
+    ]
+
+
+def main(iterations=100000):
+    for name, fn in cases():
+        elapsed = min(timeit.repeat(fn, number=iterations, repeat=3))
+        print("{:38} {:8.3f} us".format(name, elapsed / iterations * 1e6))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,83 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+# Module Name:
+#
+#        imports.py
+#
+# Abstract:
+#
+#        Import time of pike modules in a fresh interpreter
+#
+
+"""
+Import time benchmark
+
+Imports each module in a fresh interpreter and reports the best
+wall-clock time in milliseconds against its budget.  Bytecode is
+compiled beforehand so only the cost of executing the modules is
+measured.  The exit status is non-zero when any module exceeds its
+budget.
+
+Usage::
+
+    python benchmarks/imports.py [runs]
+"""
+
+from __future__ import print_function
+
+import compileall
+import os
+import subprocess
+import sys
+
+import pike
+
+# Budgets in milliseconds for a warm bytecode cache
+BUDGETS = [
+    ("pike", 10),
+    ("pike.core", 15),
+    ("pike.smb2", 40),
+    ("pike.model", 100),
+]
+
+SNIPPET = """
+import time
+start = time.perf_counter()
+import {0}
+print(time.perf_counter() - start)
+"""
+
+
+def import_time(module, runs):
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    best = None
+    for _ in range(runs):
+        out = subprocess.check_output(
+            [sys.executable, "-c", SNIPPET.format(module)], env=env
+        )
+        elapsed = float(out) * 1e3
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(runs=10):
+    compileall.compile_dir(os.path.dirname(pike.__file__), quiet=1)
+    over = False
+    for module, budget in BUDGETS:
+        elapsed = import_time(module, runs)
+        status = "ok" if elapsed <= budget else "OVER BUDGET"
+        over = over or elapsed > budget
+        print(
+            "{:12} {:8.1f} ms (budget {:3} ms) {}".format(
+                module, elapsed, budget, status
+            )
+        )
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
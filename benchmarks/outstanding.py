@@ -0,0 +1,171 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+# Module Name:
+#
+#        outstanding.py
+#
+# Abstract:
+#
+#        Request bookkeeping cost against the number of outstanding requests
+#
+
+"""
+Outstanding request benchmark
+
+Queues a number of echo requests on a L{pike.model.Connection} and
+reports the cost in microseconds per request of each bookkeeping step:
+submitting, cancelling a queued request by message id, sending the
+queue, dispatching interim responses, cancelling by async id and
+dispatching final responses.  The costs should not grow with the number
+of outstanding requests.
+
+Usage::
+
+    python benchmarks/outstanding.py [requests...]
+"""
+
+from __future__ import print_function
+
+import array
+import gc
+import socket
+import struct
+import sys
+import threading
+import time
+
+import pike.model as model
+import pike.ntstatus as ntstatus
+import pike.smb2 as smb2
+import pike.transport as transport
+
+CANCELS = 1000
+
+
+def response(conn, message_id, async_id=None):
+    """Return a parsed echo response, interim if async_id is given"""
+    flags = smb2.SMB2_FLAGS_SERVER_TO_REDIR
+    status = ntstatus.STATUS_SUCCESS
+    body = struct.pack("<HH", 4, 0)
+    if async_id is None:
+        suffix = struct.pack("<LL", 0, 0)
+    else:
+        flags |= smb2.SMB2_FLAGS_ASYNC_COMMAND
+        status = ntstatus.STATUS_PENDING
+        suffix = struct.pack("<Q", async_id)
+        body = struct.pack("<HBBL", 9, 0, 0, 0) + b"\0"
+    header = (
+        struct.pack(
+            "<4sHHLHHLLQ",
+            b"\xfeSMB",
+            64,
+            1,
+            status,
+            smb2.SMB2_ECHO,
+            1,
+            flags,
+            0,
+            message_id,
+        )
+        + suffix
+        + struct.pack("<Q16s", 0, b"\0" * 16)
+    )
+    frame = struct.pack(">L", len(header) + len(body)) + header + body
+    nb = conn.frame()
+    nb.parse(array.array("B", frame))
+    return nb
+
+
+def drain(sock):
+    while sock.recv(1 << 20):
+        pass
+
+
+def timed(func, count):
+    start = time.time()
+    func()
+    return (time.time() - start) / count * 1e6
+
+
+def measure(requests):
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    poller = transport.new_poller()
+    client = model.Client(poller=poller)
+    conn = model.Connection(client, "127.0.0.1", listener.getsockname()[1])
+    server, _ = listener.accept()
+    conn.connection_future.wait(timeout=5)
+    conn.credits = requests
+    reader = threading.Thread(target=drain, args=(server,))
+    reader.start()
+
+    frames = []
+    for mid in range(requests):
+        smb_req = conn.request()
+        smb_req.message_id = mid
+        smb2.EchoRequest(smb_req)
+        frames.append(smb_req.parent)
+    cancels = []
+    for mid in range(requests - CANCELS, requests):
+        smb_req = conn.request()
+        smb_req.message_id = mid
+        smb2.Cancel(smb_req)
+        cancels.append(smb_req.parent)
+    interims = [response(conn, mid, mid + 1) for mid in range(requests)]
+    async_cancels = []
+    for mid in range(CANCELS):
+        smb_req = conn.request()
+        smb_req.async_id = mid + 1
+        smb_req.flags |= smb2.SMB2_FLAGS_ASYNC_COMMAND
+        smb2.Cancel(smb_req)
+        async_cancels.append(smb_req.parent)
+    finals = [response(conn, mid) for mid in range(requests)]
+
+    def submit_all(frames):
+        for nb in frames:
+            conn.submit(nb)
+
+    def dispatch_all(responses):
+        for nb in responses:
+            conn._dispatch_incoming(nb)
+
+    results = []
+    with conn.batch():
+        results.append(timed(lambda: submit_all(frames), requests))
+        results.append(timed(lambda: submit_all(cancels), CANCELS))
+        # the queue is sent when the batch ends
+        start = time.time()
+    while conn._out_buffer or conn._out_queue:
+        poller.poll(1)
+    results.append((time.time() - start) / (requests + CANCELS) * 1e6)
+    results.append(timed(lambda: dispatch_all(interims), requests))
+    with conn.batch():
+        results.append(timed(lambda: submit_all(async_cancels), CANCELS))
+    results.append(timed(lambda: dispatch_all(finals), requests))
+
+    conn.close()
+    server.shutdown(socket.SHUT_RDWR)
+    reader.join()
+    server.close()
+    listener.close()
+    return results
+
+
+def main(*counts):
+    # collections of the growing heap would dominate at large counts
+    gc.disable()
+    steps = ("submit", "cancel mid", "send", "interim", "cancel async", "final")
+    print("{:>8} ".format("requests") + " ".join("{:>12}".format(s) for s in steps))
+    for requests in counts or (5000, 50000):
+        results = measure(requests)
+        print(
+            "{:8} ".format(requests) + " ".join("{:12.2f}".format(r) for r in results)
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
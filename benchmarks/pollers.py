@@ -0,0 +1,101 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+# Module Name:
+#
+#        pollers.py
+#
+# Abstract:
+#
+#        Poller iteration cost against the number of connections
+#
+
+"""
+Poller scaling benchmark
+
+Registers a number of connected socket pairs with each available
+poller and reports the average cost in microseconds of one poll()
+iteration when every connection is idle, and when a fixed number of
+them receive data and defer a write on each iteration.
+
+Usage::
+
+    python benchmarks/pollers.py [iterations]
+"""
+
+from __future__ import print_function
+
+import select
+import socket
+import sys
+import time
+
+import pike.transport as transport
+
+CONNECTIONS = (10, 100, 1000)
+ACTIVE = 10
+# select() cannot watch descriptors above FD_SETSIZE
+SELECT_LIMIT = 500
+
+
+class SinkTransport(transport.Transport):
+    def __init__(self, poller, sock):
+        super(SinkTransport, self).__init__(alternate_poller=poller)
+        self.connected = True
+        sock.setblocking(0)
+        self.set_socket(sock)
+
+    def handle_read(self):
+        self.recv(4096)
+
+
+def pollers():
+    result = [("select", transport.SelectPoller)]
+    if hasattr(select, "poll"):
+        result.append(("poll", transport.PollPoller))
+    if hasattr(select, "epoll"):
+        result.append(("epoll", transport.EpollPoller))
+    if hasattr(select, "kqueue"):
+        result.append(("kqueue", transport.KQueuePoller))
+    return result
+
+
+def measure(poller_class, count, active, iterations):
+    poller = poller_class()
+    pairs = [socket.socketpair() for _ in range(count)]
+    transports = [SinkTransport(poller, local) for local, _ in pairs]
+    try:
+        # settle the initial write notifications
+        poller.loop(count=3)
+        start = time.time()
+        for _ in range(iterations):
+            for ix in range(active):
+                pairs[ix][1].send(b"x")
+                poller.defer_write(transports[ix])
+            poller.poll()
+        return (time.time() - start) / iterations * 1e6
+    finally:
+        for t in transports:
+            t.close()
+        for _, remote in pairs:
+            remote.close()
+
+
+def main(iterations=2000):
+    for name, poller_class in pollers():
+        for count in CONNECTIONS:
+            if poller_class is transport.SelectPoller and count > SELECT_LIMIT:
+                continue
+            for active in (0, ACTIVE):
+                elapsed = measure(poller_class, count, active, iterations)
+                print(
+                    "{:7} {:5} connections {:3} active {:10.1f} us/poll".format(
+                        name, count, active, elapsed
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,144 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+# Module Name:
+#
+#        receive.py
+#
+# Abstract:
+#
+#        Receive path cost for bursts of small responses
+#
+
+"""
+Receive path benchmark
+
+A local server writes bursts of small SMB2 echo responses back-to-back to
+a L{pike.model.Connection}, then a series of large READ responses.
+Reports the number of recv calls and the time in microseconds spent per
+received frame.
+
+Usage::
+
+    python benchmarks/receive.py [frames] [burst] [read_mib]
+"""
+
+from __future__ import print_function
+
+import socket
+import struct
+import sys
+import threading
+import time
+
+import pike.model as model
+import pike.netbios as netbios
+import pike.ntstatus as ntstatus
+import pike.smb2 as smb2
+import pike.transport as transport
+
+
+def echo_response(message_id):
+    nb = netbios.Netbios()
+    smb_res = smb2.Smb2(nb)
+    smb_res.credit_charge = 1
+    smb_res.credit_response = 1
+    smb_res.status = ntstatus.STATUS_SUCCESS
+    smb_res.message_id = message_id
+    smb_res.flags = smb2.SMB2_FLAGS_SERVER_TO_REDIR
+    smb2.EchoResponse(smb_res)
+    return nb.serialize().tobytes()
+
+
+def read_response(message_id, length):
+    # pike does not encode responses; lay out the header and body by hand
+    header = struct.pack(
+        "<4sHHLHHLLQLLQ16s",
+        b"\xfeSMB",
+        64,
+        1,
+        0,
+        smb2.SMB2_READ,
+        1,
+        smb2.SMB2_FLAGS_SERVER_TO_REDIR,
+        0,
+        message_id,
+        0,
+        0,
+        0,
+        b"\0" * 16,
+    )
+    body = struct.pack("<HBBLLL", 17, 80, 0, length, 0, 0)
+    size = len(header) + len(body) + length
+    return struct.pack(">L", size) + header + body + b"\xa5" * length
+
+
+class CountingConnection(model.Connection):
+    def __init__(self, *args, **kwargs):
+        self.recvs = 0
+        self.frames = 0
+        super(CountingConnection, self).__init__(*args, **kwargs)
+
+    def recv_into(self, buffer):
+        self.recvs += 1
+        return super(CountingConnection, self).recv_into(buffer)
+
+    def _dispatch_incoming(self, res):
+        self.frames += 1
+
+
+def serve(listener, data, repeat):
+    sock, _ = listener.accept()
+    for _ in range(repeat):
+        sock.sendall(data)
+    # let the client drain before closing
+    sock.recv(1)
+    sock.close()
+
+
+def measure(data, frames_per_send, repeat):
+    """Return (recv calls, seconds) to receive data sent repeat times"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    server = threading.Thread(target=serve, args=(listener, data, repeat))
+    server.start()
+    poller = transport.new_poller()
+    client = model.Client(poller=poller)
+    conn = CountingConnection(client, "127.0.0.1", listener.getsockname()[1])
+    conn.connection_future.wait(timeout=5)
+    start = time.time()
+    while conn.frames < frames_per_send * repeat:
+        poller.poll(1)
+    elapsed = time.time() - start
+    conn.socket.send(b"x")
+    server.join()
+    conn.close()
+    listener.close()
+    return conn.recvs, elapsed
+
+
+def report(label, frames, recvs, elapsed):
+    print(
+        "{:34} {:8.3f} recv/frame {:10.2f} us/frame".format(
+            label, recvs / float(frames), elapsed / frames * 1e6
+        )
+    )
+
+
+def main(frames=20000, burst=32, read_mib=8):
+    repeat = frames // burst
+    data = b"".join(echo_response(mid) for mid in range(burst))
+    recvs, elapsed = measure(data, burst, repeat)
+    report("echo, bursts of {}".format(burst), burst * repeat, recvs, elapsed)
+
+    repeat = 16
+    data = read_response(1, read_mib << 20)
+    recvs, elapsed = measure(data, 1, repeat)
+    report("{} MiB read".format(read_mib), repeat, recvs, elapsed)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
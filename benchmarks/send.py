@@ -0,0 +1,116 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+# Module Name:
+#
+#        send.py
+#
+# Abstract:
+#
+#        Send path cost for many small requests
+#
+
+"""
+Send path benchmark
+
+Submits small SMB2 echo requests to a local server which only reads
+them, first one at a time and then inside L{pike.model.Connection.batch}.
+Reports send calls per request and requests per second until the server
+has received every byte.
+
+Usage::
+
+    python benchmarks/send.py [requests] [batch]
+"""
+
+from __future__ import print_function
+
+import socket
+import sys
+import threading
+import time
+
+import pike.model as model
+import pike.smb2 as smb2
+import pike.transport as transport
+
+
+class CountingConnection(model.Connection):
+    def __init__(self, *args, **kwargs):
+        self.sends = 0
+        super(CountingConnection, self).__init__(*args, **kwargs)
+
+    def send(self, data):
+        self.sends += 1
+        return super(CountingConnection, self).send(data)
+
+    def sendmsg(self, buffers):
+        self.sends += 1
+        return super(CountingConnection, self).sendmsg(buffers)
+
+
+def echo_request(conn, message_id=None):
+    smb_req = conn.request()
+    smb_req.message_id = message_id
+    smb2.EchoRequest(smb_req)
+    return smb_req.parent
+
+
+def frame_size(conn):
+    nb = echo_request(conn, 0)
+    nb[0].credit_charge = 1
+    nb[0].credit_request = 1
+    return len(nb.serialize())
+
+
+def drain(listener, expected):
+    sock, _ = listener.accept()
+    received = 0
+    while received < expected:
+        received += len(sock.recv(1 << 20))
+    sock.close()
+
+
+def measure(requests, batch):
+    """Return (send calls, seconds) to submit requests and deliver them"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    poller = transport.new_poller()
+    client = model.Client(poller=poller)
+    conn = CountingConnection(client, "127.0.0.1", listener.getsockname()[1])
+    conn.connection_future.wait(timeout=5)
+    # the server only reads; grant every request its credit up front
+    conn.credits = requests
+    frames = [echo_request(conn) for _ in range(requests)]
+    size = frame_size(conn)
+    server = threading.Thread(target=drain, args=(listener, size * requests))
+    server.start()
+    start = time.time()
+    for ix in range(0, requests, batch):
+        with conn.batch():
+            for nb in frames[ix : ix + batch]:
+                conn.submit(nb)
+    while conn._out_buffer or conn._out_queue:
+        poller.poll(1)
+    server.join()
+    elapsed = time.time() - start
+    conn.close()
+    listener.close()
+    return conn.sends, elapsed
+
+
+def main(requests=20000, batch=256):
+    for label, size in (("one at a time", 1), ("batches of {}".format(batch), batch)):
+        sends, elapsed = measure(requests, size)
+        print(
+            "{:20} {:8.3f} send/request {:10.0f} requests/s".format(
+                label, sends / float(requests), requests / elapsed
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
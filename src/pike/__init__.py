@@ -4,17 +4,26 @@
 # See file LICENSE for licensing information.
 #
 
+import sys
+
 import six
 
 if six.PY2:
     import array
 
     oldarray = array.array
-    # monkey-patch tobytes for python 2.7
+    # monkey-patch tobytes and frombytes for python 2.7
     class newarray(oldarray):
         def tobytes(self, *args, **kwargs):
             return self.tostring(*args, **kwargs)
 
+        def frombytes(self, data):
+            if isinstance(data, oldarray):
+                data = data.tostring()
+            elif isinstance(data, memoryview):
+                data = data.tobytes()
+            return self.fromstring(bytes(data))
+
         def __getslice__(self, *args, **kwargs):
             return type(self)(
                 self.typecode, super(newarray, self).__getslice__(*args, **kwargs)
@@ -27,10 +36,8 @@ if six.PY2:
 
     array.array = newarray
 
-# main entry point
-from pike.test import TreeConnect as TreeConnect
-
-__all__ = [
+_lazy_modules = (
+    "aio",
     "auth",
     "core",
     "crypto",
@@ -46,7 +53,33 @@ __all__ = [
     "smb2",
     "test",
     "transport",
-    "TreeConnect",
-]
+)
+if six.PY2:
+    # pike.aio is written with Python 3 syntax
+    _lazy_modules = tuple(name for name in _lazy_modules if name != "aio")
+__all__ = list(_lazy_modules) + ["TreeConnect"]
+
+if sys.version_info >= (3, 7):
+    # Submodules and the main entry point are imported on first use
+    # (PEP 562), so importing a single module such as pike.core does
+    # not pull in the whole client and the unittest machinery
+    def __getattr__(name):
+        if name == "TreeConnect":
+            from pike.test import TreeConnect
+
+            globals()[name] = TreeConnect
+            return TreeConnect
+        if name in _lazy_modules:
+            __import__(__name__ + "." + name)
+            return sys.modules[__name__ + "." + name]
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    def __dir__():
+        return sorted(set(globals()) | set(__all__))
+
+else:
+    # main entry point
+    from pike.test import TreeConnect as TreeConnect
+
 # __version__ is defined by setuptools_scm using git tag
 # https://github.com/pypa/setuptools_scm/
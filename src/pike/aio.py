@@ -0,0 +1,219 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+# Module Name:
+#
+#        aio.py
+#
+# Abstract:
+#
+#        asyncio integration: connections driven by an asyncio event loop
+#        and awaitable futures
+#
+
+"""
+asyncio integration (Python 3 only)
+
+An L{AsyncConnection} is a L{pike.model.Connection} whose socket is owned
+by the running asyncio event loop instead of a pike poller, so SMB traffic
+can be interleaved with any other asyncio I/O on a single thread.  Requests
+are built and submitted exactly as on a regular connection; the resulting
+L{pike.model.Future} objects are awaited instead of waited on::
+
+    client = pike.model.Client()
+    conn = await pike.aio.connect(client, server)
+    await pike.aio.negotiate(conn)
+    chan = await pike.aio.session_setup(conn, creds)
+    tree = await pike.aio.tree_connect(chan, share)
+    handle = await chan.create_async(tree, "file.txt")
+    await chan.write_async(handle, 0, b"data")
+    data = await chan.read_async(handle, 4, 0)
+    await chan.close_async(handle)
+
+Blocking helpers such as L{pike.model.Future.result} or
+L{pike.model.Channel.read} must not be used on an L{AsyncConnection}:
+they drive the pike poller, which does not service asyncio sockets.
+"""
+
+import asyncio
+
+from . import core
+from . import model
+from . import transport
+
+
+def wrap_future(future, loop=None):
+    """
+    Return an asyncio future which completes with the result of the
+    given L{pike.model.Future}.
+    """
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    aio_future = loop.create_future()
+
+    def transfer(f):
+        if aio_future.done():
+            return
+        if isinstance(f.response, BaseException):
+            aio_future.set_exception(f.response)
+        else:
+            aio_future.set_result(f.response)
+
+    future.then(transfer)
+    return aio_future
+
+
+class ProtocolTransport(transport.Transport, asyncio.Protocol):
+    """
+    L{transport.Transport} backed by an asyncio transport.
+
+    Writes are handed to the asyncio transport, which buffers whatever the
+    socket does not accept immediately.  Received data is buffered and fed
+    to handle_read until it has all been consumed, so a subclass reads
+    frames with L{recv} exactly as it would from a non-blocking socket.
+    """
+
+    def __init__(self, alternate_poller=None):
+        super(ProtocolTransport, self).__init__(alternate_poller)
+        self._aio_transport = None
+        self._recv_buffer = bytearray()
+        self._recv_offset = 0
+
+    def create_socket(self, family, type):
+        self.family_and_type = family, type
+
+    def connect(self, address):
+        """
+        begin establishing a connection on the running event loop.
+
+        handle_connect is called once the connection is established;
+        a failure is reported through handle_error.
+        """
+        self.connected = False
+        self.addr = address
+        task = asyncio.ensure_future(
+            asyncio.get_event_loop().create_connection(
+                lambda: self, address[0], address[1]
+            )
+        )
+
+        def connected(task):
+            if not task.cancelled() and task.exception() is not None:
+                try:
+                    raise task.exception()
+                except Exception:
+                    self.handle_error()
+
+        task.add_done_callback(connected)
+
+    def close(self):
+        self.connected = False
+        if self._aio_transport is not None:
+            aio_transport, self._aio_transport = self._aio_transport, None
+            aio_transport.close()
+
+    def send(self, data):
+        self._aio_transport.write(data)
+        return len(data)
+
+    def sendmsg(self, buffers):
+        self._aio_transport.writelines(buffers)
+        return sum(len(buf) for buf in buffers)
+
+    def recv(self, bufsize):
+        start = self._recv_offset
+        end = min(start + bufsize, len(self._recv_buffer))
+        result = bytes(self._recv_buffer[start:end])
+        if end == len(self._recv_buffer):
+            del self._recv_buffer[:]
+            self._recv_offset = 0
+        else:
+            self._recv_offset = end
+        return result
+
+    def recv_into(self, buffer):
+        start = self._recv_offset
+        end = min(start + len(buffer), len(self._recv_buffer))
+        with memoryview(self._recv_buffer) as view:
+            buffer[: end - start] = view[start:end]
+        if end == len(self._recv_buffer):
+            del self._recv_buffer[:]
+            self._recv_offset = 0
+        else:
+            self._recv_offset = end
+        return end - start
+
+    #
+    # asyncio.Protocol callbacks
+    #
+    def connection_made(self, aio_transport):
+        self._aio_transport = aio_transport
+        self.socket = aio_transport.get_extra_info("socket")
+        self.handle_connect_event()
+
+    def data_received(self, data):
+        self._recv_buffer.extend(data)
+        try:
+            while self.connected and self._recv_offset < len(self._recv_buffer):
+                self.handle_read()
+        except Exception:
+            self.handle_error()
+
+    def connection_lost(self, exc):
+        self._aio_transport = None
+        if exc is not None:
+            try:
+                raise exc
+            except Exception:
+                self.handle_error()
+        else:
+            self.handle_close()
+
+
+class AsyncConnection(model.Connection, ProtocolTransport):
+    """
+    L{pike.model.Connection} driven by the running asyncio event loop.
+
+    Must be created from a coroutine or callback running on the loop;
+    use L{connect} to wait for the connection to be established.
+    """
+
+    def __init__(self, client, server, port=model.default_port):
+        self._loop = asyncio.get_event_loop()
+        super(AsyncConnection, self).__init__(client, server, port)
+        # asyncio may keep references to buffers it has not written yet,
+        # so serialization buffers are never recycled
+        self._buffer_pool = core.BufferPool(max_per_size=0)
+
+    def call_later(self, delay, callback, *args):
+        # request deadlines and keepalives run on the event loop, since
+        # nothing drives the pike poller
+        return self._loop.call_later(delay, callback, *args)
+
+
+async def connect(client, server, port=model.default_port):
+    """
+    Establish an L{AsyncConnection} to server:port on behalf of client.
+    """
+    return await AsyncConnection(client, server, port).connection_future
+
+
+async def negotiate(conn, hash_algorithms=None, salt=None, ciphers=None):
+    """Asynchronous L{pike.model.Connection.negotiate}"""
+    await conn.negotiate_submit(conn.negotiate_request(hash_algorithms, salt, ciphers))
+    return conn
+
+
+async def session_setup(conn, creds=None, bind=None, resume=None):
+    """
+    Asynchronous L{pike.model.Connection.session_setup}; returns the
+    L{pike.model.Channel}.
+    """
+    return await conn.SessionSetupContext(conn, creds, bind, resume).submit()
+
+
+async def tree_connect(channel, path):
+    """Asynchronous L{pike.model.Channel.tree_connect}"""
+    return await channel.tree_connect_submit(channel.tree_connect_request(path))
@@ -24,16 +24,37 @@ from __future__ import absolute_import
 
 from builtins import object
 import array
+import importlib
+import sys
 import warnings
 
-try:
-    from . import kerberos
-except ImportError:
-    kerberos = None
-try:
-    from . import ntlm
-except ImportError:
-    ntlm = None
+
+def _load_mechanism(name):
+    """
+    Import an optional authentication module on first use.
+
+    The result (or None when the module is unavailable) is stored as
+    a module global, so later references are plain lookups.
+    """
+    try:
+        # __package__ is not set yet while a Python 2 module initializes
+        module = importlib.import_module("." + name, __name__.rpartition(".")[0])
+    except ImportError:
+        module = None
+    globals()[name] = module
+    return module
+
+
+if sys.version_info >= (3, 7):
+    # auth.kerberos and auth.ntlm are resolved lazily (PEP 562)
+    def __getattr__(name):
+        if name in ("kerberos", "ntlm"):
+            return _load_mechanism(name)
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+else:
+    _load_mechanism("kerberos")
+    _load_mechanism("ntlm")
 
 
 def split_credentials(creds):
@@ -52,6 +73,8 @@ def split_credentials(creds):
 
 class KerberosProvider(object):
     def __init__(self, conn, creds=None):
+        if "kerberos" not in globals():
+            _load_mechanism("kerberos")
         if creds:
             # XXX: NTLM support is only provided in likewise gssapi
             raise NotImplementedError("NTLM via GSSAPI is not functional")
@@ -92,6 +115,8 @@ class KerberosProvider(object):
 
 class NtlmProvider(object):
     def __init__(self, conn, creds):
+        if "ntlm" not in globals():
+            _load_mechanism("ntlm")
         self.authenticator = ntlm.NtlmAuthenticator(*split_credentials(creds))
 
     def step(self, sec_buf):
@@ -105,4 +130,4 @@ class NtlmProvider(object):
         )
 
     def username(self):
-        return "{0}\{1}".format(self.authenticator.domain, self.authenticator.username)
+        return "{0}\\{1}".format(self.authenticator.domain, self.authenticator.username)
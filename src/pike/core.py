@@ -26,7 +26,38 @@ import array
 from binascii import hexlify
 import struct
 
-from future.utils import with_metaclass
+import six
+from six import with_metaclass
+
+
+_struct_cache = {}
+
+
+def compile_struct(fmt):
+    """
+    Return a cached struct.Struct for the given format string.
+
+    The result may be passed to L{Cursor.encode_fields} and
+    L{Cursor.decode_fields} to encode or decode an entire fixed
+    layout with a single call.
+    """
+    try:
+        return _struct_cache[fmt]
+    except KeyError:
+        st = _struct_cache[fmt] = struct.Struct(fmt)
+        return st
+
+
+UINT8BE = compile_struct(">B")
+UINT16BE = compile_struct(">H")
+UINT32BE = compile_struct(">L")
+UINT64BE = compile_struct(">Q")
+UINT8LE = compile_struct("<B")
+UINT16LE = compile_struct("<H")
+UINT32LE = compile_struct("<L")
+INT32LE = compile_struct("<l")
+UINT64LE = compile_struct("<Q")
+INT64LE = compile_struct("<q")
 
 
 class BufferOverrun(Exception):
@@ -75,6 +106,11 @@ class Cursor(object):
     compare positions.  The results will only be meaningful
     for cursors referencing the same underlying array.
 
+    Cursor.peek_* operations decode a value at a position relative to
+    the cursor without moving it and without allocating a new cursor::
+
+        flags = cur.peek_uint32le(16)
+
     For a given cursor, cursor.hole.encode_* will perform
     the same operation as cursor.encode_*, but will return
     a hole object.  Calling this hole object with the same
@@ -108,27 +144,46 @@ class Cursor(object):
             # cur itself.
             ...
 
+    A cursor may also reference a bytearray or memoryview instead of an
+    array.array('B').  In that mode decode_bytes returns memoryview slices
+    of the underlying buffer rather than copies, and encoding is limited to
+    the existing size of the buffer.  L{decode_view} returns a view for any
+    kind of buffer.
+
+    Views share memory with the buffer they were decoded from.  The owner
+    of a buffer must not modify or reuse it while any view into it may
+    still be referenced; a buffer handed to L{Frame.parse} belongs to the
+    resulting frame.
+
     @ivar array: Array referenced by cursor
     @ivar offset: Offset within the array
     @ivar bounds: Pair of lower and upper bound on offset
     """
 
+    __slots__ = ("array", "offset", "bounds")
+
     def __init__(self, arr, offset, bounds=(None, None)):
         """
         Create a L{Cursor} for the given array
         at the given offset.
 
-        @type arr: array.array('B', ...)
+        @type arr: array.array('B', ...), bytearray or memoryview
         @param arr: The array
         @type offset: number
         @param offset: The offset from the start of the array
         @param bounds: A pair of a lower and upper bound on valid offsets
         """
 
+        if isinstance(arr, bytearray):
+            arr = memoryview(arr)
         self.array = arr
         self.offset = offset
         self.bounds = bounds
-        self.hole = Cursor.Hole(self)
+
+    @property
+    def hole(self):
+        """L{Cursor.Hole} at the current position, created on demand"""
+        return Cursor.Hole(self)
 
     def __eq__(self, o):
         return self.array is o.array and self.offset == o.offset
@@ -209,47 +264,64 @@ class Cursor(object):
     def _expand_to(self, size):
         cur_size = len(self.array)
         if size > cur_size:
-            self.array.extend([0] * (size - cur_size))
+            if isinstance(self.array, memoryview):
+                raise BufferOverrun(self, size, cur_size)
+            self.array.frombytes(b"\0" * (size - cur_size))
 
     def encode_bytes(self, val):
         """Encode bytes.  Accepts byte arrays, strings, and integer lists."""
         size = len(val)
-        self._expand_to(self.offset + size)
-        self.array[self.offset : self.offset + size] = array.array("B", val)
-        self.offset += size
+        end = self.offset + size
+        self._expand_to(end)
+        try:
+            # Copy straight from any byte buffer
+            memoryview(self.array)[self.offset : end] = val
+        except (TypeError, ValueError):
+            self.array[self.offset : end] = array.array("B", val)
+        self.offset = end
 
     def encode_struct(self, fmt, *args):
-        size = struct.calcsize(fmt)
-        self._expand_to(self.offset + size)
-        struct.pack_into(fmt, self.array, self.offset, *args)
-        self.offset += size
+        self.encode_fields(compile_struct(fmt), *args)
+
+    def encode_fields(self, st, *values):
+        """
+        Encode a fixed layout in one step.
+
+        @type st: struct.Struct
+        @param st: Precompiled layout, see L{compile_struct}
+        @param values: Field values in layout order
+        """
+        end = self.offset + st.size
+        self._expand_to(end)
+        st.pack_into(self.array, self.offset, *values)
+        self.offset = end
 
     def encode_uint8be(self, val):
-        self.encode_struct(">B", val)
+        self.encode_fields(UINT8BE, val)
 
     def encode_uint16be(self, val):
-        self.encode_struct(">H", val)
+        self.encode_fields(UINT16BE, val)
 
     def encode_uint32be(self, val):
-        self.encode_struct(">L", val)
+        self.encode_fields(UINT32BE, val)
 
     def encode_uint64be(self, val):
-        self.encode_struct(">Q", val)
+        self.encode_fields(UINT64BE, val)
 
     def encode_uint8le(self, val):
-        self.encode_struct("<B", val)
+        self.encode_fields(UINT8LE, val)
 
     def encode_uint16le(self, val):
-        self.encode_struct("<H", val)
+        self.encode_fields(UINT16LE, val)
 
     def encode_uint32le(self, val):
-        self.encode_struct("<L", val)
+        self.encode_fields(UINT32LE, val)
 
     def encode_uint64le(self, val):
-        self.encode_struct("<Q", val)
+        self.encode_fields(UINT64LE, val)
 
     def encode_int64le(self, val):
-        self.encode_struct("<q", val)
+        self.encode_fields(INT64LE, val)
 
     def encode_utf16le(self, val):
         self.encode_bytes(str(val).encode("utf-16le"))
@@ -259,8 +331,11 @@ class Cursor(object):
         del self.array[self.offset :]
 
     def _check_bounds(self, start, end):
-        lower = self.bounds[0] if self.bounds[0] is not None else 0
-        upper = self.bounds[1] if self.bounds[1] is not None else len(self.array)
+        lower, upper = self.bounds
+        if lower is None:
+            lower = 0
+        if upper is None:
+            upper = len(self.array)
 
         if start < lower:
             raise BufferOverrun(self, start, lower)
@@ -273,42 +348,99 @@ class Cursor(object):
         self.offset += size
         return result
 
+    def decode_view(self, size):
+        """
+        Decode bytes without copying.
+
+        Returns a memoryview slice of the underlying buffer; see the class
+        documentation for the rules on buffer reuse.  On interpreters where
+        array.array does not export a buffer (python 2) a copy is returned.
+        """
+        end = self.offset + size
+        self._check_bounds(self.offset, end)
+        try:
+            result = memoryview(self.array)[self.offset : end]
+        except TypeError:
+            result = self.array[self.offset : end]
+        self.offset = end
+        return result
+
     def decode_struct(self, fmt):
-        size = struct.calcsize(fmt)
-        self._check_bounds(self.offset, self.offset + size)
-        result = struct.unpack_from(fmt, self.array, self.offset)
-        self.offset += size
+        return self.decode_fields(compile_struct(fmt))
+
+    def decode_fields(self, st):
+        """
+        Decode a fixed layout in one step.
+
+        Performs a single bounds check for the whole layout.
+
+        @type st: struct.Struct
+        @param st: Precompiled layout, see L{compile_struct}
+        @return: Tuple of field values in layout order
+        """
+        end = self.offset + st.size
+        self._check_bounds(self.offset, end)
+        result = st.unpack_from(self.array, self.offset)
+        self.offset = end
         return result
 
+    def peek_fields(self, st, offset=0):
+        """
+        Decode a fixed layout without advancing the cursor.
+
+        @type st: struct.Struct
+        @param st: Precompiled layout, see L{compile_struct}
+        @param offset: Position relative to the cursor
+        @return: Tuple of field values in layout order
+        """
+        start = self.offset + offset
+        self._check_bounds(start, start + st.size)
+        return st.unpack_from(self.array, start)
+
+    def peek_uint8le(self, offset=0):
+        return self.peek_fields(UINT8LE, offset)[0]
+
+    def peek_uint16le(self, offset=0):
+        return self.peek_fields(UINT16LE, offset)[0]
+
+    def peek_uint32le(self, offset=0):
+        return self.peek_fields(UINT32LE, offset)[0]
+
+    def peek_uint64le(self, offset=0):
+        return self.peek_fields(UINT64LE, offset)[0]
+
+    def peek_uint32be(self, offset=0):
+        return self.peek_fields(UINT32BE, offset)[0]
+
     def decode_uint8be(self):
-        return self.decode_struct(">B")[0]
+        return self.decode_fields(UINT8BE)[0]
 
     def decode_uint16be(self):
-        return self.decode_struct(">H")[0]
+        return self.decode_fields(UINT16BE)[0]
 
     def decode_uint32be(self):
-        return self.decode_struct(">L")[0]
+        return self.decode_fields(UINT32BE)[0]
 
     def decode_uint64be(self):
-        return self.decode_struct(">Q")[0]
+        return self.decode_fields(UINT64BE)[0]
 
     def decode_uint8le(self):
-        return self.decode_struct("<B")[0]
+        return self.decode_fields(UINT8LE)[0]
 
     def decode_uint16le(self):
-        return self.decode_struct("<H")[0]
+        return self.decode_fields(UINT16LE)[0]
 
     def decode_uint32le(self):
-        return self.decode_struct("<L")[0]
+        return self.decode_fields(UINT32LE)[0]
 
     def decode_int32le(self):
-        return self.decode_struct("<l")[0]
+        return self.decode_fields(INT32LE)[0]
 
     def decode_uint64le(self):
-        return self.decode_struct("<Q")[0]
+        return self.decode_fields(UINT64LE)[0]
 
     def decode_int64le(self):
-        return self.decode_struct("<q")[0]
+        return self.decode_fields(INT64LE)[0]
 
     def decode_utf16le(self, size):
         return self.decode_bytes(size).tobytes().decode("utf-16le")
@@ -320,12 +452,24 @@ class Cursor(object):
             self.offset += val - rem
 
     def seekto(self, o, lowerbound=None, upperbound=None):
-        assert self.array is o.array
+        """
+        Move to another position.
+
+        Positions and bounds may be cursors into the same array or
+        absolute integer offsets.
+        """
+        if isinstance(o, Cursor):
+            assert self.array is o.array
+            o = o.offset
+        if isinstance(lowerbound, Cursor):
+            lowerbound = lowerbound.offset
+        if isinstance(upperbound, Cursor):
+            upperbound = upperbound.offset
         if lowerbound is not None and o < lowerbound:
             raise BufferOverrun(self, o, lowerbound)
         if upperbound is not None and o > upperbound:
             raise BufferOverrun(self, o, upperbound)
-        self.offset = o.offset
+        self.offset = o
 
     def advanceto(self, o, bound=None):
         self.seekto(o, self, bound)
@@ -340,8 +484,13 @@ class Cursor(object):
 
     @property
     def upperbound(self):
-        upper = self.bounds[1] if self.bounds[1] is not None else len(self.array)
-        return Cursor(self.array, upper, self.bounds)
+        return Cursor(self.array, self.upperbound_offset, self.bounds)
+
+    @property
+    def upperbound_offset(self):
+        """Absolute offset of the upper bound, without allocating a cursor"""
+        upper = self.bounds[1]
+        return upper if upper is not None else len(self.array)
 
     def bounded(self, lower, upper):
         # Allow cursors to be used as bounds (the preferred idiom)
@@ -349,12 +498,12 @@ class Cursor(object):
             assert self.array is lower.array
             lower = lower.offset
         else:
-            lower = cur.offset + lower
+            lower = self.offset + lower
         if isinstance(upper, Cursor):
             assert self.array is upper.array
             upper = upper.offset
         else:
-            upper = cur.offset + upper
+            upper = self.offset + upper
 
         # Don't let new bounds escape current bounds
         self._check_bounds(lower, upper)
@@ -362,6 +511,8 @@ class Cursor(object):
         return Cursor.Bounds(self, lower, upper)
 
     class Hole(object):
+        __slots__ = ("cur",)
+
         def __init__(self, cur):
             self.cur = cur
 
@@ -387,6 +538,8 @@ class Cursor(object):
                 raise AttributeError
 
     class Bounds(object):
+        __slots__ = ("cur", "bounds", "oldbounds")
+
         def __init__(self, cur, lower, upper):
             self.cur = cur
             self.bounds = (lower, upper)
@@ -404,6 +557,145 @@ class BadPacket(Exception):
     pass
 
 
+class Field(object):
+    """
+    Fixed-layout field descriptor
+
+    A frame class may declare the fixed portion of its wire format as a
+    sequence of Field objects in its C{layout} class attribute.  L{FrameMeta}
+    compiles the sequence into a single struct.Struct and generated
+    encode/decode methods.  For example::
+
+        class CloseRequest(Command):
+            layout = (
+                Field("flags", "H", 0),
+                Field(None, "L"),
+                Field("file_id", "QQ", None),
+            )
+
+    A field with a name of None is reserved: its default is encoded
+    and the decoded value is discarded.  A wire format with several codes
+    (such as "QQ") is encoded from and decoded to a tuple.  Byte-string
+    fields ("16s") are decoded to array('B').
+    """
+
+    def __init__(self, name, wire, default=0, type=None):
+        """
+        @param name: attribute name, or None for a reserved field
+        @param wire: struct format code(s) without byte order prefix
+        @param default: value assigned when the frame is constructed
+        @param type: optional callable applied to the value on decode,
+            for example an Enum class
+        """
+        self.name = name
+        self.wire = wire
+        self.default = default
+        self.type = type
+
+    def __repr__(self):
+        return "Field({!r}, {!r}, {!r})".format(self.name, self.wire, self.default)
+
+
+def _to_bytes(value):
+    if isinstance(value, array.array):
+        return value.tobytes()
+    return bytes(value)
+
+
+def _compile_layout(name, layout):
+    """
+    Compile a sequence of L{Field} into a struct.Struct, the list of
+    (name, default) pairs to assign on construction, and generated
+    _encode/_decode functions.
+
+    The generated functions encode or decode the fixed part with a single
+    struct call and then invoke _encode_tail/_decode_tail for any variable
+    length data that follows.
+    """
+    fmt = "<"
+    namespace = {"_array": array.array, "_to_bytes": _to_bytes}
+    defaults = []
+    enc_args = []
+    dec_targets = []
+    dec_post = []
+    for ix, field in enumerate(layout):
+        fmt += field.wire
+        st = struct.Struct("<" + field.wire)
+        count = len(st.unpack(b"\0" * st.size))
+        is_bytes = field.wire.endswith("s")
+        if field.name is None:
+            namespace["_d%d" % ix] = (
+                _to_bytes(field.default or b"") if is_bytes else field.default
+            )
+            if count == 1:
+                enc_args.append("_d%d" % ix)
+            else:
+                enc_args.extend("_d%d[%d]" % (ix, n) for n in range(count))
+            dec_targets.extend(["_"] * count)
+            continue
+
+        defaults.append((field.name, field.default))
+        attr = "self." + field.name
+        if count == 1:
+            enc_args.append("_to_bytes(%s)" % attr if is_bytes else attr)
+        else:
+            enc_args.extend("%s[%d]" % (attr, n) for n in range(count))
+
+        if count == 1 and not is_bytes and field.type is None:
+            dec_targets.append(attr)
+            continue
+        temps = ["_v%d_%d" % (ix, n) for n in range(count)]
+        dec_targets.extend(temps)
+        if count == 1:
+            value = temps[0]
+        else:
+            value = "(%s,)" % ", ".join(temps)
+        if is_bytes:
+            value = "_array('B', %s)" % value
+        if field.type is not None:
+            namespace["_t%d" % ix] = field.type
+            value = "_t%d(%s)" % (ix, value)
+        dec_post.append("    %s = %s" % (attr, value))
+
+    layout_struct = namespace["_st"] = compile_struct(fmt)
+    source = "\n".join(
+        [
+            "def _encode(self, cur):",
+            "    cur.encode_fields(_st, %s)" % ", ".join(enc_args),
+            "    self._encode_tail(cur)",
+            "def _decode(self, cur):",
+            "    %s, = cur.decode_fields(_st)" % ", ".join(dec_targets),
+        ]
+        + dec_post
+        + ["    self._decode_tail(cur)", ""]
+    )
+    exec(compile(source, "<layout %s>" % name, "exec"), namespace)
+    return (layout_struct, tuple(defaults), namespace["_encode"], namespace["_decode"])
+
+
+def _lazy_layout_method(method):
+    """
+    Placeholder for a generated _encode or _decode.
+
+    On first call it compiles the layout of the class that declared it,
+    replaces every placeholder on that class with the generated function
+    and forwards the call.
+    """
+
+    def placeholder(self, cur):
+        for klass in type(self).__mro__:
+            if klass.__dict__.get(method) is placeholder:
+                break
+        (_, _, encode, decode) = _compile_layout(klass.__name__, klass.layout)
+        for (name, generated) in (("_encode", encode), ("_decode", decode)):
+            if getattr(klass.__dict__.get(name), "_layout_placeholder", False):
+                setattr(klass, name, generated)
+        return getattr(klass, method)(self, cur)
+
+    placeholder._layout_placeholder = True
+    return placeholder
+
+
 class FrameMeta(type):
     def __new__(mcs, name, bases, dict):
         # Inherit _register from bases
@@ -418,8 +710,42 @@ class FrameMeta(type):
                 if hasattr(base, "field_blacklist"):
                     dict["field_blacklist"] += base.field_blacklist
 
+        # Compile declarative fixed layout.  Hand-written _encode/_decode
+        # in the class body take precedence over the generated ones, which
+        # are only generated the first time the frame is encoded or decoded
+        layout = dict.get("layout")
+        if layout is not None:
+            dict["layout_struct"] = compile_struct(
+                "<" + "".join(field.wire for field in layout)
+            )
+            dict["_layout_defaults"] = tuple(
+                (field.name, field.default) for field in layout if field.name
+            )
+            dict.setdefault("_encode", _lazy_layout_method("_encode"))
+            dict.setdefault("_decode", _lazy_layout_method("_decode"))
+
         result = type.__new__(mcs, name, bases, dict)
 
+        # Record field order once per class: slotted and layout fields in
+        # declaration order, base classes first.  Attributes stored in the
+        # instance __dict__ are appended in assignment order by Frame.fields
+        fields = []
+        for klass in reversed(result.__mro__):
+            slots = klass.__dict__.get("__slots__", ())
+            if isinstance(slots, str):
+                slots = (slots,)
+            names = list(slots)
+            names.extend(n for n, _ in klass.__dict__.get("_layout_defaults", ()))
+            for n in names:
+                if (
+                    not n.startswith("_")
+                    and n not in fields
+                    and n not in getattr(result, "field_blacklist", ())
+                ):
+                    fields.append(n)
+        result._fields = tuple(fields)
+        result._field_set = frozenset(fields)
+
         # Register class in appropriate tables
         for (table, keyattrs) in result._register:
             if all(hasattr(result, a) for a in keyattrs):
@@ -434,14 +760,22 @@ class FrameMeta(type):
 
 
 class Frame(with_metaclass(FrameMeta)):
+    # Frequently used frames may declare __slots__ for their fields; every
+    # frame keeps a __dict__ for everything else.  The dict is only created
+    # when an attribute without a slot is assigned, so frames whose fields
+    # are all slotted never allocate one
+    __slots__ = ("__dict__", "__weakref__", "parent", "_context", "start", "end")
     field_blacklist = ["fields", "parent", "start", "end"]
     LOG_CHILDREN_COUNT = False  # Include len(children) in __repr__
     LOG_CHILDREN_EXPAND = False  # Include c._log_str for all children
+    layout = None  # Sequence of Field describing the fixed wire layout
+    _layout_defaults = ()
 
     def __init__(self, parent, context=None):
-        object.__setattr__(self, "fields", [])
         self.parent = parent
         self._context = context
+        for name, default in self._layout_defaults:
+            setattr(self, name, default)
 
     def __len__(self):
         return len(self.children)
@@ -452,22 +786,36 @@ class Frame(with_metaclass(FrameMeta)):
     def __iter__(self):
         return self.children.__iter__()
 
-    def __setattr__(self, name, value):
-        if (
-            not name.startswith("_")
-            and name not in self.fields
-            and name not in self.field_blacklist
-        ):
-            self.fields.append(name)
-        object.__setattr__(self, name, value)
+    @property
+    def fields(self):
+        """
+        Names of the public attributes that are set on this frame, in
+        declaration order followed by assignment order
+        """
+        fields = [name for name in self._fields if hasattr(self, name)]
+        field_set = self._field_set
+        blacklist = self.field_blacklist
+        fields.extend(
+            name
+            for name in self.__dict__
+            if not name.startswith("_")
+            and name not in field_set
+            and name not in blacklist
+        )
+        return fields
 
     def __str__(self):
         return self._str(1)
 
     @staticmethod
     def _value_str(value):
-        if isinstance(value, array.array) and value.typecode == "B":
-            return "0x" + "".join("%.2x" % b for b in value)
+        if (
+            isinstance(value, array.array)
+            and value.typecode == "B"
+            or isinstance(value, memoryview)
+            and value.format == "B"
+        ):
+            return "0x" + "".join("%.2x" % b for b in bytearray(value))
         else:
             return str(value)
 
@@ -533,6 +881,14 @@ class Frame(with_metaclass(FrameMeta)):
     def _decode_post(self, cur):
         self.end = cur.copy()
 
+    def _encode_tail(self, cur):
+        """Encode variable length data following the fixed layout"""
+        pass
+
+    def _decode_tail(self, cur):
+        """Decode variable length data following the fixed layout"""
+        pass
+
     @property
     def context(self):
         if self._context is not None:
@@ -556,10 +912,37 @@ class Frame(with_metaclass(FrameMeta)):
         self._decode(cur)
         self._decode_post(cur)
 
-    def serialize(self):
-        self.buf = array.array("B")
+    def size_hint(self):
+        """
+        Estimate the encoded size of this frame in bytes.
+
+        Used to preallocate serialization buffers, so it need not be exact:
+        an underestimate only costs a buffer resize.  The default is the
+        size of the fixed layout plus the hints of all children.
+        """
+        size = self.layout_struct.size if self.layout is not None else 0
+        for child in self.children:
+            size += child.size_hint()
+        return size
+
+    def serialize(self, pool=None):
+        """
+        Encode this frame into self.buf and return it.
+
+        @type pool: L{BufferPool}
+        @param pool: if given, encode into a buffer taken from the pool,
+            sized with L{size_hint}.  The caller is responsible for
+            returning it with L{BufferPool.put} once it is no longer used.
+        """
+        if pool is None:
+            self.buf = array.array("B")
+        else:
+            self.buf = pool.get(self.size_hint())
         cursor = Cursor(self.buf, 0)
         self.encode(cursor)
+        if len(self.buf) > cursor.offset:
+            # size hint was too large
+            del self.buf[cursor.offset :]
         return self.buf
 
     def parse(self, arr):
@@ -582,6 +965,50 @@ class Frame(with_metaclass(FrameMeta)):
         return children.index(self) == len(children) - 1
 
 
+class BufferPool(object):
+    """
+    Free list of serialization buffers
+
+    Buffers are array.array('B') objects kept in buckets by exact size, so
+    that a stream of similarly sized requests (e.g. fixed size writes)
+    reuses the same few buffers instead of allocating and growing new ones.
+
+    A buffer handed out by L{get} belongs to the caller until it is
+    returned with L{put}; no view or slice of it may be used afterward.
+    """
+
+    def __init__(self, max_per_size=4, max_size=16 * 1024 * 1024):
+        """
+        @param max_per_size: number of free buffers kept for each size
+        @param max_size: buffers larger than this are not kept
+        """
+        self.max_per_size = max_per_size
+        self.max_size = max_size
+        self._free = {}
+
+    def get(self, size):
+        """Return a zero-filled buffer of the given size"""
+        bucket = self._free.get(size)
+        if bucket:
+            buf = bucket.pop()
+            if six.PY2:
+                # array.array does not export the buffer interface
+                buf[:] = array.array("B", b"\0" * size)
+            else:
+                memoryview(buf)[:] = b"\0" * size
+            return buf
+        return array.array("B", b"\0" * size)
+
+    def put(self, buf):
+        """Return a buffer obtained from L{get} to the pool"""
+        size = len(buf)
+        if not size or size > self.max_size:
+            return
+        bucket = self._free.setdefault(size, [])
+        if len(bucket) < self.max_per_size:
+            bucket.append(buf)
+
+
 class Register(object):
     def __init__(self, table, *keyattrs):
         self.table = table
@@ -609,15 +1036,25 @@ class EnumMeta(type):
         cls = type.__new__(mcs, cname, bases, misc)
         cls._nametoval = nametoval
         cls._valtoname = valtoname
+        cls._interned = {}
+        cls._strings = {}
+        cls._prepare()
 
         return cls
 
-    def __getattribute__(cls, name):
-        nametoval = type.__getattribute__(cls, "_nametoval")
-        if name in nametoval:
-            return cls(nametoval[name])
-        else:
-            return type.__getattribute__(cls, name)
+    def __getattr__(cls, name):
+        # Only reached on a miss: named values are instantiated on first
+        # access and then stored as plain class attributes, so large
+        # enumerations cost nothing for the names that are never used
+        try:
+            value = cls.__dict__["_nametoval"][name]
+        except KeyError:
+            raise AttributeError(
+                "type object '%s' has no attribute '%s'" % (cls.__name__, name)
+            )
+        instance = cls(value)
+        type.__setattr__(cls, name, instance)
+        return instance
 
 
 class Enum(with_metaclass(EnumMeta, int)):
@@ -630,8 +1067,25 @@ class Enum(with_metaclass(EnumMeta, int)):
     and provide symbolic string forms of values.
 
     You should generally subclass one of L{ValueEnum} or L{FlagEnum}.
+
+    Instances are interned per class: constructing an enum from a value
+    that has been seen before returns the cached instance without
+    validating it again.  At most C{max_interned} instances are kept
+    for each class, which bounds the cache for permissive enumerations
+    and flag combinations.
     """
 
+    max_interned = 1024
+
+    @classmethod
+    def _prepare(cls):
+        """
+        Precompute per-class state before named instances are created.
+
+        Called once by the metaclass for every enumeration class.
+        """
+        pass
+
     @classmethod
     def items(cls):
         """
@@ -685,8 +1139,15 @@ class Enum(with_metaclass(EnumMeta, int)):
         validating that is is valid for the particular
         enumeration.
         """
+        try:
+            return cls._interned[value]
+        except KeyError:
+            pass
         cls.validate(value)
-        return super(Enum, cls).__new__(cls, value)
+        instance = super(Enum, cls).__new__(cls, value)
+        if len(cls._interned) < cls.max_interned:
+            cls._interned[instance] = instance
+        return instance
 
     def __repr__(self):
         # Just return string form
@@ -741,12 +1202,27 @@ class FlagEnum(Enum):
     set flags joined by ' | ' when str() is used.
     """
 
+    @classmethod
+    def _prepare(cls):
+        # Union of all defined flags.  When every bit of every flag is
+        # also defined on its own, any value within the mask is valid
+        # and validation reduces to a single AND.
+        mask = single = 0
+        for flag in cls._nametoval.values():
+            mask |= flag
+            if flag & (flag - 1) == 0:
+                single |= flag
+        cls._mask = mask
+        cls._exact_mask = mask == single
+
     @classmethod
     def validate(cls, value):
-        remaining = value
-        for flag in cls.values():
-            if flag & remaining == flag:
-                remaining &= ~flag
+        remaining = int(value) & ~cls._mask
+        if remaining == 0 and not cls._exact_mask:
+            remaining = value
+            for flag in cls.values():
+                if flag & remaining == flag:
+                    remaining &= ~flag
 
         if remaining != 0:
             raise ValueError(
@@ -754,13 +1230,21 @@ class FlagEnum(Enum):
             )
 
     def __str__(self):
+        strings = self.__class__._strings
+        try:
+            return strings[self]
+        except KeyError:
+            pass
+
         names = [
             name
             for (name, flag) in self.items()
             if (flag != 0 and flag & self == flag) or (self == 0 and flag == 0)
         ]
-
-        return " | ".join(names) if len(names) else "0"
+        result = " | ".join(names) if len(names) else "0"
+        if len(strings) < self.max_interned:
+            strings[int(self)] = result
+        return result
 
     def __or__(self, o):
         return self.__class__(super(FlagEnum, self).__or__(o))
@@ -119,19 +119,27 @@ class TransformHeader(core.Frame):
 
     LOG_CHILDREN_COUNT = False
     LOG_CHILDREN_EXPAND = True
+    # Only decoding is driven by the layout; encoding fills in the signature
+    # and AdditionalAuthenticatedData after encrypting the payload
+    layout = (
+        core.Field("protocol_id", "4s", None),
+        core.Field("signature", "16s", None),
+        # the following fields are part of AdditionalAuthenticatedData and are
+        # used as inputs to the AES cipher
+        core.Field("nonce", "16s", None),
+        core.Field("original_message_size", "L", None),
+        core.Field("reserved", "H", None),
+        core.Field("flags", "H", 0x1),
+        core.Field("session_id", "Q", None),
+    )
 
     def __init__(self, parent):
         core.Frame.__init__(self, parent)
         self.protocol_id = array.array("B", b"\xfdSMB")
-        self.signature = None
         # the value of nonce is always used in the encryption routine
         self.nonce = array.array("B", map(random.randint, [0] * 16, [255] * 16))
         # if wire_nonce is set, it will be sent on the wire instead of nonce
         self.wire_nonce = None
-        self.original_message_size = None
-        self.reserved = None
-        self.flags = 0x1
-        self.session_id = None
         self.encryption_context = None
         self.additional_authenticated_data_buf = array.array("B")
         if parent is not None:
@@ -220,26 +228,14 @@ class TransformHeader(core.Frame):
             self.wire_nonce = self.nonce
         self.wire_nonce_hole(pad_right(self.wire_nonce, 16))
 
-    def _decode(self, cur):
-        self._decode_header(cur)
-        self._decode_smb2(cur)
-
-    def _decode_header(self, cur):
-        self.protocol_id = cur.decode_bytes(4)
-        self.signature = cur.decode_bytes(16)
-        # the following fields are part of AdditionalAuthenticatedData and are
-        # used as inputs to the AES cipher
-        self.crypto_header_start = cur.offset
-        self.nonce = cur.decode_bytes(16)
-        self.original_message_size = cur.decode_uint32le()
-        self.reserved = cur.decode_uint16le()  # reserved
-        self.flags = cur.decode_uint16le()
-        self.session_id = cur.decode_uint64le()
+    def _decode_tail(self, cur):
+        self.crypto_header_start = self.start.offset + 20
         self.crypto_header_end = cur.offset
         if self.encryption_context is None and self.parent is not None:
             self.encryption_context = self.parent.conn.encryption_context(
                 self.session_id
             )
+        self._decode_smb2(cur)
 
     def _decode_smb2(self, cur):
         self.encrypted_data = cur.decode_bytes(self.original_message_size)
@@ -7,6 +7,7 @@ import functools
 import io
 
 import attr
+import six
 
 from .exceptions import ResponseError
 from . import ntstatus
@@ -452,23 +453,21 @@ class Open(_Open, io.RawIOBase):
             for a in (smb2.FILE_READ_DATA, smb2.GENERIC_READ, smb2.GENERIC_ALL)
         )
 
-    def _read_range(self, start=0, end=None):
+    def _read_chunks(self, start=0, end=None):
         """
-        Read a range of bytes from the file.
+        Read a range of bytes from the file, yielding each response buffer.
 
-        Multiple requests will be made if necessary.
+        Multiple requests will be made if necessary. The yielded buffers are
+        views into the receive buffers of the responses; no copy is made.
 
         :type start: int
         :param start: the beginning offset to read from
         :type end: int or None
         :param end: the end offset to read from. If None, read until
             STATUS_END_OF_FILE is returned.
-        :rtype: bytes
-        :return: bytes read from the file
         """
         max_read_size = self.channel.connection.negotiate_response.max_read_size
         offset = start
-        response_buffers = []
         while end is None or offset < end:
             if end is not None:
                 max_read_size = min(end - offset, max_read_size)
@@ -478,17 +477,39 @@ class Open(_Open, io.RawIOBase):
             )
             try:
                 read_resp = self.channel.read(self, available, offset)
-                response_buffers.append(read_resp)
-                offset += len(read_resp)
             except ResponseError as re:
                 if re.response.status == ntstatus.STATUS_END_OF_FILE:
                     break
                 raise
-        read_buffer = b"".join(rb.tobytes() for rb in response_buffers)
+            offset += len(read_resp)
+            if six.PY2:
+                # the data is an array copy; join and memoryview want bytes
+                read_resp = read_resp.tobytes()
+            yield read_resp
+
+    def _advance(self, offset):
+        self._offset = offset
+        # update the EOF marker if we read past it
+        self._end_of_file = max(self.end_of_file, self._offset)
+
+    def _read_range(self, start=0, end=None):
+        """
+        Read a range of bytes from the file.
+
+        Multiple requests will be made if necessary.
+
+        :type start: int
+        :param start: the beginning offset to read from
+        :type end: int or None
+        :param end: the end offset to read from. If None, read until
+            STATUS_END_OF_FILE is returned.
+        :rtype: bytes
+        :return: bytes read from the file
+        """
+        # join copies straight out of the response buffers
+        read_buffer = b"".join(self._read_chunks(start, end))
         if read_buffer:
-            self._offset = start + len(read_buffer)
-            # update the EOF marker if we read past it
-            self._end_of_file = max(self.end_of_file, self._offset)
+            self._advance(start + len(read_buffer))
         return read_buffer
 
     def readall(self):
@@ -501,11 +522,21 @@ class Open(_Open, io.RawIOBase):
         """
         Read bytes into the preallocated buffer, b.
 
-        Note: this function performs extra copying and is inefficient.
-        """
-        read_resp = self._read_range(self._offset, self._offset + len(b))
-        bytes_read = len(read_resp)
-        b[:bytes_read] = read_resp
+        Each response is copied once, directly from the receive buffer.
+        """
+        start = self._offset
+        if six.PY2:
+            # memoryview.cast is new in Python 3
+            read_buffer = self._read_range(start, start + len(b))
+            b[: len(read_buffer)] = read_buffer
+            return len(read_buffer)
+        dest = memoryview(b).cast("B")
+        bytes_read = 0
+        for chunk in self._read_chunks(start, start + len(dest)):
+            dest[bytes_read : bytes_read + len(chunk)] = chunk
+            bytes_read += len(chunk)
+        if bytes_read:
+            self._advance(start + bytes_read)
         return bytes_read
 
     def _write_at(self, data, offset):
@@ -31,11 +31,12 @@ from builtins import map
 from builtins import range
 from builtins import object
 from builtins import str
-from future.utils import raise_
-from future.utils import raise_from
 
 import array
+import bisect
+import collections
 import contextlib
+import itertools
 from functools import reduce
 import logging
 import operator
@@ -46,6 +47,8 @@ import sys
 import time
 import warnings
 
+import six
+
 from . import auth
 from . import core
 from . import crypto
@@ -68,18 +71,28 @@ import pike.io
 default_credit_request = 10
 default_timeout = 30
 default_port = 445
+# sendmsg fails beyond IOV_MAX buffers (1024 on Linux)
+_max_send_segments = 512
+# repeated to allocate zero-filled receive buffers
+_zero_byte = array.array("B", [0])
 trace = False
 Open = pike.io.CompatOpen  # maintain the old __init__ signature of pike.model.Open
 
 
-def loop(timeout=None, count=None):
+def loop(timeout=None, count=None, poller=None):
     """
     wrapper for blocking on the underlying event loop for the given timeout
     or given count of iterations
+
+    @param poller: the L{transport.BasePoller} to drive, by default the
+        global poller
     """
     if timeout is None:
         timeout = default_timeout
-    transport.loop(timeout=timeout, count=count)
+    if poller is None:
+        transport.loop(timeout=timeout, count=count)
+    else:
+        poller.loop(timeout=timeout, count=count)
 
 
 class AssertNtstatusContext(object):
@@ -100,7 +113,7 @@ def pike_status(exp_status):
         obj.exception = err
         obj.response = err.response
         if err.response.status != exp_status:
-            raise_from(
+            six.raise_from(
                 AssertionError(
                     "{} raised when "
                     "expecting ResponseError({})".format(
@@ -136,7 +149,10 @@ class Future(object):
     but they can be used for any asynchronous operation.
 
     The result of a future can be waited for synchronously by simply calling
-    L{Future.result}, or a notification callback can be set with L{Future.then}.
+    L{Future.result}, or notification callbacks can be added with L{Future.then}.
+    L{gather}, L{as_completed} and L{wait_any} wait on many futures at once.
+    On Python 3, a future may also be awaited from a coroutine when its result
+    is delivered by the running asyncio event loop (see L{pike.aio}).
 
     Futures implement the context manager interface so that they can be used
     as the context for a with block.  If an exception is raised from the block,
@@ -146,19 +162,38 @@ class Future(object):
     @ivar response: The result of the future, usually an SMB2 response frame.
     @ivar interim_response: The interim response, usually an SMB2 response frame.
     @ivar traceback: The traceback of an exception result, if applicable.
+    @ivar poller: The poller driven while waiting, if not the global poller.
+    @ivar deadline: The L{transport.Timer} which fails the future if it is
+        still pending when the timer runs, if any.
     """
 
-    def __init__(self, request=None):
+    __slots__ = (
+        "request",
+        "poller",
+        "interim_response",
+        "response",
+        "traceback",
+        "deadline",
+        "request_future",
+        "_callbacks",
+        "__weakref__",
+    )
+
+    def __init__(self, request=None, poller=None):
         """
         Initialize future.
 
         @param request: The request associated with the response.
+        @param poller: The L{transport.BasePoller} which delivers the result,
+            usually that of the connection the request is sent on.
         """
         self.request = request
+        self.poller = poller
         self.interim_response = None
         self.response = None
-        self.notify = None
         self.traceback = None
+        self.deadline = None
+        self._callbacks = None
 
     def complete(self, response, traceback=None):
         """
@@ -171,8 +206,13 @@ class Future(object):
         """
         self.response = response
         self.traceback = traceback
-        if self.notify is not None:
-            self.notify(self)
+        if self.deadline is not None:
+            self.deadline.cancel()
+            self.deadline = None
+        callbacks, self._callbacks = self._callbacks, None
+        if callbacks is not None:
+            for notify in callbacks:
+                notify(self)
 
     def interim(self, response):
         """
@@ -197,7 +237,7 @@ class Future(object):
                 raise TimeoutError.with_future(
                     self, "Timed out after %s seconds" % timeout
                 )
-            loop(timeout=deadline - now, count=1)
+            loop(timeout=deadline - now, count=1, poller=self.poller)
 
         return self
 
@@ -216,7 +256,7 @@ class Future(object):
                 raise TimeoutError.with_future(
                     self, "Timed out after %s seconds" % timeout
                 )
-            loop(timeout=deadline - now, count=1)
+            loop(timeout=deadline - now, count=1, poller=self.poller)
 
         return self
 
@@ -235,13 +275,15 @@ class Future(object):
         if isinstance(self.response, BaseException):
             traceback = self.traceback
             self.traceback = None
-            raise_(self.response, None, traceback)
+            six.reraise(type(self.response), self.response, traceback)
         else:
             return self.response
 
     def then(self, notify):
         """
-        Set notification function.
+        Add notification function.
+
+        Functions are invoked in the order they were added.
 
         @param notify: A function which will be invoked with this future as a parameter
                        when its result becomes available.  If it is already available,
@@ -251,8 +293,46 @@ class Future(object):
             raise CallbackError("{0} is not a callable object".format(notify))
         if self.response is not None:
             notify(self)
+        elif self._callbacks is None:
+            self._callbacks = [notify]
         else:
-            self.notify = notify
+            self._callbacks.append(notify)
+
+    def remove_callback(self, notify):
+        """
+        Remove a notification function added with L{then}.
+
+        Does nothing if the function was already invoked or never added.
+
+        @param notify: The function passed to L{then}
+        """
+        callbacks = self._callbacks or ()
+        for index, pending in enumerate(callbacks):
+            if pending is notify:
+                del callbacks[index]
+                return
+
+    @property
+    def notify(self):
+        """
+        The single notification function, for code which predates L{then}
+        adding functions.  Setting it replaces all notification functions.
+        """
+        if not self._callbacks:
+            return None
+        callbacks = list(self._callbacks)
+        if len(callbacks) == 1:
+            return callbacks[0]
+        return lambda future: [notify(future) for notify in callbacks]
+
+    @notify.setter
+    def notify(self, notify):
+        self._callbacks = None if notify is None else [notify]
+
+    def __await__(self):
+        from . import aio
+
+        return aio.wrap_future(self).__await__()
 
     def __enter__(self):
         pass
@@ -266,6 +346,119 @@ class Future(object):
         self.complete(*params, **kwparams)
 
 
+def _command_priority(command):
+    if isinstance(command, _urgent_requests):
+        return PRIORITY_URGENT
+    if isinstance(command, _bulk_requests):
+        return PRIORITY_BULK
+    return PRIORITY_NORMAL
+
+
+def _segment_view(seg):
+    try:
+        return memoryview(seg)
+    except TypeError:
+        # array.array exports no buffer on Python 2; send a copy
+        return memoryview(seg.tobytes())
+
+
+def _wait_until(futures, done, timeout):
+    # Drive the poller of the first future until done() holds
+    if timeout is None:
+        timeout = default_timeout
+    poller = futures[0].poller if futures else None
+    deadline = time.time() + timeout
+    while not done():
+        now = time.time()
+        if now > deadline:
+            raise TimeoutError("Timed out after %s seconds" % timeout)
+        loop(timeout=deadline - now, count=1, poller=poller)
+
+
+def gather(futures, timeout=None):
+    """
+    Wait for all futures and return their results in order.
+
+    The futures are expected to share a poller, which is driven once per
+    iteration for the whole set.  If any result is an exception, the first
+    such exception is raised once all futures are complete.
+
+    @param futures: Sequence of L{Future} objects
+    @param timeout: The time in seconds before giving up and raising TimeoutError
+    """
+    futures = list(futures)
+    pending = [0]
+
+    def completed(future):
+        pending[0] -= 1
+
+    for future in futures:
+        if future.response is None:
+            pending[0] += 1
+            future.then(completed)
+    try:
+        _wait_until(futures, lambda: not pending[0], timeout)
+    finally:
+        for future in futures:
+            future.remove_callback(completed)
+    return [future.result() for future in futures]
+
+
+def as_completed(futures, timeout=None):
+    """
+    Generate futures in the order they complete.
+
+    Futures which are already complete are generated first.  The futures
+    are expected to share a poller, which is driven once per iteration for
+    the whole set.
+
+    @param futures: Sequence of L{Future} objects
+    @param timeout: The time in seconds for all futures to complete before
+        raising TimeoutError
+    """
+    futures = list(futures)
+    ready = collections.deque()
+    notify = ready.append
+    for future in futures:
+        future.then(notify)
+    if timeout is None:
+        timeout = default_timeout
+    deadline = time.time() + timeout
+    try:
+        for _ in range(len(futures)):
+            if not ready:
+                _wait_until(futures, lambda: ready, deadline - time.time())
+            yield ready.popleft()
+    finally:
+        # the generator may be abandoned before every future completes
+        for future in futures:
+            future.remove_callback(notify)
+
+
+def wait_any(futures, timeout=None):
+    """
+    Wait until at least one future is complete and return it.
+
+    @param futures: Sequence of L{Future} objects sharing a poller
+    @param timeout: The time in seconds before giving up and raising TimeoutError
+    """
+    futures = list(futures)
+    for future in futures:
+        if future.response is not None:
+            return future
+    ready = []
+    notify = ready.append
+    for future in futures:
+        future.then(notify)
+    try:
+        _wait_until(futures, lambda: ready, timeout)
+    finally:
+        # the futures which did not complete outlive this call
+        for future in futures:
+            future.remove_callback(notify)
+    return ready[0]
+
+
 class Client(object):
     """
     Maintains all state associated with an SMB2/3 client.
@@ -276,6 +469,8 @@ class Client(object):
     :ivar security_mode: Security mode flags
     :ivar client_guid: Client GUID
     :ivar channel_sequence: Current channel sequence number
+    :type poller: pike.transport.BasePoller
+    :ivar poller: The poller driving this client's connections
     """
 
     def __init__(
@@ -290,7 +485,15 @@ class Client(object):
         capabilities=smb2.GlobalCaps(reduce(operator.or_, smb2.GlobalCaps.values())),
         security_mode=smb2.SMB2_NEGOTIATE_SIGNING_ENABLED,
         client_guid=None,
+        poller=None,
     ):
+        """
+        @param poller: A L{transport.BasePoller} owned by this client, such
+            as one returned by L{transport.new_poller}.  Connections and
+            futures of a client with its own poller never touch the global
+            poller, so independent clients can be driven from separate
+            threads.  By default the global poller is shared.
+        """
         if client_guid is None:
             client_guid = array.array("B", map(random.randint, [0] * 16, [255] * 16))
 
@@ -306,6 +509,7 @@ class Client(object):
         self._lease_break_queue = []
         self._connections = []
         self._leases = {}
+        self.poller = poller if poller is not None else transport.poller
 
         self.logger = logging.getLogger("pike")
 
@@ -389,13 +593,13 @@ class Client(object):
     # Do not use, may be removed.  Use oplock_break_future.
     def next_oplock_break(self):
         while len(self._oplock_break_queue) == 0:
-            loop(count=1)
+            loop(count=1, poller=self.poller)
         return self._oplock_break_queue.pop()
 
     # Do not use, may be removed.  Use lease_break_future.
     def next_lease_break(self):
         while len(self._lease_break_queue) == 0:
-            loop(count=1)
+            loop(count=1, poller=self.poller)
         return self._lease_break_queue.pop()
 
     def oplock_break_future(self, file_id):
@@ -410,7 +614,7 @@ class Client(object):
         @param file_id: The file ID of the oplocked file.
         """
 
-        future = Future(request=("OplockBreak", file_id))
+        future = Future(request=("OplockBreak", file_id), poller=self.poller)
 
         for smb_res in self._oplock_break_queue[:]:
             if smb_res[0].file_id == file_id:
@@ -434,7 +638,10 @@ class Client(object):
         @param lease_key: The lease key for the lease.
         """
 
-        future = Future(request=("LeaseBreak", core.Frame._value_str(lease_key)))
+        future = Future(
+            request=("LeaseBreak", core.Frame._value_str(lease_key)),
+            poller=self.poller,
+        )
 
         for smb_res in self._lease_break_queue[:]:
             if smb_res[0].lease_key == lease_key:
@@ -493,6 +700,285 @@ class Client(object):
         del self._leases[lease.lease_key.tobytes()]
 
 
+class CreditPolicy(object):
+    """
+    Decides how many credits each request asks the server for.
+
+    This policy asks for L{default_credit_request} credits, or the charge
+    of the request if that is larger.  Assign an instance to
+    L{Connection.credit_policy} to change how credits are requested.
+    """
+
+    def credit_request(self, conn, smb_req):
+        """
+        Return the credit_request for a request about to be sent.
+
+        Only called for requests whose credit_request is not set.  The
+        charge of the request has been deducted from C{conn.credits} and
+        its message id assigned.
+
+        @param conn: The L{Connection} sending the request
+        @param smb_req: The L{smb2.Smb2} request
+        """
+        return max(default_credit_request, smb_req.credit_charge)
+
+    def credit_response(self, conn, smb_res):
+        """
+        Observe the credits granted by a response.
+
+        Called for every response after its credit_response has been
+        added to C{conn.credits}.
+
+        @param conn: The L{Connection} receiving the response
+        @param smb_res: The L{smb2.Smb2} response
+        """
+
+
+class AdaptiveCreditPolicy(CreditPolicy):
+    """
+    Requests credits to match the demand on the connection.
+
+    The policy aims to hold a window of credits once every response has
+    arrived: the credits in hand plus those asked for by requests awaiting
+    their first response.
+    While requests wait in the send queue the window doubles with each
+    request, up to the outstanding demand and C{max_credits}.  A response
+    granting fewer credits than asked for means the server has reached
+    its limit, and the window is cut to the credits actually held, though
+    requests keep asking for at least their charge while others wait.  With
+    nothing queued the window halves with each request, though not below
+    twice the credits in flight or C{initial}, and requests ask for less
+    than their charge to give surplus credits back.
+
+    @ivar window: The credits the policy currently aims to hold.
+    @ivar in_flight: Credits charged to requests still awaiting a
+        response.
+    @ivar requested: Credits asked for by requests still awaiting a
+        response.
+    """
+
+    def __init__(self, initial=None, max_credits=8192):
+        """
+        @param initial: The smallest window, and the starting one;
+            L{default_credit_request} when it is created if not given
+        @param max_credits: The largest window
+        """
+        if initial is None:
+            initial = default_credit_request
+        self.initial = initial
+        self.max_credits = max_credits
+        self.window = initial
+        self.in_flight = 0
+        self.requested = 0
+        # message id -> (charge, credits requested), until first response
+        self._requested = {}
+
+    def credit_request(self, conn, smb_req):
+        charge = smb_req.credit_charge
+        if not charge:
+            # cancel: nothing is charged and no response arrives
+            return 0
+        self.in_flight += charge
+        queued = conn._out_queue.charge
+        if queued:
+            demand = queued + self.in_flight
+            self.window = min(
+                self.max_credits, max(self.window, min(2 * self.window, demand))
+            )
+            # while requests wait, at least replace the credits used
+            least = charge
+        else:
+            in_use = max(self.window // 2, 2 * self.in_flight)
+            self.window = max(self.initial, min(self.window, in_use))
+            least = 1
+        request = self.window - conn.credits - self.requested
+        request = min(max(request, least), 0xFFFF)
+        self.requested += request
+        self._requested[smb_req.message_id] = (charge, request)
+        return request
+
+    def credit_response(self, conn, smb_res):
+        requested = self._requested.pop(smb_res.message_id, None)
+        if requested is None:
+            return
+        charge, request = requested
+        self.in_flight -= charge
+        self.requested -= request
+        if smb_res.credit_response < request:
+            self.window = max(self.initial, conn.credits + self.in_flight)
+
+
+# the CreditPolicy class each new Connection starts with
+default_credit_policy = AdaptiveCreditPolicy
+
+
+class Priority(core.ValueEnum):
+    """Send priority classes; lower values are sent first"""
+
+    PRIORITY_URGENT = 0  # cancels and break acknowledgements
+    PRIORITY_NORMAL = 1
+    PRIORITY_BULK = 2  # reads and writes
+
+
+Priority.import_items(globals())
+
+_urgent_requests = (
+    smb2.Cancel,
+    smb2.OplockBreakAcknowledgement,
+    smb2.LeaseBreakAcknowledgement,
+)
+_bulk_requests = (smb2.ReadRequest, smb2.WriteRequest)
+# Cancels of requests already sent are ordered after nothing still queued,
+# so they have a flow of their own and never wait behind a stalled flow
+_cancel_flow = "cancel"
+
+
+class SendScheduler(object):
+    """
+    Requests waiting to be sent on a L{Connection}.
+
+    The unit of scheduling is the list of futures for the requests of one
+    netbios frame, so compound chains are never split.  Each flow (usually
+    one per session and tree) is sent in the order it was queued; priority
+    chooses between flows by the frame at the head of each, and flows whose
+    heads share a priority take turns.  A frame is only released once the
+    connection has the credits it is charged, except when nothing is
+    outstanding, since no credits can arrive then.  Frames charged no
+    credits, such as cancels, are never held.
+
+    @ivar charge: The credits charged for every queued frame.
+    @ivar max_queued: The largest number of requests queued at once.
+    @ivar credit_stalls: The number of times sending stopped for lack
+        of credits.
+    @ivar stall_time: The total seconds spent stalled for credits, not
+        counting a stall in progress.
+    """
+
+    def __init__(self):
+        # flow -> deque of (priority, charge, futures)
+        self._flows = {}
+        # priority -> ordered flows whose head frame has that priority
+        self._classes = {}
+        self._priorities = []
+        self._len = 0
+        self._stalled_since = None
+        self.charge = 0
+        self.max_queued = 0
+        self.credit_stalls = 0
+        self.stall_time = 0.0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for queue in self._flows.values():
+            for _, _, futures in queue:
+                for future in futures:
+                    yield future
+
+    @property
+    def stalled(self):
+        """True if the next frame is waiting for credits"""
+        return self._stalled_since is not None
+
+    def push(self, futures, charge, priority=PRIORITY_NORMAL, flow=None):
+        """
+        Queue the futures of a frame.
+
+        @param futures: The futures of the requests in the frame, in order
+        @param charge: The credits charged for the frame
+        @param priority: The priority class, see L{Priority}
+        @param flow: Key of the flow the frame belongs to
+        """
+        queue = self._flows.get(flow)
+        if queue is None:
+            queue = self._flows[flow] = collections.deque()
+        queue.append((priority, charge, futures))
+        if len(queue) == 1:
+            self._schedule(flow, priority)
+        self._len += len(futures)
+        self.charge += charge
+        if self._len > self.max_queued:
+            self.max_queued = self._len
+
+    def pop(self, credits, idle=False):
+        """
+        Remove and return the futures of the next frame to send.
+
+        @param credits: The credits available
+        @param idle: True if no requests are outstanding
+        @return: The list of futures, or None if the queue is empty or the
+            next frame is charged more than credits
+        """
+        if not self._priorities:
+            return None
+        priority = self._priorities[0]
+        flows = self._classes[priority]
+        flow = next(iter(flows))
+        queue = self._flows[flow]
+        _, charge, futures = queue[0]
+        if charge and charge > credits and not idle:
+            if self._stalled_since is None:
+                self.credit_stalls += 1
+                self._stalled_since = time.time()
+            return None
+        if self._stalled_since is not None:
+            self.stall_time += time.time() - self._stalled_since
+            self._stalled_since = None
+        queue.popleft()
+        del flows[flow]
+        if not flows:
+            del self._classes[priority]
+            self._priorities.pop(0)
+        if queue:
+            # the flow goes to the back of the class of its next frame
+            self._schedule(flow, queue[0][0])
+        else:
+            del self._flows[flow]
+        self._len -= len(futures)
+        self.charge -= charge
+        return futures
+
+    def _schedule(self, flow, priority):
+        flows = self._classes.get(priority)
+        if flows is None:
+            flows = self._classes[priority] = collections.OrderedDict()
+            bisect.insort(self._priorities, priority)
+        flows[flow] = None
+
+    def clear(self):
+        """Drop every queued frame"""
+        self._flows.clear()
+        self._classes.clear()
+        del self._priorities[:]
+        self._len = 0
+        self._stalled_since = None
+        self.charge = 0
+
+    def stats(self):
+        """
+        Return a dict of queue statistics: C{queued} and
+        C{queued_by_priority} request counts, C{queued_credits},
+        C{max_queued},
+        C{credit_stalls} and C{stall_time} in seconds.
+        """
+        stall_time = self.stall_time
+        if self._stalled_since is not None:
+            stall_time += time.time() - self._stalled_since
+        by_priority = {}
+        for queue in self._flows.values():
+            for priority, _, futures in queue:
+                by_priority[priority] = by_priority.get(priority, 0) + len(futures)
+        return {
+            "queued": self._len,
+            "queued_by_priority": by_priority,
+            "queued_credits": self.charge,
+            "max_queued": self.max_queued,
+            "credit_stalls": self.credit_stalls,
+            "stall_time": stall_time,
+        }
+
+
 class Connection(transport.Transport):
     """
     Connection to server.
@@ -504,6 +990,19 @@ class Connection(transport.Transport):
     :ivar client: The Client object associated with this connection.
     :ivar server: The server name or address
     :ivar port: The server port
+    :ivar lazy_decode: If True, only SMB2 headers are decoded when a
+        response arrives; each command body is decoded when it is first
+        accessed (for example ``smb_res[0]``).  Decoding errors in the body
+        are raised at that point rather than on receipt.
+    :ivar send_buffer_size: Serialized requests are queued for sending
+        until this many bytes are pending, then flushed together with a
+        single send.  A request larger than this is sent on its own.
+    :ivar credit_policy: The L{CreditPolicy} deciding the credits each
+        request asks for, by default a new L{default_credit_policy}.
+    :ivar recv_buffer_size: Size of the receive buffer the socket is read
+        into.  Every complete frame received by one read is dispatched, so
+        back-to-back responses cost a single recv.  A frame larger than
+        this is read directly into a buffer of its own size.
     """
 
     def __init__(self, client, server, port=default_port):
@@ -513,15 +1012,31 @@ class Connection(transport.Transport):
         This should generally not be used directly.  Instead,
         use L{Client.connect}().
         """
-        super(Connection, self).__init__()
+        super(Connection, self).__init__(
+            alternate_poller=getattr(client, "poller", None)
+        )
         self._no_delay = True
-        self._in_buffer = array.array("B")
-        self._watermark = 4
-        self._out_buffer = None
+        self.recv_buffer_size = 65536
+        self._in_buffer = bytearray(self.recv_buffer_size)
+        self._in_end = 0
+        self._in_frame = None
+        self._in_filled = 0
+        self.send_buffer_size = 262144
+        self._out_buffer = collections.deque()
+        self._out_frames = collections.deque()
+        self._out_pending = 0
+        self._keepalive = None
+        self._buffer_pool = core.BufferPool()
         self._next_mid = 0
-        self._mid_blacklist = set()
-        self._out_queue = []
+        # reserved message ids as sorted, disjoint [start, end) intervals
+        self._reserved_starts = []
+        self._reserved_ends = []
+        self._out_queue = SendScheduler()
+        # queued requests submitted with a message id, by message id
+        self._queued_mids = {}
         self._future_map = {}
+        # sent requests with an interim response, by async id
+        self._async_map = {}
         self._sessions = {}
         self._binding = None
         self._binding_key = None
@@ -530,14 +1045,16 @@ class Connection(transport.Transport):
         self._negotiate_request = None
         self._negotiate_response = None
         self.callbacks = {}
-        self.connection_future = Future(request=(server, port))
+        self.connection_future = Future(request=(server, port), poller=self.poller)
         self.credits = 0
+        self.credit_policy = default_credit_policy()
         self.client = client
         self.server = server
         self.port = port
         self.remote_addr = None
         self.local_addr = None
         self.verify_signature = True
+        self.lazy_decode = False
 
         self.error = None
         self.traceback = None
@@ -550,6 +1067,55 @@ class Connection(transport.Transport):
         self.create_socket(family, socktype)
         self.connect(sockaddr)
 
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Queue requests submitted in the context block and send them
+        together when it exits
+
+        Requests are written with as few send calls as possible, up to
+        send_buffer_size bytes each, instead of one per request.
+        """
+        no_delay, self._no_delay = self._no_delay, False
+        try:
+            yield self
+        finally:
+            self._no_delay = no_delay
+            if no_delay and self.error is None:
+                self.handle_write()
+
+    def call_later(self, delay, callback, *args):
+        """
+        Schedule callback(*args) to run after delay seconds on whatever
+        drives this connection; returns a timer with a cancel method
+        """
+        return self.poller.call_later(delay, callback, *args)
+
+    def keepalive(self, interval):
+        """
+        Send an ECHO request interval seconds after the previous one
+        completes, until the connection is closed
+
+        The requests are scheduled with L{call_later}, so on a regular
+        connection they are only sent while its poller is being driven,
+        for example by waiting on a future.
+
+        @param interval: seconds between requests, or None to stop
+        """
+        if self._keepalive is not None:
+            self._keepalive.cancel()
+            self._keepalive = None
+        if interval is not None and self.error is None:
+            self._keepalive = self.call_later(interval, self._send_keepalive, interval)
+
+    def _send_keepalive(self, interval):
+        self._keepalive = None
+        if self.error is not None:
+            return
+        smb_req = self.request()
+        smb2.EchoRequest(smb_req)
+        self.submit(smb_req.parent)[0].then(lambda f: self.keepalive(interval))
+
     @contextlib.contextmanager
     def callback(self, event, cb):
         """
@@ -583,6 +1149,16 @@ class Connection(transport.Transport):
             return
         self.callbacks[ev].remove(cb)
 
+    def has_callbacks(self, event):
+        """
+        Return True if any connection or client callback is registered for
+        the given event
+        """
+        ev = Events(event)
+        if self.callbacks.get(ev):
+            return True
+        return bool(getattr(self.client, "callbacks", {}).get(ev))
+
     def process_callbacks(self, event, obj):
         """
         Fire callbacks for the given event, passing obj as the parameter
@@ -641,20 +1217,42 @@ class Connection(transport.Transport):
         """
         if length < 1:
             length = 1
+        starts, ends = self._reserved_starts, self._reserved_ends
         start_range = self._next_mid
         while True:
-            r = set(range(start_range, start_range + length))
-            if not r.intersection(self._mid_blacklist):
+            # the last reserved interval starting inside the range
+            ix = bisect.bisect_left(starts, start_range + length) - 1
+            if ix < 0 or ends[ix] <= start_range:
                 break
-            start_range += 1
-        self._next_mid = sorted(list(r))[-1] + 1
+            start_range = ends[ix]
+        self._next_mid = start_range + length
         return start_range
 
     def next_mid(self):
-        return self.next_range(1)
+        return self.next_mid_range(1)
 
     def reserve_mid(self, mid):
-        self._mid_blacklist.add(mid)
+        """
+        never allocate the given message id
+        """
+        starts, ends = self._reserved_starts, self._reserved_ends
+        ix = bisect.bisect_right(starts, mid)
+        if ix and ends[ix - 1] >= mid:
+            # inside or adjacent to the preceding interval
+            if ends[ix - 1] > mid:
+                return
+            ends[ix - 1] = mid + 1
+        elif ix < len(starts) and starts[ix] == mid + 1:
+            starts[ix] = mid
+            return
+        else:
+            starts.insert(ix, mid)
+            ends.insert(ix, mid + 1)
+            return
+        # the grown interval may now touch the following one
+        if ix < len(starts) and starts[ix] == ends[ix - 1]:
+            ends[ix - 1] = ends[ix]
+            del starts[ix], ends[ix]
 
     def handle_connect(self):
         self.client._connections.append(self)
@@ -672,34 +1270,139 @@ class Connection(transport.Transport):
         self.connection_future(self)
 
     def handle_read(self):
-        # Try to read the next netbios frame
-        remaining = self._watermark - len(self._in_buffer)
-        self.process_callbacks(EV_RES_PRE_RECV, remaining)
-        data = array.array("B", self.recv(remaining))
-        self.process_callbacks(EV_RES_POST_RECV, data)
-        self._in_buffer.extend(data)
-        avail = len(self._in_buffer)
-        if avail >= 4:
-            self._watermark = 4 + struct.unpack(">L", self._in_buffer[0:4])[0]
-        if avail == self._watermark:
-            nb = self.frame()
-            self.process_callbacks(EV_RES_PRE_DESERIALIZE, self._in_buffer)
-            nb.parse(self._in_buffer)
-            self._in_buffer = array.array("B")
-            self._watermark = 4
-            self._dispatch_incoming(nb)
+        if self._in_frame is not None:
+            self._read_large_frame()
+            return
+        # Drain whatever the socket has buffered into the receive buffer,
+        # copy out every complete netbios frame and move a trailing partial
+        # frame to the front for the next read.  The frames are dispatched
+        # only then, since handling one may wait for a response and so
+        # read again.
+        buf = self._in_buffer
+        avail = self._in_end
+        if not avail and len(buf) != self.recv_buffer_size:
+            buf = self._in_buffer = bytearray(self.recv_buffer_size)
+        view = memoryview(buf)
+        free = view[avail:]
+        self.process_callbacks(EV_RES_PRE_RECV, len(free))
+        count = self.recv_into(free)
+        self._notify_received(free[:count])
+        if not count:
+            return
+        avail += count
+        frames = []
+        offset = 0
+        while avail - offset >= 4:
+            end = offset + 4 + struct.unpack_from(">L", buf, offset)[0]
+            if end > avail:
+                if end - offset > len(buf):
+                    # too large for the receive buffer
+                    if six.PY2:
+                        # array.array exports no buffer on Python 2
+                        self._in_frame = bytearray(end - offset)
+                    else:
+                        self._in_frame = _zero_byte * (end - offset)
+                    self._in_filled = avail - offset
+                    memoryview(self._in_frame)[: avail - offset] = view[offset:avail]
+                    offset = avail
+                break
+            frame_buf = array.array("B")
+            frame_buf.frombytes(view[offset:end])
+            frames.append(frame_buf)
+            offset = end
+        if offset < avail:
+            view[: avail - offset] = view[offset:avail]
+        self._in_end = avail - offset
+        for frame_buf in frames:
+            if self.error is not None:
+                break
+            self._dispatch_frame(frame_buf)
+
+    def _read_large_frame(self):
+        # Fill the pending frame buffer in place
+        free = memoryview(self._in_frame)[self._in_filled :]
+        self.process_callbacks(EV_RES_PRE_RECV, len(free))
+        count = self.recv_into(free)
+        self._notify_received(free[:count])
+        self._in_filled += count
+        if count and self._in_filled == len(self._in_frame):
+            frame_buf, self._in_frame = self._in_frame, None
+            if six.PY2:
+                frame_buf = array.array("B", bytes(frame_buf))
+            self._dispatch_frame(frame_buf)
+
+    def _notify_received(self, data):
+        # callbacks may keep what they are given, so they get a copy of
+        # the bytes instead of a view of a buffer the next read reuses
+        if self.has_callbacks(EV_RES_POST_RECV):
+            received = array.array("B")
+            received.frombytes(data)
+            self.process_callbacks(EV_RES_POST_RECV, received)
+
+    def _dispatch_frame(self, frame_buf):
+        nb = self.frame()
+        self.process_callbacks(EV_RES_PRE_DESERIALIZE, frame_buf)
+        nb.parse(frame_buf)
+        self._dispatch_incoming(nb)
 
     def handle_write(self):
-        # Try to write out more data
-        while self._out_buffer is None and len(self._out_queue):
-            self._out_buffer = self._prepare_outgoing()
-            while self._out_buffer is not None:
-                self.process_callbacks(EV_REQ_PRE_SEND, self._out_buffer)
-                sent = self.send(self._out_buffer)
-                del self._out_buffer[:sent]
-                if len(self._out_buffer) == 0:
-                    self._out_buffer = None
-                self.process_callbacks(EV_REQ_POST_SEND, sent)
+        # Serialize queued requests until send_buffer_size bytes are
+        # pending, then flush all of them with one send
+        pending = self._out_buffer
+        while True:
+            while self._out_pending < self.send_buffer_size:
+                prepared = self._prepare_outgoing()
+                if prepared is None:
+                    break
+                self._queue_frame(*prepared)
+            if not pending:
+                return
+            if len(pending) == 1:
+                buffers = [pending[0]]
+            else:
+                buffers = list(itertools.islice(pending, _max_send_segments))
+            if self.has_callbacks(EV_REQ_PRE_SEND):
+                # callbacks see one contiguous copy of the bytes offered
+                offered = array.array("B")
+                for seg in buffers:
+                    offered.frombytes(seg)
+                self.process_callbacks(EV_REQ_PRE_SEND, offered)
+            if len(buffers) == 1:
+                sent = self.send(buffers[0])
+            else:
+                sent = self.sendmsg(buffers)
+            self._advance_out_buffer(sent)
+            self.process_callbacks(EV_REQ_POST_SEND, sent)
+            if not sent:
+                # the socket is full; the poller calls back when writable
+                return
+
+    def _queue_frame(self, frame, segments):
+        self._out_buffer.extend(_segment_view(seg) for seg in segments)
+        size = sum(len(seg) for seg in segments)
+        self._out_frames.append([frame, segments[0], size])
+        self._out_pending += size
+
+    def _advance_out_buffer(self, sent):
+        # Drop fully sent segments and re-slice a partially sent one;
+        # unsent bytes are never moved
+        self._out_pending -= sent
+        pending = self._out_buffer
+        remaining = sent
+        while pending and remaining >= len(pending[0]):
+            remaining -= len(pending.popleft())
+        if remaining:
+            pending[0] = pending[0][remaining:]
+        # A serialized frame no longer owns its buffer once it is sent
+        frames = self._out_frames
+        while frames and sent >= frames[0][2]:
+            frame, header, size = frames.popleft()
+            sent -= size
+            if frame.buf is header:
+                frame.buf = None
+            self._buffer_pool.put(header)
+        if sent:
+            frames[0][2] -= sent
 
     def handle_close(self):
         self.close()
@@ -719,6 +1422,10 @@ class Connection(transport.Transport):
         if self.error is None:
             self.error = EOFError("close")
 
+        if self._keepalive is not None:
+            self._keepalive.cancel()
+            self._keepalive = None
+
         # if the connection hasn't been established, raise the error
         if self.connection_future.response is None:
             self.connection_future(self.error)
@@ -743,7 +1450,9 @@ class Connection(transport.Transport):
 
         for future in self._out_queue:
             future.complete(self.error, self.traceback)
-        del self._out_queue[:]
+        self._out_queue.clear()
+        self._queued_mids.clear()
+        self._async_map.clear()
 
         for future in self._future_map.values():
             future.complete(self.error, self.traceback)
@@ -754,53 +1463,73 @@ class Connection(transport.Transport):
 
         self.traceback = None
 
-    def _prepare_outgoing(self):
-        # Try to prepare an outgoing packet
+    def _credit_charge(self, req):
+        # Credits charged for a request, computed once
+        if req.credit_charge is None:
+            req.credit_charge = 0
+            for cmd in req:
+                if isinstance(cmd, smb2.Cancel):
+                    # cancel consumes neither credits nor a message id
+                    remainder = 0
+                elif isinstance(cmd, smb2.ReadRequest) and cmd.length > 0:
+                    # special handling, 1 credit per 64k
+                    req.credit_charge, remainder = divmod(
+                        cmd.length, smb2.BYTES_PER_CREDIT
+                    )
+                elif isinstance(cmd, smb2.WriteRequest) and cmd.buffer is not None:
+                    # special handling, 1 credit per 64k
+                    if cmd.length is None:
+                        cmd.length = len(cmd.buffer)
+                    req.credit_charge, remainder = divmod(
+                        cmd.length, smb2.BYTES_PER_CREDIT
+                    )
+                else:
+                    remainder = 1  # assume 1 credit per command
+                if remainder > 0:
+                    req.credit_charge += 1
+        return req.credit_charge
 
-        # Grab an outgoing smb2 request
-        future = self._out_queue[0]
+    def _prepare_outgoing(self):
+        # Serialize the next frame the scheduler releases, or return None
+        # if none can be sent yet
+        while True:
+            futures = self._out_queue.pop(self.credits, idle=not self._future_map)
+            if futures is None:
+                return None
+            for future in futures:
+                if future.request.message_id is not None:
+                    self._queued_mids.pop(future.request.message_id, None)
+            if len(futures) == 1 and futures[0].response is not None:
+                # the deadline expired while queued
+                continue
+            for future in futures:
+                result = self._prepare_request(future)
+            if result is not None:
+                return result
 
+    def _prepare_request(self, future):
         result = None
+        req = future.request
         with future:
-            req = future.request
             self.process_callbacks(EV_REQ_PRE_SERIALIZE, req.parent)
+            self._credit_charge(req)
 
-            if req.credit_charge is None:
-                req.credit_charge = 0
-                for cmd in req:
-                    if isinstance(cmd, smb2.ReadRequest) and cmd.length > 0:
-                        # special handling, 1 credit per 64k
-                        req.credit_charge, remainder = divmod(
-                            cmd.length, smb2.BYTES_PER_CREDIT
-                        )
-                    elif isinstance(cmd, smb2.WriteRequest) and cmd.buffer is not None:
-                        # special handling, 1 credit per 64k
-                        if cmd.length is None:
-                            cmd.length = len(cmd.buffer)
-                        req.credit_charge, remainder = divmod(
-                            cmd.length, smb2.BYTES_PER_CREDIT
-                        )
-                    else:
-                        remainder = 1  # assume 1 credit per command
-                    if remainder > 0:
-                        req.credit_charge += 1
             # do credit accounting based on our calculations (MS-SMB2 3.2.5.1)
             self.credits -= req.credit_charge
 
-            if req.credit_request is None:
-                req.credit_request = default_credit_request
-                if req.credit_charge > req.credit_request:
-                    req.credit_request = req.credit_charge  # try not to fall behind
-
-            del self._out_queue[0]
-
             # Assign message id
             if req.message_id is None:
                 req.message_id = self.next_mid_range(req.credit_charge)
 
+            if req.credit_request is None:
+                req.credit_request = self.credit_policy.credit_request(self, req)
+
             if req.is_last_child():
                 # Last command in chain, ready to send packet
-                result = req.parent.serialize()
+                result = (
+                    req.parent,
+                    req.parent.serialize_segments(self._buffer_pool),
+                )
                 self.process_callbacks(EV_REQ_POST_SERIALIZE, req.parent)
                 if trace:
                     self.client.logger.debug(
@@ -824,8 +1553,9 @@ class Connection(transport.Transport):
                 # Not ready to send chain
                 result = None
 
-            # Move it to map for response waiters (but not cancel)
-            if not isinstance(req[0], smb2.Cancel):
+            # Move it to map for response waiters (but not cancel, or
+            # requests whose deadline expired while queued)
+            if not isinstance(req[0], smb2.Cancel) and future.response is None:
                 self._future_map[req.message_id] = future
 
         return result
@@ -864,10 +1594,11 @@ class Connection(transport.Transport):
         for smb_res in res:
             # TODO: move credit tracking to callbacks
             self.credits += smb_res.credit_response
+            self.credit_policy.credit_response(self, smb_res)
 
             # Verify non-session-setup-response signatures
             # session setup responses are verified in SessionSetupContext
-            if not isinstance(smb_res[0], smb2.SessionSetupResponse):
+            if not issubclass(smb_res.command_class, smb2.SessionSetupResponse):
                 key = self.signing_key(smb_res.session_id)
                 if key and self.verify_signature:
                     smb_res.verify(self.signing_digest(), key)
@@ -891,64 +1622,144 @@ class Connection(transport.Transport):
                 future = self._future_map[smb_res.message_id]
                 if smb_res.status == ntstatus.STATUS_PENDING:
                     future.interim(smb_res)
-                elif (
-                    isinstance(smb_res[0], smb2.ErrorResponse)
-                    or smb_res.status not in smb_res[0].allowed_status
+                    if smb_res.async_id is not None:
+                        self._async_map[smb_res.async_id] = future
+                    continue
+                del self._future_map[smb_res.message_id]
+                if future.interim_response is not None:
+                    self._async_map.pop(future.interim_response.async_id, None)
+                if (
+                    issubclass(smb_res.command_class, smb2.ErrorResponse)
+                    or smb_res.status not in smb_res.command_class.allowed_status
                 ):
                     future.complete(ResponseError(smb_res))
-                    del self._future_map[smb_res.message_id]
                 else:
                     future.complete(smb_res)
-                    del self._future_map[smb_res.message_id]
+        if self._out_queue.stalled and self._no_delay:
+            # granted credits may release queued requests
+            self.handle_write()
 
-    def submit(self, req):
+    def submit(self, req, timeout=None, priority=None):
         """
         Submit request.
 
         Submits a L{netbios.Netbios} frame for sending.  Returns
         a list of L{Future} objects, one for each corresponding
         L{smb2.Smb2} frame in the request.
+
+        @param timeout: If given, seconds after which a request without a
+            response is cancelled and its future fails with L{TimeoutError}.
+            The deadline is a timer set with L{call_later}, so it expires
+            while the poller (or asyncio event loop) is driven.
+        @param priority: The L{Priority} class to send the request in.  By
+            default cancels and break acknowledgements are urgent, reads
+            and writes are bulk, and everything else is normal.  Requests
+            on one session and tree are still sent in submission order;
+            priority only lets them overtake other trees.
+
+        Requests are held until the connection has the credits they are
+        charged; see L{SendScheduler}.
         """
         if not isinstance(req, netbios.Netbios):
             raise RequestError(
                 req, "{0} is not a netbios.Netbios frame".format(repr(req))
             )
         if self.error is not None:
-            raise_(self.error, None, self.traceback)
+            six.reraise(type(self.error), self.error, self.traceback)
         futures = []
+        queued = []
+        charge = 0
+        lowest = PRIORITY_BULK
+        # True while the frame only cancels requests already sent
+        detached = True
         for smb_req in req:
-            if isinstance(smb_req[0], smb2.Cancel):
+            command = smb_req[0]
+            charge += self._credit_charge(smb_req)
+            lowest = min(lowest, _command_priority(command))
+            if isinstance(command, smb2.Cancel):
                 # Find original future being canceled to return
                 if smb_req.async_id is not None:
                     # Cancel by async ID
-                    future = [
-                        f
-                        for f in iter(self._future_map.values())
-                        if f.interim_response.async_id == smb_req.async_id
-                    ][0]
+                    future = self._async_map[smb_req.async_id]
                 elif smb_req.message_id in self._future_map:
                     # Cancel by message id, already in future map
                     future = self._future_map[smb_req.message_id]
                 else:
                     # Cancel by message id, still in send queue
-                    future = [
-                        f
-                        for f in self._out_queue
-                        if f.request.message_id == smb_req.message_id
-                    ][0]
+                    future = self._queued_mids[smb_req.message_id]
+                    detached = False
                 # Add fake future for cancel since cancel has no response
-                self._out_queue.append(Future(request=smb_req))
+                queued.append(Future(request=smb_req, poller=self.poller))
                 futures.append(future)
             else:
-                future = Future(request=smb_req)
-                self._out_queue.append(future)
+                detached = False
+                future = Future(request=smb_req, poller=self.poller)
+                if smb_req.message_id is not None:
+                    self._queued_mids[smb_req.message_id] = future
+                if timeout is not None:
+                    future.deadline = self.call_later(
+                        timeout, self._expire, future, timeout
+                    )
+                queued.append(future)
                 futures.append(future)
 
+        if priority is None:
+            priority = lowest
+        if detached:
+            flow = _cancel_flow
+        else:
+            first = queued[0].request
+            flow = (first.session_id, first.tree_id)
+        self._out_queue.push(queued, charge, priority, flow)
+
         # don't wait for the callback, send the data now
         if self._no_delay:
             self.handle_write()
         return futures
 
+    def send_queue_stats(self):
+        """
+        Return statistics of the requests waiting to be sent, see
+        L{SendScheduler.stats}.
+        """
+        return self._out_queue.stats()
+
+    def _expire(self, future, timeout):
+        # The deadline of a pending request passed: stop waiting for it and
+        # ask the server to cancel it.  A late response is discarded once
+        # its credits are accounted.
+        future.deadline = None
+        # A request which is still queued is skipped when it is dequeued;
+        # in a compound chain it is sent anyway so the chain stays intact
+        smb_req = future.request
+        if self._future_map.get(smb_req.message_id) is future:
+            del self._future_map[smb_req.message_id]
+            cancel_req = self.request()
+            smb2.Cancel(cancel_req)
+            cancel_req.session_id = smb_req.session_id
+            if future.interim_response is not None:
+                self._async_map.pop(future.interim_response.async_id, None)
+                cancel_req.async_id = future.interim_response.async_id
+                cancel_req.flags |= smb2.SMB2_FLAGS_ASYNC_COMMAND
+                cancel_req.message_id = 0
+            else:
+                cancel_req.tree_id = smb_req.tree_id
+                cancel_req.message_id = smb_req.message_id
+            cancel_req.credit_charge = 0
+            self._out_queue.push(
+                [Future(request=cancel_req, poller=self.poller)],
+                0,
+                PRIORITY_URGENT,
+                _cancel_flow,
+            )
+            if self._no_delay:
+                self.handle_write()
+        future.complete(
+            TimeoutError.with_future(
+                future, "No response after %s seconds, cancelled" % timeout
+            )
+        )
+
     def transceive(self, req):
         """
         Submit request and wait for responses.
@@ -1036,7 +1847,7 @@ class Connection(transport.Transport):
             self.session_id = 0
             self.requests = []
             self.responses = []
-            self.session_future = Future(request=self.requests)
+            self.session_future = Future(request=self.requests, poller=conn.poller)
             self.interim_future = None
 
             if bind:
@@ -1234,7 +2045,7 @@ class Connection(transport.Transport):
 
     # Return a fresh netbios frame with connection as context
     def frame(self):
-        return netbios.Netbios(context=self)
+        return netbios.Netbios(context=self, lazy_decode=self.lazy_decode)
 
     # Return a fresh smb2 frame with connection as context
     # Put it in a netbios frame automatically if none given
@@ -1336,6 +2147,30 @@ class Channel(object):
         self.session = session
         self.signing_key = signing_key
 
+    def _submit_async(self, nb, result=None):
+        """
+        Submit a request without waiting for its response.
+
+        @param nb: L{netbios.Netbios} frame containing a single request
+        @param result: optional function which maps the L{smb2.Smb2}
+            response to the result of the returned future
+        @return: L{Future} which completes with the (mapped) response and
+            may be awaited on an asyncio connection
+        """
+        response_future = self.connection.submit(nb)[0]
+        if result is None:
+            return response_future
+        result_future = Future(
+            request=response_future.request, poller=self.connection.poller
+        )
+
+        def finish(f):
+            with result_future:
+                result_future(result(f.result()))
+
+        response_future.then(finish)
+        return result_future
+
     def cancel_request(self, future):
         if future.response is not None:
             raise StateError("Cannot cancel completed request")
@@ -1370,7 +2205,7 @@ class Channel(object):
         return tree_req
 
     def tree_connect_submit(self, tree_req):
-        tree_future = Future(request=tree_req.parent)
+        tree_future = Future(request=tree_req.parent, poller=self.connection.poller)
         resp_future = self.connection.submit(tree_req.parent.parent)[0]
         resp_future.then(
             lambda f: tree_future.complete(
@@ -1508,7 +2343,7 @@ class Channel(object):
             timewarp_req = smb2.TimewarpTokenRequest(create_req)
             timewarp_req.timestamp = nttime.NtTime(timewarp)
 
-        open_future = Future(request=create_req.parent)
+        open_future = Future(request=create_req.parent, poller=self.connection.poller)
 
         def finish(f):
             with open_future:
@@ -1580,6 +2415,13 @@ class Channel(object):
             )
         )
 
+    def create_async(self, tree, path, **kwds):
+        """
+        Non-blocking L{create}; the returned future completes with the
+        L{pike.io.Open}.  Keyword arguments are the same as for L{create}.
+        """
+        return self.create(tree, path, **kwds)
+
     def close_request(self, handle):
         smb_req = self.request(obj=handle)
         close_req = smb2.CloseRequest(smb_req)
@@ -1596,6 +2438,9 @@ class Channel(object):
     def close(self, handle):
         return self.close_submit(self.close_request(handle)).result()
 
+    def close_async(self, handle):
+        return self.close_submit(self.close_request(handle))
+
     def query_directory_request(
         self,
         handle,
@@ -1635,6 +2480,27 @@ class Channel(object):
             ).parent.parent
         )[0][0]
 
+    def query_directory_async(
+        self,
+        handle,
+        file_information_class=smb2.FILE_DIRECTORY_INFORMATION,
+        flags=0,
+        file_index=0,
+        file_name="*",
+        output_buffer_length=8192,
+    ):
+        return self._submit_async(
+            self.query_directory_request(
+                handle,
+                file_information_class,
+                flags,
+                file_index,
+                file_name,
+                output_buffer_length,
+            ).parent.parent,
+            lambda smb_res: smb_res[0],
+        )
+
     def enum_directory(
         self,
         handle,
@@ -1802,6 +2668,8 @@ class Channel(object):
             ).parent.parent
         )[0]
 
+    change_notify_async = change_notify
+
     # Send an echo request and get a response
     def echo(self):
         # Create request structure
@@ -1839,6 +2707,14 @@ class Channel(object):
             ).parent.parent
         )[0][0].data
 
+    def read_async(self, file, length, offset, minimum_count=0, remaining_bytes=0):
+        return self._submit_async(
+            self.read_request(
+                file, length, offset, minimum_count, remaining_bytes
+            ).parent.parent,
+            lambda smb_res: smb_res[0].data,
+        )
+
     def write_request(self, file, offset, buffer=None, remaining_bytes=0, flags=0):
         """
         Create a pike.smb2.WriteRequest from the given parameters
@@ -1891,6 +2767,14 @@ class Channel(object):
 
         return smb_res[0][0].count
 
+    def write_async(self, file, offset, buffer=None, remaining_bytes=0, flags=0):
+        return self._submit_async(
+            self.write_request(
+                file, offset, buffer, remaining_bytes, flags
+            ).parent.parent,
+            lambda smb_res: smb_res[0].count,
+        )
+
     def lock_request(self, handle, locks, sequence=0):
         """
         @param locks: A list of lock tuples, each of which consists of (offset, length, flags).
@@ -2065,6 +2949,15 @@ class Channel(object):
         ioctl_req.file_id = fh.file_id
         return ioctl_req
 
+    def ioctl_async(self, ioctl_req):
+        """
+        Submit an L{smb2.IoctlRequest}, such as one built by
+        L{fsctl_request} or L{enumerate_snapshots_request}.
+
+        @return: L{Future} which completes with the L{smb2.IoctlResponse}
+        """
+        return self._submit_async(ioctl_req.parent.parent, lambda smb_res: smb_res[0])
+
     def enumerate_snapshots_request(
         self, fh, snap_request=smb2.EnumerateSnapshotsRequest, max_output_response=16384
     ):
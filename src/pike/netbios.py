@@ -21,16 +21,28 @@ from . import crypto
 from . import smb2
 
 
+# ProtocolId of an SMB2 TRANSFORM_HEADER (0xFD 'S' 'M' 'B') as a uint32le
+TRANSFORM_PROTOCOL_ID = 0x424D53FD
+
+
 class Netbios(core.Frame):
     LOG_CHILDREN_COUNT = False
     LOG_CHILDREN_EXPAND = True
+    field_blacklist = ["lazy_decode"]
 
-    def __init__(self, context=None):
+    def __init__(self, context=None, lazy_decode=False):
+        """
+        @param context: connection the frame belongs to
+        @param lazy_decode: when parsing, decode only the SMB2 headers and
+            defer each command body until it is first accessed
+        """
         core.Frame.__init__(self, None, context)
         self.len = None
         self.conn = context
         self.transform = None
+        self.lazy_decode = lazy_decode
         self._smb2_frames = []
+        self._detached = None
 
     def _log_str(self):
         components = []
@@ -45,6 +57,14 @@ class Netbios(core.Frame):
     def _children(self):
         return self._smb2_frames
 
+    def size_hint(self):
+        size = 4
+        if self.transform is not None:
+            size += self.transform.layout_struct.size
+        for child in self.children:
+            size += child.size_hint()
+        return size
+
     def _encode(self, cur):
         # Frame length (0 for now)
         len_hole = cur.hole.encode_uint32be(0)
@@ -58,20 +78,71 @@ class Netbios(core.Frame):
 
         if self.len is None:
             self.len = cur - base
+            if self._detached is not None:
+                self.len += len(self._detached)
         len_hole(self.len)
 
     def _decode(self, cur):
         self.len = cur.decode_uint32be()
-        end = cur + self.len
+        end = cur.offset + self.len
 
-        with cur.bounded(cur, end):
-            while cur < end:
-                signature = cur.copy().decode_bytes(4)
-                if signature.tobytes() == b"\xfdSMB":
+        with cur.bounded(0, self.len):
+            while cur.offset < end:
+                if cur.peek_uint32le() == TRANSFORM_PROTOCOL_ID:
                     crypto.TransformHeader(self).decode(cur)
                 else:
                     smb2.Smb2(self).decode(cur)
 
+    def _detachable_payload(self):
+        """
+        Return the WRITE request whose payload can be sent straight from
+        the caller's buffer, or None.
+
+        The payload must end the packet and must not take part in signing
+        or encryption, which need the whole message in one buffer.
+        """
+        if self.transform is not None or not self._smb2_frames:
+            return None
+        smb_req = self._smb2_frames[-1]
+        if smb_req.flags & smb2.SMB2_FLAGS_SIGNED:
+            return None
+        write_req = smb_req._command
+        if not isinstance(write_req, smb2.WriteRequest) or not write_req.buffer:
+            return None
+        if write_req.length is not None and write_req.length != len(write_req.buffer):
+            return None
+        if write_req.data_offset not in (None, write_req.natural_data_offset):
+            return None
+        return write_req
+
+    def serialize_segments(self, pool=None):
+        """
+        Encode this frame as a list of buffers to be sent in order.
+
+        The payload of a trailing unsigned, unencrypted WRITE request is not
+        copied: the result is then the encoded headers followed by a view of
+        the caller's buffer, which must not be modified until it is sent.
+        Otherwise the result holds the single buffer from L{serialize}.
+
+        @type pool: L{core.BufferPool}
+        @param pool: passed to L{serialize} for the header buffer
+        """
+        write_req = self._detachable_payload()
+        if write_req is None:
+            return [self.serialize(pool)]
+        try:
+            self._detached = memoryview(write_req.buffer)
+        except TypeError:
+            # array.array exports no buffer on Python 2; send a copy
+            self._detached = memoryview(write_req.buffer.tobytes())
+        write_req._detach_buffer = True
+        try:
+            header = self.serialize(pool)
+        finally:
+            write_req._detach_buffer = False
+            detached, self._detached = self._detached, None
+        return [header, detached]
+
     def append(self, smb2_frame):
         self._smb2_frames.append(smb2_frame)
 
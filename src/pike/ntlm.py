@@ -167,30 +167,35 @@ NTLMRevisionCurrentFlags.import_items(globals())
 
 
 class Version(core.Frame):
+    layout = (
+        core.Field(
+            "product_major_version",
+            "B",
+            WINDOWS_MAJOR_VERSION_5,
+            type=ProductMajorVersionFlags,
+        ),
+        core.Field(
+            "product_minor_version",
+            "B",
+            WINDOWS_MINOR_VERSION_0,
+            type=ProductMinorVersionFlags,
+        ),
+        core.Field("product_build", "H"),
+        # reserved
+        core.Field(None, "H"),
+        core.Field(None, "B"),
+        core.Field(
+            "ntlm_revision_current",
+            "B",
+            NTLMSSP_REVISION_W2K3,
+            type=NTLMRevisionCurrentFlags,
+        ),
+    )
+
     def __init__(self, parent=None):
         core.Frame.__init__(self, parent)
         if parent is not None:
             parent.version = self
-        self.product_major_version = WINDOWS_MAJOR_VERSION_5
-        self.product_minor_version = WINDOWS_MINOR_VERSION_0
-        self.product_build = 0
-        self.ntlm_revision_current = NTLMSSP_REVISION_W2K3
-
-    def _encode(self, cur):
-        cur.encode_uint8le(self.product_major_version)
-        cur.encode_uint8le(self.product_minor_version)
-        cur.encode_uint16le(self.product_build)
-        cur.encode_uint16le(0)  # reserved
-        cur.encode_uint8le(0)  # reserved
-        cur.encode_uint8le(self.ntlm_revision_current)
-
-    def _decode(self, cur):
-        self.product_major_version = ProductMajorVersionFlags(cur.decode_uint8le())
-        self.product_minor_version = ProductMinorVersionFlags(cur.decode_uint8le())
-        self.product_build = cur.decode_uint16le()
-        reserved = cur.decode_uint16le()
-        reserved = cur.decode_uint8le()
-        self.ntlm_revision_current = NTLMRevisionCurrentFlags(cur.decode_uint8le())
 
 
 class NtLmNegotiateMessage(core.Frame):
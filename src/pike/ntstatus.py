@@ -5,6 +5,9 @@
 #
 
 from __future__ import absolute_import
+
+import sys
+
 from . import core
 
 
@@ -1804,4 +1807,20 @@ class Status(core.ValueEnum):
     STATUS_VHD_DIFFERENCING_CHAIN_ERROR_IN_PARENT = 0xC03A0019
 
 
-Status.import_items(globals())
+if sys.version_info >= (3, 7):
+    # Module level names are resolved on first use (PEP 562) rather than
+    # instantiating every status code at import time
+    def __getattr__(name):
+        if name not in Status._nametoval:
+            raise AttributeError("module %r has no attribute %r" % (__name__, name))
+        value = globals()[name] = getattr(Status, name)
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(Status.names()))
+
+    # star imports resolve every name through __getattr__
+    __all__ = ["Status"] + Status.names()
+
+else:
+    Status.import_items(globals())
@@ -17,12 +17,13 @@
 
 from __future__ import division
 from builtins import str
-from past.builtins import basestring
 
 from datetime import datetime, timedelta
 import math
 import time
 
+import six
+
 _unix_time_offset = 11644473600
 _unix_epoch = datetime.fromtimestamp(0) + timedelta(hours=time.localtime().tm_isdst)
 _intervals_per_second = 10000000
@@ -78,7 +79,7 @@ class NtTime(int):
     """
 
     def __new__(cls, value):
-        if isinstance(value, basestring):
+        if isinstance(value, six.string_types):
             if value.startswith("@GMT-"):
                 dt = GMT_to_datetime(value)
             else:
@@ -132,6 +132,23 @@ UNSOLICITED_MESSAGE_ID = 2**64 - 1
 
 
 class Smb2(core.Frame):
+    __slots__ = (
+        "credit_charge",
+        "channel_sequence",
+        "status",
+        "command",
+        "credit_request",
+        "credit_response",
+        "flags",
+        "next_command",
+        "message_id",
+        "async_id",
+        "session_id",
+        "tree_id",
+        "signature",
+        "_command",
+        "_body",
+    )
     LOG_CHILDREN_COUNT = False
     LOG_CHILDREN_EXPAND = True
     _request_table = {}
@@ -141,6 +158,13 @@ class Smb2(core.Frame):
     request = core.Register(_request_table, "command_id", "structure_size")
     response = core.Register(_response_table, "command_id", "structure_size")
     notification = core.Register(_notification_table, "command_id", "structure_size")
+    # Fixed header layout, excluding the signature.  The 32-bit field after
+    # CreditCharge is either Status or ChannelSequence/Reserved, and the 64-bit
+    # field after MessageId is either AsyncId or Reserved/TreeId.
+    _header = core.compile_struct("<4sHHLHHLLQQQ")
+    # Encoding splits the header around the NextCommand hole
+    _header_prefix = core.compile_struct("<4sHHLHHL")
+    _header_suffix = core.compile_struct("<QQQ")
 
     def __init__(self, parent, context=None):
         core.Frame.__init__(self, parent, context)
@@ -157,12 +181,13 @@ class Smb2(core.Frame):
         self.session_id = 0
         self.tree_id = 0
         self._command = None
+        self._body = None
         if parent is not None:
             parent.append(self)
 
     def _log_str(self):
         components = []
-        if not self.children:
+        if self._command is None:
             components.append(type(self).__name__)
         else:
             components.extend(self._log_str_children())
@@ -170,37 +195,70 @@ class Smb2(core.Frame):
             components.insert(1, str(self.status))
         return " ".join(components)
 
+    def _log_str_expand_children(self):
+        if self._body is not None:
+            # Don't decode a lazy body just to log it
+            return [type(self._command).__name__]
+        return super(Smb2, self)._log_str_expand_children()
+
     def _children(self):
+        if self._body is not None:
+            self._decode_body()
         return [self._command] if self._command is not None else []
 
-    def _encode(self, cur):
-        cur.encode_bytes(b"\xfeSMB")
-        cur.encode_uint16le(64)
-        cur.encode_uint16le(self.credit_charge)
-        if self.flags & SMB2_FLAGS_SERVER_TO_REDIR:
-            cur.encode_uint32le(self.status)
-        else:
-            cur.encode_uint16le(self.channel_sequence)
-            cur.encode_uint16le(0)
+    def size_hint(self):
+        size = 64 + core.Frame.size_hint(self)
+        if self.parent is not None and not self.is_last_child():
+            # Worst case padding before the next chained command
+            size += 7
+        return size
+
+    @property
+    def command_class(self):
+        """
+        Class of the command payload.
+
+        Unlike indexing the frame, this does not decode a lazy body.
+        """
+        return type(self._command) if self._command is not None else None
+
+    def _decode_body(self):
+        body, self._body = self._body, None
+        self._command.decode(body)
 
+    def _encode(self, cur):
         if self.command is None:
             self.command = self._command.command_id
-        cur.encode_uint16le(self.command)
 
         if self.flags & SMB2_FLAGS_SERVER_TO_REDIR:
-            cur.encode_uint16le(self.credit_response)
+            status = self.status
+            credit = self.credit_response
         else:
-            cur.encode_uint16le(self.credit_request)
-        cur.encode_uint32le(self.flags)
+            # ChannelSequence, followed by 16 reserved bits
+            status = self.channel_sequence
+            credit = self.credit_request
+
+        cur.encode_fields(
+            self._header_prefix,
+            b"\xfeSMB",
+            64,
+            self.credit_charge,
+            status,
+            self.command,
+            credit,
+            self.flags,
+        )
         # Set NextCommand to 0 for now
         next_command_hole = cur.hole.encode_uint32le(0)
-        cur.encode_uint64le(self.message_id)
+
         if self.flags & SMB2_FLAGS_ASYNC_COMMAND:
-            cur.encode_uint64le(self.async_id)
+            async_id = self.async_id
         else:
-            cur.encode_uint32le(0xFEFF)  # default process id
-            cur.encode_uint32le(self.tree_id)
-        cur.encode_uint64le(self.session_id)
+            # Default process id, followed by tree id
+            async_id = 0xFEFF | (self.tree_id << 32)
+        cur.encode_fields(
+            self._header_suffix, self.message_id, async_id, self.session_id
+        )
         # Set Signature to 0 for now
         signature_hole = cur.hole.encode_bytes([0] * 16)
 
@@ -232,45 +290,49 @@ class Smb2(core.Frame):
         signature_hole(self.signature)
 
     def _decode(self, cur):
-        if cur.decode_bytes(4).tobytes() != b"\xfeSMB":
+        (
+            protocol_id,
+            structure_size,
+            self.credit_charge,
+            status,
+            command,
+            credit,
+            flags,
+            self.next_command,
+            self.message_id,
+            async_id,
+            self.session_id,
+        ) = cur.decode_fields(self._header)
+        if protocol_id != b"\xfeSMB":
             raise core.BadPacket()
-        if cur.decode_uint16le() != 64:
+        if structure_size != 64:
             raise core.BadPacket()
-        self.credit_charge = cur.decode_uint16le()
-        # Look ahead and decode flags first
-        self.flags = Flags((cur + 8).decode_uint32le())
+        self.flags = Flags(flags)
         if self.flags & SMB2_FLAGS_SERVER_TO_REDIR:
-            self.status = ntstatus.Status(cur.decode_uint32le())
+            self.status = ntstatus.Status(status)
             self.channel_sequence = None
         else:
-            self.channel_sequence = cur.decode_uint16le()
             # Ignore reserved
-            cur.decode_uint16le()
+            self.channel_sequence = status & 0xFFFF
             self.status = None
-        self.command = CommandId(cur.decode_uint16le())
+        self.command = CommandId(command)
         if self.flags & SMB2_FLAGS_SERVER_TO_REDIR:
-            self.credit_response = cur.decode_uint16le()
+            self.credit_response = credit
             self.credit_request = None
         else:
-            self.credit_request = cur.decode_uint16le()
+            self.credit_request = credit
             self.credit_response = None
-        # Skip over flags
-        cur += 4
-        self.next_command = cur.decode_uint32le()
-        self.message_id = cur.decode_uint64le()
         if self.flags & SMB2_FLAGS_ASYNC_COMMAND:
-            self.async_id = cur.decode_uint64le()
+            self.async_id = async_id
             self.tree_id = None
         else:
-            # Ignore reserved
-            cur.decode_uint32le()
-            self.tree_id = cur.decode_uint32le()
+            # Ignore reserved process id
+            self.tree_id = async_id >> 32
             self.async_id = None
-        self.session_id = cur.decode_uint64le()
         self.signature = cur.decode_bytes(16)
 
         # Peek ahead at structure_size
-        structure_size = (cur + 0).decode_uint16le()
+        structure_size = cur.peek_uint16le()
 
         key = (self.command, structure_size)
 
@@ -295,13 +357,18 @@ class Smb2(core.Frame):
 
         # Figure out limit of command data
         if self.next_command:
-            end = self.start + self.next_command
+            end = self.start.offset + self.next_command
         else:
-            end = cur.upperbound
+            end = cur.upperbound_offset
 
         self._command = cls(self)
-        with cur.bounded(cur, end):
-            self._command.decode(cur)
+        bounds = cur.bounded(0, end - cur.offset)
+        if getattr(self.parent, "lazy_decode", False):
+            # Defer decoding the command until it is first accessed
+            self._body = core.Cursor(cur.array, cur.offset, bounds.bounds)
+        else:
+            with bounds:
+                self._command.decode(cur)
 
         # Advance to next frame or end of data
         cur.advanceto(end)
@@ -309,6 +376,9 @@ class Smb2(core.Frame):
     def verify(self, digest, key):
         if self.flags & SMB2_FLAGS_SIGNED:
             message = self.start[: self.end]
+            if not isinstance(message, array.array):
+                # Don't scribble on a view of the receive buffer
+                message = array.array("B", message.tobytes())
             # Zero out signature in message
             message[12 * 4 : 12 * 4 + 16] = array.array("B", [0] * 16)
             # Calculate signature
@@ -319,10 +389,16 @@ class Smb2(core.Frame):
 
 
 class Command(core.Frame):
+    __slots__ = ()
+
     def __init__(self, parent):
         core.Frame.__init__(self, parent)
         parent._command = self
 
+    def size_hint(self):
+        # StructureSize precedes the layout
+        return 2 + core.Frame.size_hint(self)
+
     def _encode_pre(self, cur):
         core.Frame._encode_pre(self, cur)
         cur.encode_uint16le(self.structure_size)
@@ -335,17 +411,18 @@ class Command(core.Frame):
 
 @Smb2.request
 class Request(Command):
-    pass
+    __slots__ = ()
 
 
 @Smb2.response
 class Response(Command):
+    __slots__ = ()
     allowed_status = [ntstatus.STATUS_SUCCESS]
 
 
 @Smb2.notification
 class Notification(Command):
-    pass
+    __slots__ = ()
 
 
 class ErrorResponse(Command):
@@ -719,14 +796,7 @@ SessionFlags.import_items(globals())
 class EchoRequest(Request):
     command_id = SMB2_ECHO
     structure_size = 4
-
-    def __init__(self, parent):
-        Request.__init__(self, parent)
-        self.reserved = 0
-
-    def _encode(self, cur):
-        # Reserved
-        cur.encode_uint16le(self.reserved)
+    layout = (core.Field("reserved", "H"),)
 
 
 # SMB2_ECHO_RESPONSE definition
@@ -734,33 +804,18 @@ class EchoResponse(Response):
     # Expect response whenever SMB2_ECHO_REQUEST sent
     command_id = SMB2_ECHO
     structure_size = 4
-
-    def __init__(self, parent):
-        Response.__init__(self, parent)
-
-    def _decode(self, cur):
-        # Reserved
-        cur.decode_uint16le()
+    layout = (core.Field(None, "H"),)
 
 
 # SMB2_FLUSH_REQUEST definition
 class FlushRequest(Request):
     command_id = SMB2_FLUSH
     structure_size = 24
-
-    def __init__(self, parent):
-        Request.__init__(self, parent)
-        self.reserved1 = 0
-        self.reserved2 = 0
-        self.file_id = None
-
-    def _encode(self, cur):
-        # Reserved1
-        cur.encode_uint16le(self.reserved1)
-        # Reserved2
-        cur.encode_uint32le(self.reserved2)
-        cur.encode_uint64le(self.file_id[0])
-        cur.encode_uint64le(self.file_id[1])
+    layout = (
+        core.Field("reserved1", "H"),
+        core.Field("reserved2", "L"),
+        core.Field("file_id", "QQ", None),
+    )
 
 
 # SMB2_FLUSH_RESPONSE definition
@@ -768,12 +823,7 @@ class FlushResponse(Response):
     # Expect response whenever SMB2_FLUSH_REQUEST sent
     command_id = SMB2_FLUSH
     structure_size = 4
-
-    def __init__(self, parent):
-        Response.__init__(self, parent)
-
-    def _decode(self, cur):
-        self.reserved = cur.decode_uint16le()
+    layout = (core.Field("reserved", "H"),)
 
 
 class SessionSetupRequest(Request):
@@ -873,13 +923,13 @@ class TreeConnectRequest(Request):
 class TreeConnectResponse(Response):
     command_id = SMB2_TREE_CONNECT
     structure_size = 16
-
-    def __init__(self, parent):
-        Response.__init__(self, parent)
-        self.share_type = 0
-        self.share_flags = 0
-        self.capabilities = 0
-        self.maximal_access = 0
+    layout = (
+        core.Field("share_type", "B"),
+        core.Field(None, "B"),
+        core.Field("share_flags", "L"),
+        core.Field("capabilities", "L"),
+        core.Field("maximal_access", "L"),
+    )
 
     def _log_str(self):
         components = [
@@ -891,61 +941,33 @@ class TreeConnectResponse(Response):
             components.append(str(self.capabilities))
         return " ".join(components)
 
-    def _decode(self, cur):
-        self.share_type = cur.decode_uint8le()
-        # Ignore reserved
-        cur.decode_uint8le()
-        self.share_flags = cur.decode_uint32le()
-        self.capabilities = cur.decode_uint32le()
-        self.maximal_access = Access(cur.decode_uint32le())
+    def _decode_tail(self, cur):
+        # Access is defined further down in this module
+        self.maximal_access = Access(self.maximal_access)
 
 
 class TreeDisconnectRequest(Request):
     command_id = SMB2_TREE_DISCONNECT
     structure_size = 4
-
-    def __init__(self, parent):
-        Request.__init__(self, parent)
-
-    def _encode(self, cur):
-        # Reserved
-        cur.encode_uint16le(0)
+    layout = (core.Field(None, "H"),)
 
 
 class TreeDisconnectResponse(Response):
     command_id = SMB2_TREE_DISCONNECT
     structure_size = 4
-
-    def __init__(self, parent):
-        Response.__init__(self, parent)
-
-    def _decode(self, cur):
-        # Ignore reserved
-        cur.decode_uint16le()
+    layout = (core.Field(None, "H"),)
 
 
 class LogoffRequest(Request):
     command_id = SMB2_LOGOFF
     structure_size = 4
-
-    def __init__(self, parent):
-        Request.__init__(self, parent)
-
-    def _encode(self, cur):
-        # Reserved
-        cur.encode_uint16le(0)
+    layout = (core.Field(None, "H"),)
 
 
 class LogoffResponse(Response):
     command_id = SMB2_LOGOFF
     structure_size = 4
-
-    def __init__(self, parent):
-        Response.__init__(self, parent)
-
-    def _decode(self, cur):
-        # Ignore reserved
-        cur.decode_uint16le()
+    layout = (core.Field(None, "H"),)
 
 
 # Oplock levels
@@ -1065,6 +1087,7 @@ FileAttributes.import_items(globals())
 class CreateRequest(Request):
     command_id = SMB2_CREATE
     structure_size = 57
+    _fixed = core.compile_struct("<BBLQQLLLLL")
 
     def __init__(self, parent):
         Request.__init__(self, parent)
@@ -1097,19 +1120,20 @@ class CreateRequest(Request):
         return self._create_contexts
 
     def _encode(self, cur):
-        # SecurityFlags, must be 0
-        cur.encode_uint8le(self.security_flags)
-        cur.encode_uint8le(self.requested_oplock_level)
-        cur.encode_uint32le(self.impersonation_level)
-        # SmbCreateFlags, must be 0
-        cur.encode_uint64le(self.smb_create_flags)
-        # Reserved
-        cur.encode_uint64le(self.reserved)
-        cur.encode_uint32le(self.desired_access)
-        cur.encode_uint32le(self.file_attributes)
-        cur.encode_uint32le(self.share_access)
-        cur.encode_uint32le(self.create_disposition)
-        cur.encode_uint32le(self.create_options)
+        # SecurityFlags and SmbCreateFlags must be 0
+        cur.encode_fields(
+            self._fixed,
+            self.security_flags,
+            self.requested_oplock_level,
+            self.impersonation_level,
+            self.smb_create_flags,
+            self.reserved,
+            self.desired_access,
+            self.file_attributes,
+            self.share_access,
+            self.create_disposition,
+            self.create_options,
+        )
 
         name_offset_hole = cur.hole.encode_uint16le(0)
         name_length_hole = cur.hole.encode_uint16le(0)
@@ -1186,6 +1210,8 @@ class CreateRequest(Request):
 class CreateResponse(Response):
     command_id = SMB2_CREATE
     structure_size = 89
+    _fixed = core.compile_struct("<BBLQQQQQQLLQQLL")
+    _context_header = core.compile_struct("<LHHHHL")
 
     _context_table = {}
     create_context = core.Register(_context_table, "name")
@@ -1220,21 +1246,30 @@ class CreateResponse(Response):
         return self._create_contexts
 
     def _decode(self, cur):
-        self.oplock_level = OplockLevel(cur.decode_uint8le())
-        self.flags = cur.decode_uint8le()
-        self.create_action = cur.decode_uint32le()
-        self.creation_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_access_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_write_time = nttime.NtTime(cur.decode_uint64le())
-        self.change_time = nttime.NtTime(cur.decode_uint64le())
-        self.allocation_size = cur.decode_uint64le()
-        self.end_of_file = cur.decode_uint64le()
-        self.file_attributes = FileAttributes(cur.decode_uint32le())
-        # Ignore Reserved2
-        self.reserved2 = cur.decode_uint32le()
-        self.file_id = (cur.decode_uint64le(), cur.decode_uint64le())
-        self.create_contexts_offset = cur.decode_uint32le()
-        self.create_contexts_length = cur.decode_uint32le()
+        (
+            oplock_level,
+            self.flags,
+            self.create_action,
+            creation_time,
+            last_access_time,
+            last_write_time,
+            change_time,
+            self.allocation_size,
+            self.end_of_file,
+            file_attributes,
+            self.reserved2,
+            file_id_persistent,
+            file_id_volatile,
+            self.create_contexts_offset,
+            self.create_contexts_length,
+        ) = cur.decode_fields(self._fixed)
+        self.oplock_level = OplockLevel(oplock_level)
+        self.creation_time = nttime.NtTime(creation_time)
+        self.last_access_time = nttime.NtTime(last_access_time)
+        self.last_write_time = nttime.NtTime(last_write_time)
+        self.change_time = nttime.NtTime(change_time)
+        self.file_attributes = FileAttributes(file_attributes)
+        self.file_id = (file_id_persistent, file_id_volatile)
 
         if self.create_contexts_length > 0:
             create_contexts_start = self.parent.start + self.create_contexts_offset
@@ -1245,13 +1280,15 @@ class CreateResponse(Response):
                 while next_cur:
                     cur.seekto(next_cur)
                     con_start = cur.copy()
-                    next_offset = cur.decode_uint32le()
-                    name_offset = cur.decode_uint16le()
-                    name_length = cur.decode_uint16le()
                     # Ignore Reserved
-                    cur.decode_uint16le()
-                    data_offset = cur.decode_uint16le()
-                    data_length = cur.decode_uint32le()
+                    (
+                        next_offset,
+                        name_offset,
+                        name_length,
+                        _,
+                        data_offset,
+                        data_length,
+                    ) = cur.decode_fields(self._context_header)
 
                     name = (con_start + name_offset).decode_bytes(name_length).tobytes()
 
@@ -2047,11 +2084,11 @@ class TimewarpTokenRequest(CreateRequestContext):
 class CloseRequest(Request):
     command_id = SMB2_CLOSE
     structure_size = 24
-
-    def __init__(self, parent):
-        Request.__init__(self, parent)
-        self.flags = 0
-        self.file_id = None
+    layout = (
+        core.Field("flags", "H"),
+        core.Field(None, "L"),
+        core.Field("file_id", "QQ", None),
+    )
 
     def _log_str(self):
         components = [
@@ -2062,13 +2099,6 @@ class CloseRequest(Request):
             components.append("({})".format(self.flags))
         return " ".join(components)
 
-    def _encode(self, cur):
-        cur.encode_uint16le(self.flags)
-        # Reserved
-        cur.encode_uint32le(0)
-        cur.encode_uint64le(self.file_id[0])
-        cur.encode_uint64le(self.file_id[1])
-
 
 class CloseFlags(core.FlagEnum):
     SMB2_CLOSE_FLAG_POSTQUERY_ATTRIB = 0x0001
@@ -2080,28 +2110,17 @@ CloseFlags.import_items(globals())
 class CloseResponse(Response):
     command_id = SMB2_CLOSE
     structure_size = 60
-
-    def __init__(self, parent):
-        Response.__init__(self, parent)
-        self.flags = 0
-        self.creation_time = 0
-        self.last_access_time = 0
-        self.last_write_time = 0
-        self.change_time = 0
-        self.allocation_size = 0
-        self.end_of_file = 0
-        self.file_attributes = 0
-
-    def _decode(self, cur):
-        self.flags = CloseFlags(cur.decode_uint16le())
-        self.reserved = cur.decode_uint32le()
-        self.creation_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_access_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_write_time = nttime.NtTime(cur.decode_uint64le())
-        self.change_time = nttime.NtTime(cur.decode_uint64le())
-        self.allocation_size = cur.decode_uint64le()
-        self.end_of_file = cur.decode_uint64le()
-        self.file_attributes = FileAttributes(cur.decode_uint32le())
+    layout = (
+        core.Field("flags", "H", type=CloseFlags),
+        core.Field("reserved", "L"),
+        core.Field("creation_time", "Q", type=nttime.NtTime),
+        core.Field("last_access_time", "Q", type=nttime.NtTime),
+        core.Field("last_write_time", "Q", type=nttime.NtTime),
+        core.Field("change_time", "Q", type=nttime.NtTime),
+        core.Field("allocation_size", "Q"),
+        core.Field("end_of_file", "Q"),
+        core.Field("file_attributes", "L", type=FileAttributes),
+    )
 
 
 class FileInformationClass(core.ValueEnum):
@@ -2152,6 +2171,7 @@ FileSystemInformationClass.import_items(globals())
 class QueryDirectoryRequest(Request):
     command_id = SMB2_QUERY_DIRECTORY
     structure_size = 33
+    _fixed = core.compile_struct("<BBLQQHHL")
 
     def __init__(self, parent):
         Request.__init__(self, parent)
@@ -2173,26 +2193,26 @@ class QueryDirectoryRequest(Request):
         return " ".join(components)
 
     def _encode(self, cur):
-        cur.encode_uint8le(self.file_information_class)
-        cur.encode_uint8le(self.flags)
-        cur.encode_uint32le(self.file_index)
-        cur.encode_uint64le(self.file_id[0])
-        cur.encode_uint64le(self.file_id[1])
-
-        file_name_offset_hole = cur.hole.encode_uint16le(0)
-        file_name_length_hole = cur.hole.encode_uint16le(0)
-
-        cur.encode_uint32le(self.output_buffer_length)
-
-        file_name_start = cur.copy()
-        file_name_offset_hole(file_name_start - self.parent.start)
-        cur.encode_utf16le(self.file_name)
-        file_name_length_hole(cur - file_name_start)
+        # File name immediately follows the fixed part
+        file_name = str(self.file_name).encode("utf-16le")
+        cur.encode_fields(
+            self._fixed,
+            self.file_information_class,
+            self.flags,
+            self.file_index,
+            self.file_id[0],
+            self.file_id[1],
+            cur - self.parent.start + self._fixed.size,
+            len(file_name),
+            self.output_buffer_length,
+        )
+        cur.encode_bytes(file_name)
 
 
 class QueryDirectoryResponse(Response):
     command_id = SMB2_QUERY_DIRECTORY
     structure_size = 9
+    _fixed = core.compile_struct("<HL")
 
     _file_info_map = {}
     file_information = core.Register(_file_info_map, "file_information_class")
@@ -2229,8 +2249,7 @@ class QueryDirectoryResponse(Response):
         self._entries.append(e)
 
     def _decode(self, cur):
-        output_buffer_offset = cur.decode_uint16le()
-        output_buffer_length = cur.decode_uint32le()
+        output_buffer_offset, output_buffer_length = cur.decode_fields(self._fixed)
 
         cur.advanceto(self.parent.start + output_buffer_offset)
 
@@ -2737,14 +2756,23 @@ class FileAllInformation(FileInformation):
         self.name_information = FileNameInformation()
 
     def _decode(self, cur):
-        for field in self.fields:
-            frame = getattr(self, field)
-            if isinstance(frame, core.Frame):
-                frame.decode(cur)
+        for field in (
+            "basic_information",
+            "standard_information",
+            "internal_information",
+            "ea_information",
+            "access_information",
+            "position_information",
+            "mode_information",
+            "alignment_information",
+            "name_information",
+        ):
+            getattr(self, field).decode(cur)
 
 
 class FileDirectoryInformation(FileInformation):
     file_information_class = FILE_DIRECTORY_INFORMATION
+    _fixed = core.compile_struct("<LLQQQQQQLL")
 
     def __init__(self, parent=None):
         FileInformation.__init__(self, parent)
@@ -2760,17 +2788,24 @@ class FileDirectoryInformation(FileInformation):
         self.file_name = None
 
     def _decode(self, cur):
-        next_offset = cur.decode_uint32le()
-        self.file_index = cur.decode_uint32le()
-        self.creation_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_access_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_write_time = nttime.NtTime(cur.decode_uint64le())
-        self.change_time = nttime.NtTime(cur.decode_uint64le())
-        self.end_of_file = cur.decode_uint64le()
-        self.allocation_size = cur.decode_uint64le()
-        self.file_attributes = FileAttributes(cur.decode_uint32le())
+        (
+            next_offset,
+            self.file_index,
+            creation_time,
+            last_access_time,
+            last_write_time,
+            change_time,
+            self.end_of_file,
+            self.allocation_size,
+            file_attributes,
+            file_name_length,
+        ) = cur.decode_fields(self._fixed)
+        self.creation_time = nttime.NtTime(creation_time)
+        self.last_access_time = nttime.NtTime(last_access_time)
+        self.last_write_time = nttime.NtTime(last_write_time)
+        self.change_time = nttime.NtTime(change_time)
+        self.file_attributes = FileAttributes(file_attributes)
 
-        file_name_length = cur.decode_uint32le()
         self.file_name = cur.decode_utf16le(file_name_length)
 
         if next_offset:
@@ -2781,6 +2816,7 @@ class FileDirectoryInformation(FileInformation):
 
 class FileFullDirectoryInformation(FileInformation):
     file_information_class = FILE_FULL_DIRECTORY_INFORMATION
+    _fixed = core.compile_struct("<LLQQQQQQLLL")
 
     def __init__(self, parent=None):
         FileInformation.__init__(self, parent)
@@ -2796,17 +2832,24 @@ class FileFullDirectoryInformation(FileInformation):
         self.file_name = None
 
     def _decode(self, cur):
-        next_offset = cur.decode_uint32le()
-        self.file_index = cur.decode_uint32le()
-        self.creation_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_access_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_write_time = nttime.NtTime(cur.decode_uint64le())
-        self.change_time = nttime.NtTime(cur.decode_uint64le())
-        self.end_of_file = cur.decode_uint64le()
-        self.allocation_size = cur.decode_uint64le()
-        self.file_attributes = FileAttributes(cur.decode_uint32le())
-        file_name_length = cur.decode_uint32le()
-        self.ea_size = cur.decode_uint32le()
+        (
+            next_offset,
+            self.file_index,
+            creation_time,
+            last_access_time,
+            last_write_time,
+            change_time,
+            self.end_of_file,
+            self.allocation_size,
+            file_attributes,
+            file_name_length,
+            self.ea_size,
+        ) = cur.decode_fields(self._fixed)
+        self.creation_time = nttime.NtTime(creation_time)
+        self.last_access_time = nttime.NtTime(last_access_time)
+        self.last_write_time = nttime.NtTime(last_write_time)
+        self.change_time = nttime.NtTime(change_time)
+        self.file_attributes = FileAttributes(file_attributes)
 
         self.file_name = cur.decode_utf16le(file_name_length)
         if next_offset:
@@ -2817,6 +2860,7 @@ class FileFullDirectoryInformation(FileInformation):
 
 class FileIdFullDirectoryInformation(FileInformation):
     file_information_class = FILE_ID_FULL_DIR_INFORMATION
+    _fixed = core.compile_struct("<LLQQQQQQLLLLQ")
 
     def __init__(self, parent=None):
         FileInformation.__init__(self, parent)
@@ -2834,19 +2878,26 @@ class FileIdFullDirectoryInformation(FileInformation):
         self.file_name = None
 
     def _decode(self, cur):
-        next_offset = cur.decode_uint32le()
-        self.file_index = cur.decode_uint32le()
-        self.creation_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_access_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_write_time = nttime.NtTime(cur.decode_uint64le())
-        self.change_time = nttime.NtTime(cur.decode_uint64le())
-        self.end_of_file = cur.decode_uint64le()
-        self.allocation_size = cur.decode_uint64le()
-        self.file_attributes = FileAttributes(cur.decode_uint32le())
-        file_name_length = cur.decode_uint32le()
-        self.ea_size = cur.decode_uint32le()
-        self.reserved = cur.decode_uint32le()
-        self.file_id = cur.decode_uint64le()
+        (
+            next_offset,
+            self.file_index,
+            creation_time,
+            last_access_time,
+            last_write_time,
+            change_time,
+            self.end_of_file,
+            self.allocation_size,
+            file_attributes,
+            file_name_length,
+            self.ea_size,
+            self.reserved,
+            self.file_id,
+        ) = cur.decode_fields(self._fixed)
+        self.creation_time = nttime.NtTime(creation_time)
+        self.last_access_time = nttime.NtTime(last_access_time)
+        self.last_write_time = nttime.NtTime(last_write_time)
+        self.change_time = nttime.NtTime(change_time)
+        self.file_attributes = FileAttributes(file_attributes)
 
         self.file_name = cur.decode_utf16le(file_name_length)
         if next_offset:
@@ -2857,6 +2908,8 @@ class FileIdFullDirectoryInformation(FileInformation):
 
 class FileIdBothDirectoryInformation(FileInformation):
     file_information_class = FILE_ID_BOTH_DIR_INFORMATION
+    _fixed = core.compile_struct("<LLQQQQQQLLLBB")
+    _fixed_tail = core.compile_struct("<HQ")
 
     def __init__(self, parent=None):
         FileInformation.__init__(self, parent)
@@ -2874,23 +2927,29 @@ class FileIdBothDirectoryInformation(FileInformation):
         self.file_name = None
 
     def _decode(self, cur):
-        next_offset = cur.decode_uint32le()
-        self.file_index = cur.decode_uint32le()
-        self.creation_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_access_time = nttime.NtTime(cur.decode_uint64le())
-        self.last_write_time = nttime.NtTime(cur.decode_uint64le())
-        self.change_time = nttime.NtTime(cur.decode_uint64le())
-        self.end_of_file = cur.decode_uint64le()
-        self.allocation_size = cur.decode_uint64le()
-        self.file_attributes = FileAttributes(cur.decode_uint32le())
+        (
+            next_offset,
+            self.file_index,
+            creation_time,
+            last_access_time,
+            last_write_time,
+            change_time,
+            self.end_of_file,
+            self.allocation_size,
+            file_attributes,
+            self.file_name_length,
+            self.ea_size,
+            self.short_name_length,
+            reserved,
+        ) = cur.decode_fields(self._fixed)
+        self.creation_time = nttime.NtTime(creation_time)
+        self.last_access_time = nttime.NtTime(last_access_time)
+        self.last_write_time = nttime.NtTime(last_write_time)
+        self.change_time = nttime.NtTime(change_time)
+        self.file_attributes = FileAttributes(file_attributes)
 
-        self.file_name_length = cur.decode_uint32le()
-        self.ea_size = cur.decode_uint32le()
-        self.short_name_length = cur.decode_uint8le()
-        reserved = cur.decode_uint8le()
         self.short_name = cur.decode_bytes(24)
-        reserved = cur.decode_uint16le()
-        self.file_id = cur.decode_uint64le()
+        reserved, self.file_id = cur.decode_fields(self._fixed_tail)
         self.file_name = cur.decode_utf16le(self.file_name_length)
 
         if next_offset:
@@ -3130,6 +3189,7 @@ class FileValidDataLengthInformation(FileInformation):
 
 class FileNamesInformation(FileInformation):
     file_information_class = FILE_NAMES_INFORMATION
+    _fixed = core.compile_struct("<LLL")
 
     def __init__(self, parent=None):
         FileInformation.__init__(self, parent)
@@ -3137,10 +3197,9 @@ class FileNamesInformation(FileInformation):
         self.file_name = None
 
     def _decode(self, cur):
-        next_entry_offset = cur.decode_uint32le()
-        self.file_index = cur.decode_uint32le()
-
-        file_name_length = cur.decode_uint32le()
+        next_entry_offset, self.file_index, file_name_length = cur.decode_fields(
+            self._fixed
+        )
         self.file_name = cur.decode_utf16le(file_name_length)
 
         if next_entry_offset:
@@ -3530,118 +3589,94 @@ BreakLeaseFlags.import_items(globals())
 class OplockBreakNotification(Notification):
     command_id = SMB2_OPLOCK_BREAK
     structure_size = 24
-
-    def __init__(self, parent):
-        Notification.__init__(self, parent)
-        self.oplock_level = 0
-        self.file_id = None
-
-    def _decode(self, cur):
-        self.oplock_level = OplockLevel(cur.decode_uint8le())
-        self.reserved1 = cur.decode_uint8le()
-        self.reserved2 = cur.decode_uint32le()
-        self.file_id = (cur.decode_uint64le(), cur.decode_uint64le())
+    layout = (
+        core.Field("oplock_level", "B", type=OplockLevel),
+        core.Field("reserved1", "B"),
+        core.Field("reserved2", "L"),
+        core.Field("file_id", "QQ", None),
+    )
 
 
 class LeaseBreakNotification(Notification):
     command_id = SMB2_OPLOCK_BREAK
     structure_size = 44
-
-    def __init__(self, parent):
-        Notification.__init__(self, parent)
-        self.new_epoch = 0
-        self.flags = 0
-        self.lease_key = 0
-        self.current_lease_state = 0
-        self.new_lease_state = 0
-
-    def _decode(self, cur):
-        self.new_epoch = cur.decode_uint16le()
-        self.flags = BreakLeaseFlags(cur.decode_uint32le())
-        self.lease_key = cur.decode_bytes(16)
-        self.current_lease_state = LeaseState(cur.decode_uint32le())
-        self.new_lease_state = LeaseState(cur.decode_uint32le())
-        self.break_reason = cur.decode_uint32le()
-        self.access_mask_hint = cur.decode_uint32le()
-        self.share_mask_hint = cur.decode_uint32le()
+    layout = (
+        core.Field("new_epoch", "H"),
+        core.Field("flags", "L", type=BreakLeaseFlags),
+        core.Field("lease_key", "16s"),
+        core.Field("current_lease_state", "L", type=LeaseState),
+        core.Field("new_lease_state", "L", type=LeaseState),
+        core.Field("break_reason", "L"),
+        core.Field("access_mask_hint", "L"),
+        core.Field("share_mask_hint", "L"),
+    )
 
 
 class OplockBreakAcknowledgement(Request):
     command_id = SMB2_OPLOCK_BREAK
     structure_size = 24
-
-    def __init__(self, parent):
-        Request.__init__(self, parent)
-        self.oplock_level = 0
-        self.file_id = None
-
-    def _encode(self, cur):
-        cur.encode_uint8le(self.oplock_level)
-        # Reserved
-        cur.encode_uint8le(0)
-        # Reserved2
-        cur.encode_uint32le(0)
-        cur.encode_uint64le(self.file_id[0])
-        cur.encode_uint64le(self.file_id[1])
+    layout = (
+        core.Field("oplock_level", "B"),
+        # Reserved, Reserved2
+        core.Field(None, "B"),
+        core.Field(None, "L"),
+        core.Field("file_id", "QQ", None),
+    )
 
 
 class LeaseBreakAcknowledgement(Request):
     command_id = SMB2_OPLOCK_BREAK
     structure_size = 36
-
-    def __init__(self, parent):
-        Request.__init__(self, parent)
-        self.flags = 0
-        self.lease_key = 0
-        self.lease_state = 0
-
-    def _encode(self, cur):
-        # Reserved
-        cur.encode_uint16le(0)
-        cur.encode_uint32le(self.flags)
-        cur.encode_bytes(self.lease_key)
-        cur.encode_uint32le(self.lease_state)
+    layout = (
+        core.Field(None, "H"),
+        core.Field("flags", "L"),
+        core.Field("lease_key", "16s"),
+        core.Field("lease_state", "L"),
         # LeaseDuration is reserved
-        cur.encode_uint64le(0)
+        core.Field(None, "Q"),
+    )
 
 
 class OplockBreakResponse(Response):
     command_id = SMB2_OPLOCK_BREAK
     structure_size = 24
-
-    def __init__(self, parent):
-        Response.__init__(self, parent)
-        self.oplock_level = 0
-        self.file_id = 0
-
-    def _decode(self, cur):
-        self.oplock_level = OplockLevel(cur.decode_uint8le())
-        self.reserved1 = cur.decode_uint8le()
-        self.reserved2 = cur.decode_uint32le()
-        self.file_id = (cur.decode_uint64le(), cur.decode_uint64le())
+    layout = (
+        core.Field("oplock_level", "B", type=OplockLevel),
+        core.Field("reserved1", "B"),
+        core.Field("reserved2", "L"),
+        core.Field("file_id", "QQ", 0),
+    )
 
 
 class LeaseBreakResponse(Response):
     command_id = SMB2_OPLOCK_BREAK
     structure_size = 36
-
-    def __init__(self, parent):
-        Response.__init__(self, parent)
-        self.flags = 0
-        self.lease_key = 0
-        self.lease_state = 0
-
-    def _decode(self, cur):
-        self.reserved = cur.decode_uint16le()
-        self.flags = BreakLeaseFlags(cur.decode_uint32le())
-        self.lease_key = cur.decode_bytes(16)
-        self.lease_state = LeaseState(cur.decode_uint32le())
-        self.lease_duration = cur.decode_uint64le()
+    layout = (
+        core.Field("reserved", "H"),
+        core.Field("flags", "L", type=BreakLeaseFlags),
+        core.Field("lease_key", "16s"),
+        core.Field("lease_state", "L", type=LeaseState),
+        core.Field("lease_duration", "Q"),
+    )
 
 
 class ReadRequest(Request):
+    __slots__ = (
+        "length",
+        "offset",
+        "minimum_count",
+        "remaining_bytes",
+        "file_id",
+        "padding",
+        "reserved",
+        "channel",
+        "read_channel_info_offset",
+        "read_channel_info_length",
+        "buffer",
+    )
     command_id = SMB2_READ
     structure_size = 49
+    _fixed = core.compile_struct("<BBLQQQLLLHHB")
 
     def __init__(self, parent):
         Request.__init__(self, parent)
@@ -3666,47 +3701,48 @@ class ReadRequest(Request):
             ]
         )
 
-    def _encode(self, cur):
-        # Padding
-        cur.encode_uint8le(self.padding)
-        # Reserved
-        cur.encode_uint8le(self.reserved)
-        cur.encode_uint32le(self.length)
-        cur.encode_uint64le(self.offset)
-        cur.encode_uint64le(self.file_id[0])
-        cur.encode_uint64le(self.file_id[1])
-        cur.encode_uint32le(self.minimum_count)
-        # Channel
-        cur.encode_uint32le(self.channel)
-
-        cur.encode_uint32le(self.remaining_bytes)
+    def size_hint(self):
+        return 2 + self._fixed.size
 
-        # ReadChannelInfoLength
+    def _encode(self, cur):
         if self.read_channel_info_offset is None:
             self.read_channel_info_offset = 0
-        cur.encode_uint16le(self.read_channel_info_offset)
-
-        # ReadChannelInfoLength
         if self.read_channel_info_length is None:
             self.read_channel_info_length = 0
-        cur.encode_uint16le(self.read_channel_info_length)
 
-        # Buffer
-        cur.encode_uint8le(self.buffer)
+        cur.encode_fields(
+            self._fixed,
+            self.padding,
+            self.reserved,
+            self.length,
+            self.offset,
+            self.file_id[0],
+            self.file_id[1],
+            self.minimum_count,
+            self.channel,
+            self.remaining_bytes,
+            self.read_channel_info_offset,
+            self.read_channel_info_length,
+            self.buffer,
+        )
 
 
 class ReadResponse(Response):
+    __slots__ = ("offset", "reserved", "length", "data_remaining", "reserved2", "data")
     command_id = SMB2_READ
     structure_size = 17
+    layout = (
+        core.Field("offset", "B"),
+        core.Field("reserved", "B"),
+        core.Field("length", "L"),
+        core.Field("data_remaining", "L"),
+        core.Field("reserved2", "L"),
+    )
 
     def __init__(self, parent):
         Response.__init__(self, parent)
-        self.offset = 0
-        self.length = 0
+        # memoryview into the receive buffer, see core.Cursor.decode_view
         self.data = None
-        self.reserved = 0
-        self.data_remaining = 0
-        self.reserved2 = 0
 
     def _log_str(self):
         return " ".join(
@@ -3716,17 +3752,11 @@ class ReadResponse(Response):
             ]
         )
 
-    def _decode(self, cur):
-        self.offset = cur.decode_uint8le()
-        self.reserved = cur.decode_uint8le()
-        self.length = cur.decode_uint32le()
-        self.data_remaining = cur.decode_uint32le()
-        self.reserved2 = cur.decode_uint32le()
-
+    def _decode_tail(self, cur):
         # Advance to data
         cur.advanceto(self.parent.start + self.offset)
 
-        self.data = cur.decode_bytes(self.length)
+        self.data = cur.decode_view(self.length)
 
 
 # Flag constants
@@ -3738,8 +3768,24 @@ WriteFlags.import_items(globals())
 
 
 class WriteRequest(Request):
+    __slots__ = (
+        "offset",
+        "file_id",
+        "remaining_bytes",
+        "flags",
+        "buffer",
+        "data_offset",
+        "length",
+        "channel",
+        "write_channel_info_offset",
+        "write_channel_info_length",
+        "_detach_buffer",
+    )
     command_id = SMB2_WRITE
     structure_size = 49
+    _fixed = core.compile_struct("<HLQQQLLHHL")
+    # SMB2 header, StructureSize and the fixed part
+    natural_data_offset = 64 + 2 + _fixed.size
 
     def __init__(self, parent):
         Request.__init__(self, parent)
@@ -3753,6 +3799,8 @@ class WriteRequest(Request):
         self.channel = 0
         self.write_channel_info_offset = 0
         self.write_channel_info_length = 0
+        # Set by Netbios.serialize_segments to leave the payload out
+        self._detach_buffer = False
 
     def _log_str(self):
         components = [super(WriteRequest, self)._log_str()]
@@ -3762,49 +3810,52 @@ class WriteRequest(Request):
             components.append("({}@{})".format(len(self.buffer), self.offset))
         return " ".join(components)
 
+    def size_hint(self):
+        size = 2 + self._fixed.size
+        if self.buffer and not self._detach_buffer:
+            size += len(self.buffer)
+        return size
+
     def _encode(self, cur):
-        # Encode 0 for buffer offset for now
-        buf_ofs = cur.hole.encode_uint16le(0)
         if self.length == None and self.buffer != None:
-            cur.encode_uint32le(len(self.buffer))
+            length = len(self.buffer)
         elif self.buffer == None:
-            cur.encode_uint32le(0)
+            length = 0
         else:
-            cur.encode_uint32le(self.length)
-        cur.encode_uint64le(self.offset)
-        cur.encode_uint64le(self.file_id[0])
-        cur.encode_uint64le(self.file_id[1])
-        # Channel
-        cur.encode_uint32le(self.channel)
-        # RemainingBytes
-        cur.encode_uint32le(self.remaining_bytes)
-        # WriteChannelInfoOffset
-        cur.encode_uint16le(self.write_channel_info_offset)
-        # WriteChannelInfoLength:
-        cur.encode_uint16le(self.write_channel_info_length)
-        # Flags
-        cur.encode_uint32le(self.flags)
-        # Go back and set buffer offset
+            length = self.length
 
+        # Data immediately follows the fixed part
         if self.data_offset is None:
-            self.data_offset = cur - self.parent.start
-        buf_ofs(self.data_offset)
+            self.data_offset = cur - self.parent.start + self._fixed.size
+
+        cur.encode_fields(
+            self._fixed,
+            self.data_offset,
+            length,
+            self.offset,
+            self.file_id[0],
+            self.file_id[1],
+            self.channel,
+            self.remaining_bytes,
+            self.write_channel_info_offset,
+            self.write_channel_info_length,
+            self.flags,
+        )
 
-        if self.buffer:
+        if self.buffer and not self._detach_buffer:
             cur.encode_bytes(self.buffer)
 
 
 class WriteResponse(Response):
     command_id = SMB2_WRITE
     structure_size = 17
-
-    def __init__(self, parent):
-        Response.__init__(self, parent)
-        self.count = 0
-        self.reserved = 0
-        self.remaining = 0
-        self.write_channel_info_offset = 0
-        self.write_channel_info_length = 0
+    layout = (
+        core.Field("reserved", "H"),
+        core.Field("count", "L"),
+        core.Field("remaining", "L"),
+        core.Field("write_channel_info_offset", "H"),
+        core.Field("write_channel_info_length", "H"),
+    )
 
     def _log_str(self):
         components = [
@@ -3815,13 +3866,6 @@ class WriteResponse(Response):
             components.append("(remaining {})".format(self.remaining))
         return " ".join(components)
 
-    def _decode(self, cur):
-        self.reserved = cur.decode_uint16le()
-        self.count = cur.decode_uint32le()
-        self.remaining = cur.decode_uint32le()
-        self.write_channel_info_offset = cur.decode_uint16le()
-        self.write_channel_info_length = cur.decode_uint16le()
-
 
 class LockFlags(core.FlagEnum):
     SMB2_LOCKFLAG_SHARED_LOCK = 0x00000001
@@ -3870,12 +3914,7 @@ class LockRequest(Request):
 class LockResponse(Response):
     command_id = SMB2_LOCK
     structure_size = 4
-
-    def __init__(self, parent):
-        Response.__init__(self, parent)
-
-    def _decode(self, cur):
-        self.reserved = cur.decode_uint16le()
+    layout = (core.Field("reserved", "H"),)
 
 
 class IoctlCode(core.ValueEnum):
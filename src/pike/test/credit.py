@@ -101,10 +101,13 @@ class CreditTest(pike.test.PikeTest):
     # set the default credit request to 1 to make things more predictable
     def setUp(self):
         self.prev_default_credit_request = pike.model.default_credit_request
+        self.prev_default_credit_policy = pike.model.default_credit_policy
         pike.model.default_credit_request = 1
+        pike.model.default_credit_policy = pike.model.CreditPolicy
 
     def tearDown(self):
         pike.model.default_credit_request = self.prev_default_credit_request
+        pike.model.default_credit_policy = self.prev_default_credit_policy
 
     def generic_mc_write_mc_read(self, file_size, write_size, read_size):
         """
@@ -28,11 +28,18 @@ from errno import (
     EWOULDBLOCK,
     EAGAIN,
 )
+import heapq
+import itertools
+import math
 import select
 import socket
 import time
 
 _reraised_exceptions = (KeyboardInterrupt, SystemExit)
+# timers are scheduled on a clock that does not jump with the wall clock
+_monotonic = getattr(time, "monotonic", time.time)
+# Python 2 does not expose EPOLLRDHUP; the value is fixed by Linux
+_EPOLLRDHUP = getattr(select, "EPOLLRDHUP", 0x2000)
 
 
 class Transport(object):
@@ -124,25 +131,79 @@ class Transport(object):
                 raise
         return result
 
+    def sendmsg(self, buffers):
+        """
+        send a sequence of buffers over the connection with a single system
+        call, without joining them first. if the socket would block,
+        schedule this Transport to be notified when the socket is available
+        for writing. handle_write will be called in this case.
+
+        On platforms without socket.sendmsg only the first buffer is sent.
+
+        returns the number of bytes sent or zero if the write would block
+        """
+        if not hasattr(self.socket, "sendmsg"):
+            return self.send(buffers[0])
+        result = 0
+        try:
+            result = self.socket.sendmsg(buffers)
+        except socket.error as err:
+            if err.errno == EAGAIN:
+                # reschedule the send when the socket is ready
+                self.poller.defer_write(self)
+            else:
+                # raise non-retryable errors
+                raise
+        return result
+
     def recv(self, bufsize):
         """
-        recv bufsize bytes over the connection. if the socket would block,
-        then return an empty buffer. When the socket is available for reading
-        handle_read will be called.
+        recv up to bufsize bytes over the connection. if the socket would
+        block, then return an empty buffer. When the socket is available for
+        reading handle_read will be called.
 
         returns a string representing the bytes received
         """
-        result = ""
+        result = b""
         try:
             result = self.socket.recv(bufsize)
-            if result == "":
+            if not result:
                 raise EOFError("Remote host closed connection")
+            if len(result) < bufsize:
+                # a short read drained the socket; edge-triggered pollers
+                # are notified again when more data arrives, so the
+                # extra recv that would fail with EAGAIN is skipped
+                self.poller.clear_readable(self)
         except socket.error as err:
             # raise non-retryable errors
             if err.errno != EAGAIN:
                 raise
+            # the socket is drained; edge-triggered pollers wait for the
+            # next notification before calling handle_read again
+            self.poller.clear_readable(self)
         return result
 
+    def recv_into(self, buffer):
+        """
+        recv up to len(buffer) bytes over the connection directly into
+        buffer, which must be a non-empty writable buffer such as a
+        memoryview. if the socket would block, then no bytes are received.
+
+        returns the number of bytes received
+        """
+        count = 0
+        try:
+            count = self.socket.recv_into(buffer)
+            if not count:
+                raise EOFError("Remote host closed connection")
+            if count < len(buffer):
+                self.poller.clear_readable(self)
+        except socket.error as err:
+            if err.errno != EAGAIN:
+                raise
+            self.poller.clear_readable(self)
+        return count
+
     def handle_connect_event(self):
         """
         called internally when the socket becomes connected
@@ -198,6 +259,33 @@ class Transport(object):
         pass
 
 
+class Timer(object):
+    """
+    A callback scheduled with L{BasePoller.call_at} or L{BasePoller.call_later}
+    """
+
+    __slots__ = ("when", "callback", "args", "cancelled", "_poller")
+
+    def __init__(self, poller, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self._poller = poller
+
+    def cancel(self):
+        """
+        prevent the callback from running. cancelling a timer which already
+        ran or was cancelled has no effect.
+        """
+        if not self.cancelled:
+            self.cancelled = True
+            self.callback = self.args = None
+            if self._poller is not None:
+                self._poller._timer_cancelled()
+                self._poller = None
+
+
 class BasePoller(object):
     """
     A poller is an underlying event monitoring system. This generic class
@@ -220,6 +308,9 @@ class BasePoller(object):
         """
         self.connections = {}
         self.deferred_writers = set()
+        self._timers = []
+        self._timer_seq = itertools.count()
+        self._cancelled_timers = 0
 
     def add_channel(self, transport):
         """
@@ -247,30 +338,129 @@ class BasePoller(object):
         """
         self.deferred_writers.add(transport._fileno)
 
+    def clear_readable(self, transport):
+        """
+        called by the transport when a read would block.
+
+        level-triggered pollers are notified again whenever data is
+        available and can ignore this.
+        """
+        pass
+
+    def time(self):
+        """
+        return the current time on the clock used by L{call_at}
+        """
+        return _monotonic()
+
+    def call_at(self, when, callback, *args):
+        """
+        schedule callback(*args) to run from the poll iteration following
+        the time when, as returned by L{time}.
+
+        poll never blocks past the earliest scheduled timer.
+
+        returns a L{Timer} which may be cancelled
+        """
+        timer = Timer(self, when, callback, args)
+        heapq.heappush(self._timers, (when, next(self._timer_seq), timer))
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        """
+        schedule callback(*args) to run after delay seconds
+
+        returns a L{Timer} which may be cancelled
+        """
+        return self.call_at(self.time() + delay, callback, *args)
+
+    def _timer_cancelled(self):
+        # cancelled timers stay in the heap until they expire; rebuild it
+        # when they make up most of it
+        self._cancelled_timers += 1
+        if (
+            self._cancelled_timers > 64
+            and self._cancelled_timers > len(self._timers) // 2
+        ):
+            self._timers = [entry for entry in self._timers if not entry[2].cancelled]
+            heapq.heapify(self._timers)
+            self._cancelled_timers = 0
+
+    def timer_timeout(self, timeout):
+        """
+        return the time poll may block for given the requested timeout,
+        shortened to the delay until the earliest timer
+        """
+        timers = self._timers
+        while timers and timers[0][2].cancelled:
+            heapq.heappop(timers)
+            self._cancelled_timers -= 1
+        if not timers:
+            return timeout
+        delay = max(timers[0][0] - self.time(), 0)
+        if timeout is None or delay < timeout:
+            return delay
+        return timeout
+
+    def run_timers(self):
+        """
+        run the callbacks of all timers which are due. timers scheduled by
+        these callbacks run in a later iteration.
+        """
+        timers = self._timers
+        if not timers:
+            return
+        now = self.time()
+        ready = []
+        while timers and timers[0][0] <= now:
+            timer = heapq.heappop(timers)[2]
+            if timer.cancelled:
+                self._cancelled_timers -= 1
+            else:
+                # no longer in the heap
+                timer._poller = None
+                ready.append(timer)
+        for timer in ready:
+            # an earlier callback may have cancelled this one
+            if not timer.cancelled:
+                callback, args = timer.callback, timer.args
+                timer.cancel()
+                callback(*args)
+
     def loop(self, timeout=None, count=None):
         """
         enter the async event loop for the given timeout or number of iterations
+
+        each iteration blocks until an event arrives or the timeout expires.
+        when only a count is given, iterations do not block.
         """
         start = time.time()
         complete_iterations = 0
         while True:
             if count is not None and complete_iterations >= count:
                 break
-            self.poll()
+            if timeout is not None:
+                self.poll(max(start + timeout - time.time(), 0))
+            else:
+                self.poll(0 if count is not None else None)
             if timeout is not None and time.time() > start + timeout:
                 break
             complete_iterations += 1
 
-    def poll(self):
+    def poll(self, timeout=0):
         """
         Must be implemented by subclasses to execute a single iteration of the
-        event loop. Based on the outcome of the events, the following actions
-        MUST be performed
+        event loop, waiting up to timeout seconds for an event to arrive
+        (forever if timeout is None, not at all if it is 0). Based on the
+        outcome of the events, the following actions MUST be performed
+
+            * the timeout is passed through timer_timeout before waiting
 
             * process_readables is called with a list of file descriptors which
               have data available for reading
             * process_writables is called with a list of file descriptors which
               have data available for writing
+            * run_timers is called last
         """
         raise NotImplementedError("BasePoller does not have a polling mechanism")
 
@@ -371,8 +561,9 @@ class KQueuePoller(BasePoller):
         ]
         self.kq.control(events, 0)
 
-    def poll(self):
-        events = self.kq.control(None, self.batch_size, 0)
+    def poll(self, timeout=0):
+        timeout = self.timer_timeout(timeout)
+        events = self.kq.control(None, self.batch_size, timeout)
         readables = []
         writables = []
         for ev in events:
@@ -382,6 +573,7 @@ class KQueuePoller(BasePoller):
                 writables.append(ev.ident)
         self.process_readables(readables)
         self.process_writables(writables)
+        self.run_timers()
 
 
 class SelectPoller(BasePoller):
@@ -391,15 +583,17 @@ class SelectPoller(BasePoller):
     Roughly equivalent performance to using asyncore
     """
 
-    def poll(self):
+    def poll(self, timeout=0):
+        timeout = self.timer_timeout(timeout)
         non_connected = [
             t._fileno for t in self.connections.values() if not t.connected
         ]
         readers = list(self.connections.keys())
         writers = non_connected + list(self.deferred_writers)
-        readables, writables, _ = select.select(readers, writers, [], 0)
+        readables, writables, _ = select.select(readers, writers, [], timeout)
         self.process_readables(readables)
         self.process_writables(writables)
+        self.run_timers()
 
 
 class PollPoller(BasePoller):
@@ -432,8 +626,13 @@ class PollPoller(BasePoller):
         super(PollPoller, self).defer_write(transport)
         self.p.modify(transport._fileno, self.read_events | self.write_events)
 
-    def poll(self):
-        events = self.p.poll(0)
+    def poll(self, timeout=0):
+        # select.poll takes milliseconds; round up so a short remaining
+        # timeout does not turn into a busy loop
+        timeout = self.timer_timeout(timeout)
+        if timeout is not None:
+            timeout = int(math.ceil(timeout * 1000))
+        events = self.p.poll(timeout)
         readables = []
         writables = []
         for fd, event in events:
@@ -444,19 +643,99 @@ class PollPoller(BasePoller):
                 self.p.modify(fd, self.read_events)
         self.process_readables(readables)
         self.process_writables(writables)
+        self.run_timers()
+
+
+class EpollPoller(BasePoller):
+    """
+    Implementation of edge-triggered epoll, available on Linux
+
+    Each socket is registered once for both read and write events.
+    Since notifications are only delivered on state changes, a socket
+    that reported input stays readable, and handle_read is called on
+    every iteration, until a recv on it would block.  Write interest
+    is one-shot: defer_write re-arms the registration, which reports
+    the socket again if it is already writable.
+    """
+
+    def __init__(self):
+        super(EpollPoller, self).__init__()
+        self.ep = select.epoll()
+        self.readable = set()
+        self.read_events = (
+            select.EPOLLIN
+            | select.EPOLLPRI
+            | select.EPOLLERR
+            | select.EPOLLHUP
+            | _EPOLLRDHUP
+        )
+        self.write_events = select.EPOLLOUT
+        self.events = self.read_events | self.write_events | select.EPOLLET
+
+    def add_channel(self, transport):
+        super(EpollPoller, self).add_channel(transport)
+        self.ep.register(transport._fileno, self.events)
+
+    def del_channel(self, transport):
+        super(EpollPoller, self).del_channel(transport)
+        self.readable.discard(transport._fileno)
+        self.deferred_writers.discard(transport._fileno)
+        try:
+            self.ep.unregister(transport._fileno)
+        except (IOError, OSError, ValueError):
+            # closing the socket already removed it from the epoll set
+            pass
+
+    def defer_write(self, transport):
+        super(EpollPoller, self).defer_write(transport)
+        self.ep.modify(transport._fileno, self.events)
+
+    def clear_readable(self, transport):
+        self.readable.discard(transport._fileno)
+
+    def poll(self, timeout=0):
+        timeout = self.timer_timeout(timeout)
+        if self.readable:
+            # do not block while a socket still has unread input
+            timeout = 0
+        elif timeout is None:
+            timeout = -1
+        else:
+            # Python 2 truncates to milliseconds, waking before a timer
+            # is due; round up as Python 3 does
+            timeout = math.ceil(timeout * 1000) / 1000.0
+        writables = []
+        for fd, event in self.ep.poll(timeout):
+            if event & self.read_events:
+                self.readable.add(fd)
+            if event & self.write_events and (
+                fd in self.deferred_writers or not self.connections[fd].connected
+            ):
+                writables.append(fd)
+        self.process_readables(list(self.readable))
+        self.process_writables(writables)
+        self.run_timers()
+
+
+def new_poller():
+    """
+    Return a new poller using the best polling mechanism available on the
+    system.
+    """
+    if hasattr(select, "kqueue"):
+        return KQueuePoller()
+    elif hasattr(select, "epoll"):
+        return EpollPoller()
+    elif hasattr(select, "poll"):
+        return PollPoller()
+    return SelectPoller()
 
 
 # Global poller / loop function for simple use cases
 # more advanced tests or frameworks may use a custom
 # poller implementation by setting a poller object onto
 # a group of transports.
-# The global poller will use the best polling mechanism available on the system
-if hasattr(select, "kqueue"):
-    poller = KQueuePoller()
-elif hasattr(select, "poll"):
-    poller = PollPoller()
-else:
-    poller = SelectPoller()
+poller = new_poller()
 
 
 def loop(timeout=None, count=None):
@@ -0,0 +1,10 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+
+import sys
+
+# asyncio support uses Python 3 only syntax
+collect_ignore = ["test_aio.py"] if sys.version_info < (3, 5) else []
@@ -0,0 +1,179 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+
+import asyncio
+import struct
+
+import pytest
+
+import pike.aio as aio
+import pike.exceptions as exceptions
+import pike.model as model
+import pike.ntstatus as ntstatus
+import pike.smb2 as smb2
+
+
+def echo_response(message_id):
+    packet = struct.pack(
+        "<4sHHLHHLLQQQ16sHH",
+        b"\xfeSMB",
+        64,
+        1,
+        ntstatus.STATUS_SUCCESS,
+        smb2.SMB2_ECHO,
+        1,
+        smb2.SMB2_FLAGS_SERVER_TO_REDIR,
+        0,
+        message_id,
+        0,
+        0,
+        b"\0" * 16,
+        4,
+        0,
+    )
+    return struct.pack(">L", len(packet)) + packet
+
+
+class EchoServer(asyncio.Protocol):
+    """Answers every SMB2 request with an ECHO response"""
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.buf = b""
+
+    def data_received(self, data):
+        self.buf += data
+        while len(self.buf) >= 4:
+            size = 4 + struct.unpack(">L", self.buf[:4])[0]
+            if len(self.buf) < size:
+                break
+            command, message_id = struct.unpack("<H10xQ", self.buf[16 : 4 + 32])
+            self.buf = self.buf[size:]
+            self.handle_request(command, message_id)
+
+    def handle_request(self, command, message_id):
+        self.transport.write(echo_response(message_id))
+
+
+class SilentServer(EchoServer):
+    """Records the command of every SMB2 request and never answers"""
+
+    commands = []
+
+    def handle_request(self, command, message_id):
+        self.commands.append(command)
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def echo(conn):
+    smb_req = conn.request()
+    smb2.EchoRequest(smb_req)
+    smb_req.credit_charge = 1
+    return conn.submit(smb_req.parent)[0]
+
+
+def test_await_completed_future():
+    async def main():
+        future = model.Future()
+        future(42)
+        return await future
+
+    assert run(main()) == 42
+
+
+def test_await_failed_future():
+    async def main():
+        future = model.Future()
+        asyncio.get_event_loop().call_soon(future, ValueError("boom"))
+        await future
+
+    with pytest.raises(ValueError):
+        run(main())
+
+
+def test_async_connection_interleaves_requests():
+    async def main():
+        loop = asyncio.get_event_loop()
+        server = await loop.create_server(EchoServer, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = model.Client()
+        conn = await aio.connect(client, "127.0.0.1", port)
+        assert isinstance(conn, aio.AsyncConnection)
+        responses = await asyncio.gather(*[echo(conn) for _ in range(50)])
+        conn.close()
+        server.close()
+        await server.wait_closed()
+        return responses
+
+    responses = run(main())
+    assert len(responses) == 50
+    assert sorted(res.message_id for res in responses) == list(range(50))
+    assert all(isinstance(res[0], smb2.EchoResponse) for res in responses)
+
+
+def test_async_connect_failure():
+    async def main():
+        loop = asyncio.get_event_loop()
+        server = await loop.create_server(EchoServer, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+        await aio.connect(model.Client(), "127.0.0.1", port)
+
+    with pytest.raises(OSError):
+        run(main())
+
+
+def test_async_request_deadline():
+    async def main():
+        loop = asyncio.get_event_loop()
+        server = await loop.create_server(SilentServer, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        conn = await aio.connect(model.Client(), "127.0.0.1", port)
+        smb_req = conn.request()
+        smb2.EchoRequest(smb_req)
+        smb_req.credit_charge = 1
+        future = conn.submit(smb_req.parent, timeout=0.05)[0]
+        try:
+            with pytest.raises(exceptions.TimeoutError):
+                await asyncio.wait_for(future, 2)
+            # the expired request is cancelled on the server
+            while len(SilentServer.commands) < 2:
+                await asyncio.sleep(0.01)
+        finally:
+            conn.close()
+            server.close()
+            await server.wait_closed()
+
+    del SilentServer.commands[:]
+    run(main())
+    assert SilentServer.commands == [smb2.SMB2_ECHO, smb2.SMB2_CANCEL]
+
+
+def test_async_keepalive():
+    async def main():
+        loop = asyncio.get_event_loop()
+        server = await loop.create_server(EchoServer, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        conn = await aio.connect(model.Client(), "127.0.0.1", port)
+        sent = []
+        conn.register_callback(model.EV_REQ_POST_SERIALIZE, sent.append)
+        conn.keepalive(0.01)
+        await asyncio.sleep(0.2)
+        conn.keepalive(None)
+        conn.close()
+        server.close()
+        await server.wait_closed()
+        return sent
+
+    assert len(run(main())) >= 3
@@ -0,0 +1,478 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+
+import array
+import struct
+import sys
+
+import pytest
+
+import pike.core as core
+import pike.netbios as netbios
+import pike.ntstatus as ntstatus
+import pike.smb2 as smb2
+
+
+def smb2_response(command, body, message_id=1, flags=0, async_id=None, tree_id=0):
+    """
+    Build a netbios-framed SMB2 response buffer around the given body
+    """
+    flags |= smb2.SMB2_FLAGS_SERVER_TO_REDIR
+    if async_id is not None:
+        flags |= smb2.SMB2_FLAGS_ASYNC_COMMAND
+        pid_tid = async_id
+    else:
+        pid_tid = 0xFEFF | tree_id << 32
+    header = struct.pack(
+        "<4sHHLHHLLQQQ16s",
+        b"\xfeSMB",
+        64,
+        1,
+        ntstatus.STATUS_SUCCESS,
+        command,
+        1,
+        flags,
+        0,
+        message_id,
+        pid_tid,
+        0x1234,
+        b"\0" * 16,
+    )
+    packet = header + body
+    return array.array("B", struct.pack(">L", len(packet)) + packet)
+
+
+def test_compile_struct_cached():
+    assert core.compile_struct("<QL") is core.compile_struct("<QL")
+    assert core.compile_struct("<QL").size == 12
+
+
+def test_encode_decode_fields():
+    st = core.compile_struct("<BHLQ")
+    buf = array.array("B")
+    cur = core.Cursor(buf, 0)
+    cur.encode_uint8le(0xAA)
+    cur.encode_fields(st, 1, 2, 3, 4)
+    assert cur.offset == 1 + st.size
+    assert buf.tobytes() == b"\xaa" + struct.pack("<BHLQ", 1, 2, 3, 4)
+
+    cur = core.Cursor(buf, 1)
+    assert cur.decode_fields(st) == (1, 2, 3, 4)
+    assert cur.offset == len(buf)
+
+
+def test_encode_fields_hole():
+    st = core.compile_struct("<HH")
+    buf = array.array("B")
+    cur = core.Cursor(buf, 0)
+    hole = cur.hole.encode_fields(st, 0, 0)
+    cur.encode_uint32le(0xFFFFFFFF)
+    hole(st, 7, 9)
+    assert buf.tobytes() == struct.pack("<HHL", 7, 9, 0xFFFFFFFF)
+
+
+def test_decode_fields_bounds():
+    st = core.compile_struct("<Q")
+    buf = array.array("B", b"\0" * 12)
+    cur = core.Cursor(buf, 0)
+    with cur.bounded(cur, cur + 4):
+        with pytest.raises(core.BufferOverrun):
+            cur.decode_fields(st)
+    assert cur.offset == 0
+
+
+@pytest.mark.parametrize(
+    "async_id,tree_id", ((None, 0), (None, 0x11223344), (0xDEADBEEF01, None))
+)
+def test_smb2_header_decode(async_id, tree_id):
+    body = struct.pack("<HHLLHH", 17, 0, 42, 0, 0, 0)
+    nb = netbios.Netbios()
+    nb.parse(
+        smb2_response(
+            smb2.SMB2_WRITE, body, message_id=77, async_id=async_id, tree_id=tree_id
+        )
+    )
+    smb_res = nb[0]
+    assert smb_res.command == smb2.SMB2_WRITE
+    assert smb_res.status == ntstatus.STATUS_SUCCESS
+    assert smb_res.credit_response == 1
+    assert smb_res.message_id == 77
+    assert smb_res.session_id == 0x1234
+    assert smb_res.async_id == async_id
+    assert smb_res.tree_id == tree_id
+    assert isinstance(smb_res[0], smb2.WriteResponse)
+    assert smb_res[0].count == 42
+
+
+def test_smb2_header_encode():
+    smb_req = smb2.Smb2(netbios.Netbios())
+    smb_req.credit_charge = 1
+    smb_req.credit_request = 10
+    smb_req.channel_sequence = 3
+    smb_req.message_id = 5
+    smb_req.tree_id = 0x11223344
+    smb_req.session_id = 0x1234
+    read_req = smb2.ReadRequest(smb_req)
+    read_req.length = 4096
+    read_req.offset = 8192
+    read_req.file_id = (1, 2)
+    buf = smb_req.serialize()
+    assert buf[:48].tobytes() == struct.pack(
+        "<4sHHLHHLLQQQ",
+        b"\xfeSMB",
+        64,
+        1,
+        3,
+        smb2.SMB2_READ,
+        10,
+        0,
+        0,
+        5,
+        0xFEFF | 0x11223344 << 32,
+        0x1234,
+    )
+    assert buf[64:].tobytes() == struct.pack(
+        "<HBBLQQQLLLHHB", 49, 0, 0, 4096, 8192, 1, 2, 0, 0, 0, 0, 0, 0
+    )
+
+
+class LayoutFrame(core.Frame):
+    layout = (
+        core.Field("flags", "H", 0x5),
+        core.Field(None, "L", 0xFFFFFFFF),
+        core.Field("file_id", "QQ", None),
+        core.Field("key", "4s"),
+        core.Field("level", "B", type=smb2.OplockLevel),
+    )
+
+    def _encode_tail(self, cur):
+        cur.encode_bytes(self.tail)
+
+    def _decode_tail(self, cur):
+        self.tail = cur.decode_bytes(2)
+
+
+def test_layout_compiled():
+    assert LayoutFrame.layout_struct.format in ("<HLQQ4sB", b"<HLQQ4sB")
+    frame = LayoutFrame(None)
+    assert frame.fields == ["flags", "file_id", "key", "level"]
+    assert (frame.flags, frame.file_id, frame.level) == (0x5, None, 0)
+
+
+def test_layout_encode_decode():
+    frame = LayoutFrame(None)
+    frame.file_id = (1, 2)
+    frame.key = array.array("B", b"abcd")
+    frame.level = smb2.SMB2_OPLOCK_LEVEL_II
+    frame.tail = b"zz"
+    buf = frame.serialize()
+    assert buf.tobytes() == struct.pack(
+        "<HLQQ4sB2s", 5, 0xFFFFFFFF, 1, 2, b"abcd", 1, b"zz"
+    )
+
+    decoded = LayoutFrame(None)
+    decoded.parse(buf)
+    assert decoded.file_id == (1, 2)
+    assert decoded.key == array.array("B", b"abcd")
+    assert isinstance(decoded.level, smb2.OplockLevel)
+    assert decoded.level == smb2.SMB2_OPLOCK_LEVEL_II
+    assert decoded.tail.tobytes() == b"zz"
+
+
+def test_layout_close_response():
+    body = struct.pack("<HHLQQQQQQL", 60, 1, 0, 10, 11, 12, 13, 4096, 100, 0x20)
+    nb = netbios.Netbios()
+    nb.parse(smb2_response(smb2.SMB2_CLOSE, body))
+    close_res = nb[0][0]
+    assert isinstance(close_res, smb2.CloseResponse)
+    assert close_res.flags == smb2.SMB2_CLOSE_FLAG_POSTQUERY_ATTRIB
+    assert close_res.last_write_time == 12
+    assert close_res.end_of_file == 100
+    assert close_res.file_attributes == smb2.FILE_ATTRIBUTE_ARCHIVE
+    assert "end_of_file: 100" in str(close_res)
+
+
+# array.array exports no buffer on Python 2; decode_view copies there
+views_of_arrays = pytest.mark.skipif(
+    sys.version_info < (3,), reason="array.array has no buffer interface"
+)
+
+
+@views_of_arrays
+def test_decode_view():
+    buf = array.array("B", b"\x01\x02\x03\x04")
+    cur = core.Cursor(buf, 1)
+    view = cur.decode_view(2)
+    assert isinstance(view, memoryview)
+    assert view.tobytes() == b"\x02\x03"
+    assert cur.offset == 3
+    buf[1] = 0xFF
+    assert view[0] == 0xFF
+    with pytest.raises(core.BufferOverrun):
+        cur.decode_view(2)
+
+
+def test_cursor_view_mode():
+    buf = bytearray(b"\0" * 8)
+    cur = core.Cursor(buf, 0)
+    cur.encode_uint32le(0x04030201)
+    view = core.Cursor(buf, 0).decode_bytes(4)
+    assert isinstance(view, memoryview)
+    assert view.tobytes() == b"\x01\x02\x03\x04"
+    cur.encode_uint32le(0)
+    with pytest.raises(core.BufferOverrun):
+        cur.encode_uint8le(0)
+
+
+@views_of_arrays
+def test_read_response_data_view():
+    data = b"\xa5" * 64
+    buf = smb2_response(
+        smb2.SMB2_READ, struct.pack("<HBBLLL", 17, 80, 0, len(data), 0, 0) + data
+    )
+    nb = netbios.Netbios()
+    nb.parse(buf)
+    read_res = nb[0][0]
+    assert isinstance(read_res.data, memoryview)
+    assert read_res.data.tobytes() == data
+    assert read_res.data.obj is nb.buf
+
+
+def test_cursor_peek():
+    buf = array.array("B", struct.pack("<HLQ", 1, 2, 3))
+    cur = core.Cursor(buf, 0)
+    assert cur.peek_uint16le() == 1
+    assert cur.peek_uint32le(2) == 2
+    assert cur.peek_uint64le(6) == 3
+    assert cur.offset == 0
+    with cur.bounded(0, 4):
+        with pytest.raises(core.BufferOverrun):
+            cur.peek_uint32le(2)
+
+
+def test_cursor_slots():
+    cur = core.Cursor(array.array("B"), 0)
+    with pytest.raises(AttributeError):
+        cur.extra = 1
+    hole = cur.hole.encode_uint16le(0)
+    cur.encode_uint16le(2)
+    hole(1)
+    assert cur.array.tobytes() == b"\x01\x00\x02\x00"
+
+
+def test_cursor_bounded_relative():
+    cur = core.Cursor(array.array("B", b"\0" * 8), 2)
+    with cur.bounded(0, 4):
+        assert cur.bounds == (2, 6)
+        assert cur.upperbound_offset == 6
+    assert cur.upperbound_offset == 8
+    cur.advanceto(5)
+    assert cur.offset == 5
+    with pytest.raises(core.BufferOverrun):
+        cur.advanceto(4)
+
+
+def test_hot_frames_keep_fields_in_slots():
+    frames = []
+    for command in (smb2.ReadRequest, smb2.WriteRequest):
+        nb = netbios.Netbios()
+        smb_req = smb2.Smb2(nb)
+        smb_req.credit_charge = smb_req.credit_request = smb_req.message_id = 1
+        req = command(smb_req)
+        req.file_id = (1, 2)
+        req.offset = 0
+        if command is smb2.WriteRequest:
+            req.buffer = b"data"
+        else:
+            req.length = 4
+        nb.serialize()
+        frames.extend((smb_req, req))
+    data = b"\xa5" * 16
+    buf = smb2_response(
+        smb2.SMB2_READ, struct.pack("<HBBLLL", 17, 80, 0, len(data), 0, 0) + data
+    )
+    res = netbios.Netbios()
+    res.parse(buf)
+    # vars() creates an empty dict when none exists yet
+    for frame in frames + [res[0], res[0][0]]:
+        assert vars(frame) == {}, type(frame)
+
+
+def test_frame_fields_order():
+    smb_req = smb2.Smb2(netbios.Netbios())
+    smb_req.message_id = 5
+    read_req = smb2.ReadRequest(smb_req)
+    read_req.file_id = (1, 2)
+    read_req.custom = "extra"
+    assert not hasattr(smb_req, "__dict__") or "message_id" not in smb_req.__dict__
+    assert read_req.fields[:5] == [
+        "length",
+        "offset",
+        "minimum_count",
+        "remaining_bytes",
+        "file_id",
+    ]
+    assert read_req.fields[-1] == "custom"
+    assert "parent" not in read_req.fields
+    text = str(smb_req)
+    assert "message_id: 5" in text
+    assert "file_id: (1, 2)" in text
+    assert "custom: extra" in text
+
+
+def test_smb2_lazy_decode():
+    body = struct.pack("<HHLLHH", 17, 0, 42, 0, 0, 0)
+    nb = netbios.Netbios(lazy_decode=True)
+    nb.parse(smb2_response(smb2.SMB2_WRITE, body))
+    smb_res = nb[0]
+    assert smb_res.command_class is smb2.WriteResponse
+    assert "WriteResponse" in nb._log_str()
+    assert smb_res._command.count == 0
+    assert smb_res[0].count == 42
+    assert smb_res._body is None
+
+
+def test_smb2_lazy_decode_error_deferred():
+    # READ response claiming more data than the frame holds
+    body = struct.pack("<HBBLLL", 17, 80, 0, 4096, 0, 0) + b"\0" * 16
+    nb = netbios.Netbios(lazy_decode=True)
+    nb.parse(smb2_response(smb2.SMB2_READ, body))
+    with pytest.raises(core.BufferOverrun):
+        nb[0][0]
+
+
+def write_request_frame(data):
+    nb = netbios.Netbios()
+    smb_req = smb2.Smb2(nb)
+    smb_req.credit_charge = 1
+    smb_req.credit_request = 10
+    smb_req.message_id = 5
+    smb_req.tree_id = 1
+    smb_req.session_id = 0x1234
+    write_req = smb2.WriteRequest(smb_req)
+    write_req.offset = 0
+    write_req.file_id = (1, 2)
+    write_req.buffer = data
+    return nb
+
+
+def test_size_hint_exact_for_write():
+    nb = write_request_frame(b"\xa5" * 4096)
+    assert nb.size_hint() == len(nb.serialize())
+
+
+def test_serialize_pooled():
+    pool = core.BufferPool()
+    expected = write_request_frame(b"\xa5" * 4096).serialize().tobytes()
+    nb = write_request_frame(b"\xa5" * 4096)
+    buf = nb.serialize(pool)
+    assert buf is nb.buf
+    assert buf.tobytes() == expected
+    pool.put(buf)
+
+    # A recycled buffer is zeroed and reused for the next frame
+    nb = write_request_frame(b"\x5a" * 100)
+    nb2 = write_request_frame(b"\xa5" * 4096)
+    assert nb2.serialize(pool) is buf
+    assert buf.tobytes() == expected
+    assert (
+        nb.serialize(pool).tobytes()
+        == write_request_frame(b"\x5a" * 100).serialize().tobytes()
+    )
+
+
+def test_buffer_pool_limits():
+    pool = core.BufferPool(max_per_size=1, max_size=16)
+    first, second, large = pool.get(8), pool.get(8), pool.get(32)
+    pool.put(first)
+    pool.put(second)
+    pool.put(large)
+    assert pool.get(8) is first
+    assert pool.get(8) is not second
+    assert pool.get(32) is not large
+
+
+class PermissiveEnum(core.ValueEnum):
+    permissive = True
+    max_interned = 3
+    ONE = 1
+    TWO = 2
+
+
+def test_enum_interned():
+    assert smb2.CommandId(8) is smb2.CommandId(8)
+    assert smb2.SMB2_READ is smb2.CommandId.SMB2_READ
+    assert smb2.CommandId(smb2.SMB2_READ) is smb2.SMB2_READ
+    flags = smb2.SMB2_FLAGS_SIGNED | smb2.SMB2_FLAGS_SERVER_TO_REDIR
+    assert smb2.Flags(int(flags)) is flags
+    assert str(ntstatus.Status(0x103)) == "STATUS_PENDING"
+    with pytest.raises(ValueError):
+        smb2.CommandId(0xFF)
+    with pytest.raises(AttributeError):
+        smb2.CommandId.SMB2_BOGUS
+
+
+def test_enum_intern_limit():
+    assert PermissiveEnum.ONE is PermissiveEnum(1)
+    assert PermissiveEnum(2) is PermissiveEnum.TWO
+    assert PermissiveEnum(3) is PermissiveEnum(3)
+    assert PermissiveEnum(4) == 4
+    assert PermissiveEnum(4) is not PermissiveEnum(4)
+    assert len(PermissiveEnum._interned) == 3
+
+
+class OverlapFlags(core.FlagEnum):
+    LOW = 0x1
+    PAIR = 0x6
+
+
+def test_flag_enum_validate():
+    assert smb2.Access._exact_mask
+    with pytest.raises(ValueError):
+        smb2.Flags(0x100)
+    # PAIR only matches when both of its bits are set
+    assert not OverlapFlags._exact_mask
+    assert OverlapFlags(0x7) == 0x7
+    with pytest.raises(ValueError):
+        OverlapFlags(0x2)
+
+
+def test_flag_enum_str_cached():
+    access = smb2.FILE_READ_DATA | smb2.SYNCHRONIZE
+    rendered = str(access)
+    assert "FILE_READ_DATA" in rendered and "SYNCHRONIZE" in rendered
+    assert smb2.Access._strings[access] is rendered
+    assert str(access) is rendered
+    assert str(smb2.Access(0)) == "0"
+
+
+def test_layout_generated_on_first_use():
+    class LazyFrame(core.Frame):
+        layout = (core.Field("value", "L", 7),)
+
+    assert LazyFrame._encode._layout_placeholder
+    buf = LazyFrame(None).serialize()
+    assert not hasattr(LazyFrame._encode, "_layout_placeholder")
+    assert not hasattr(LazyFrame._decode, "_layout_placeholder")
+    decoded = LazyFrame(None)
+    decoded.value = 0
+    decoded.parse(buf)
+    assert decoded.value == 7
+
+
+def test_ntstatus_names_resolved_lazily():
+    assert ntstatus.STATUS_PENDING is ntstatus.Status(0x103)
+    assert "STATUS_ACCESS_DENIED" in dir(ntstatus)
+    with pytest.raises(AttributeError):
+        ntstatus.STATUS_BOGUS
+
+
+def test_ntstatus_star_import():
+    names = {}
+    exec("from pike.ntstatus import *", names)
+    assert names["STATUS_SUCCESS"] is ntstatus.STATUS_SUCCESS
+    assert names["Status"] is ntstatus.Status
+    assert "STATUS_PENDING" in names
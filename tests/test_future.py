@@ -0,0 +1,113 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+
+import pytest
+
+import pike.exceptions
+import pike.model as model
+import pike.transport as transport
+
+
+@pytest.fixture
+def poller():
+    return transport.new_poller()
+
+
+def delayed(poller, delay, result):
+    """Return a future completed with result after delay seconds"""
+    future = model.Future(poller=poller)
+    poller.call_later(delay, future.complete, result)
+    return future
+
+
+def test_then_keeps_every_callback():
+    future = model.Future()
+    calls = []
+    future.then(lambda f: calls.append(1))
+    future.then(lambda f: calls.append(2))
+    future.complete("done")
+    future.then(lambda f: calls.append(3))
+    assert calls == [1, 2, 3]
+
+
+def test_notify_replaces_callbacks():
+    future = model.Future()
+    calls = []
+    future.then(lambda f: calls.append(1))
+    future.notify = lambda f: calls.append(2)
+    future.complete("done")
+    assert calls == [2]
+    assert future.notify is None
+
+
+def test_future_has_slots():
+    with pytest.raises(AttributeError):
+        model.Future().unknown = 1
+
+
+def test_gather(poller):
+    futures = [delayed(poller, 0.01 * (5 - i), i) for i in range(5)]
+    assert model.gather(futures, timeout=5) == list(range(5))
+
+
+def test_gather_raises_first_exception(poller):
+    futures = [delayed(poller, 0.02, 1), delayed(poller, 0.01, ValueError("x"))]
+    with pytest.raises(ValueError):
+        model.gather(futures, timeout=5)
+
+
+def test_gather_timeout(poller):
+    futures = [delayed(poller, 0, 1), model.Future(poller=poller)]
+    with pytest.raises(pike.exceptions.TimeoutError):
+        model.gather(futures, timeout=0.05)
+    assert not futures[1]._callbacks
+
+
+def test_as_completed(poller):
+    done = model.Future(poller=poller)
+    done.complete("first")
+    futures = [delayed(poller, 0.04, "last"), delayed(poller, 0.02, "second"), done]
+    results = [f.result() for f in model.as_completed(futures, timeout=5)]
+    assert results == ["first", "second", "last"]
+
+
+def test_wait_any(poller):
+    futures = [delayed(poller, 0.05, "slow"), delayed(poller, 0.01, "fast")]
+    assert model.wait_any(futures, timeout=5) is futures[1]
+    with pytest.raises(pike.exceptions.TimeoutError):
+        model.wait_any([model.Future(poller=poller)], timeout=0.05)
+
+
+def test_wait_any_removes_callbacks(poller):
+    pending = model.Future(poller=poller)
+    for i in range(10):
+        fast = delayed(poller, 0, i)
+        assert model.wait_any([pending, fast], timeout=5) is fast
+    assert not pending._callbacks
+
+
+def test_as_completed_removes_callbacks(poller):
+    pending = model.Future(poller=poller)
+    done = model.Future(poller=poller)
+    done.complete("done")
+    completed = model.as_completed([pending, done], timeout=5)
+    assert next(completed) is done
+    completed.close()
+    assert not pending._callbacks
+
+
+def test_remove_callback_by_identity():
+    future = model.Future()
+    calls = []
+    first, second = [], []
+    # equal but distinct lists, so their bound methods compare equal
+    future.then(first.append)
+    notify = second.append
+    future.then(notify)
+    future.remove_callback(notify)
+    future.then(calls.append)
+    future.complete("done")
+    assert (first, second, calls) == ([future], [], [future])
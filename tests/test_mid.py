@@ -0,0 +1,61 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+
+import random
+
+import pike.model
+
+
+class MockConnection(pike.model.Connection):
+    """Connection with only message id state"""
+
+    def __init__(self):
+        self._next_mid = 0
+        self._reserved_starts = []
+        self._reserved_ends = []
+
+
+def reference_allocate(next_mid, reserved, length):
+    # the allocation rule: the first range at or after next_mid which
+    # avoids every reserved id
+    start = next_mid
+    while reserved.intersection(range(start, start + length)):
+        start += 1
+    return start
+
+
+def test_next_mid_range_sequential():
+    conn = MockConnection()
+    assert conn.next_mid() == 0
+    assert conn.next_mid_range(128) == 1
+    assert conn.next_mid_range(0) == 129
+    assert conn._next_mid == 130
+
+
+def test_reserved_intervals_merge():
+    conn = MockConnection()
+    for mid in (5, 7, 6, 3, 4, 10, 8):
+        conn.reserve_mid(mid)
+    conn.reserve_mid(5)
+    assert conn._reserved_starts == [3, 10]
+    assert conn._reserved_ends == [9, 11]
+
+
+def test_next_mid_range_skips_reserved():
+    rnd = random.Random(1)
+    conn = MockConnection()
+    reserved = set()
+    next_mid = 0
+    for _ in range(2000):
+        if rnd.random() < 0.3:
+            mid = next_mid + rnd.randrange(64)
+            conn.reserve_mid(mid)
+            reserved.add(mid)
+        length = rnd.choice((1, 1, 2, 16, 128))
+        expected = reference_allocate(next_mid, reserved, length)
+        assert conn.next_mid_range(length) == expected
+        next_mid = expected + length
+        assert conn._next_mid == next_mid
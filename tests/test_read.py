@@ -0,0 +1,154 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+
+import array
+import sys
+
+import pytest
+
+import pike.model
+import pike.netbios
+import pike.ntstatus
+import pike.smb2
+
+
+class MockConnection(pike.model.Connection):
+    """Connection that reads from a list of chunks and records dispatches"""
+
+    def __init__(self, chunks, recv_buffer_size=65536):
+        self.callbacks = {}
+        self.client = None
+        self.error = None
+        self.lazy_decode = False
+        self.recv_buffer_size = recv_buffer_size
+        self._in_buffer = bytearray(recv_buffer_size)
+        self._in_end = 0
+        self._in_frame = None
+        self._in_filled = 0
+        self.chunks = list(chunks)
+        self.recvs = []
+        self.dispatched = []
+
+    def recv_into(self, buffer):
+        self.recvs.append(buffer)
+        if not self.chunks:
+            return 0
+        chunk = self.chunks.pop(0)
+        assert len(chunk) <= len(buffer)
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+    def _dispatch_incoming(self, res):
+        self.dispatched.append(res)
+
+
+def echo_response(message_id):
+    nb = pike.netbios.Netbios()
+    smb_res = pike.smb2.Smb2(nb)
+    smb_res.credit_response = 1
+    smb_res.credit_charge = 1
+    smb_res.status = pike.ntstatus.STATUS_SUCCESS
+    smb_res.message_id = message_id
+    smb_res.flags = pike.smb2.SMB2_FLAGS_SERVER_TO_REDIR
+    pike.smb2.EchoResponse(smb_res)
+    return nb.serialize().tobytes()
+
+
+def split(wire, sizes):
+    chunks = []
+    for size in sizes:
+        chunks.append(wire[:size])
+        wire = wire[size:]
+    if wire:
+        chunks.append(wire)
+    return chunks
+
+
+@pytest.mark.parametrize("sizes", ((), (1,), (3, 5), (70, 70), (68, 1, 1)))
+def test_handle_read_dispatches_every_frame(sizes):
+    wire = b"".join(echo_response(mid) for mid in range(5))
+    chunks = split(wire, sizes)
+    conn = MockConnection(chunks)
+    for _ in chunks:
+        conn.handle_read()
+    assert len(conn.recvs) == len(chunks)
+    assert [nb[0].message_id for nb in conn.dispatched] == list(range(5))
+    assert conn._in_end == 0
+
+
+def test_handle_read_keeps_partial_frame():
+    wire = echo_response(1)
+    conn = MockConnection([wire + wire[:10], wire[10:]])
+    conn.handle_read()
+    assert len(conn.dispatched) == 1
+    assert bytes(conn._in_buffer[: conn._in_end]) == wire[:10]
+    conn.handle_read()
+    assert len(conn.dispatched) == 2
+    # nothing buffered, nothing read
+    conn.handle_read()
+    assert len(conn.dispatched) == 2
+
+
+def test_handle_read_large_frame_in_place():
+    wire = echo_response(1)
+    conn = MockConnection(split(wire, (6, 20)), recv_buffer_size=16)
+    for _ in range(3):
+        conn.handle_read()
+    # the rest of the frame is received straight into its own buffer,
+    # which is the buffer the frame is parsed from
+    frame_buf = conn.dispatched[0].buf
+    assert len(frame_buf) == len(wire)
+    if sys.version_info >= (3,):
+        # Python 2 receives into a bytearray and copies it once complete
+        assert [buf.obj for buf in conn.recvs[1:]] == [frame_buf] * 2
+    assert [len(buf) for buf in conn.recvs] == [16, len(wire) - 6, len(wire) - 26]
+    assert conn._in_frame is None
+
+
+class ReentrantConnection(MockConnection):
+    """Reads again while handling the first response, like a blocking wait"""
+
+    def _dispatch_incoming(self, res):
+        super(ReentrantConnection, self)._dispatch_incoming(res)
+        if len(self.dispatched) == 1:
+            self.handle_read()
+
+
+def test_handle_read_reentered_from_dispatch():
+    first = b"".join(echo_response(mid) for mid in range(3))
+    second = echo_response(98) + echo_response(99) + echo_response(100)[:10]
+    conn = ReentrantConnection([first, second, echo_response(100)[10:]])
+    conn.handle_read()
+    # every frame is handled once; the nested read keeps the partial frame
+    assert [nb[0].message_id for nb in conn.dispatched] == [0, 98, 99, 1, 2]
+    conn.handle_read()
+    assert [nb[0].message_id for nb in conn.dispatched] == [0, 98, 99, 1, 2, 100]
+    assert conn._in_end == 0
+
+
+def test_handle_read_post_recv_gets_a_copy():
+    wire = echo_response(1)
+    chunks = [wire, wire[:30], wire[30:]]
+    conn = MockConnection(chunks)
+    received = []
+    conn.callbacks[pike.model.EV_RES_POST_RECV] = [received.append]
+    for _ in range(3):
+        conn.handle_read()
+    # what a callback keeps is not overwritten by later reads
+    assert all(type(data) is array.array for data in received)
+    assert [data.tobytes() for data in received] == chunks
+
+
+def test_handle_read_buffer_is_reused():
+    wire = echo_response(1)
+    conn = MockConnection([wire, wire[:30], wire[30:]])
+    buf = conn._in_buffer
+    for _ in range(3):
+        conn.handle_read()
+    assert len(conn.dispatched) == 2
+    assert conn._in_buffer is buf
+    if sys.version_info >= (3,):
+        assert all(view.obj is buf for view in conn.recvs)
@@ -0,0 +1,164 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+
+import pike.model as model
+
+
+def push(scheduler, name, charge=1, priority=model.PRIORITY_NORMAL, flow=None):
+    scheduler.push([name], charge, priority, flow)
+
+
+def drain(scheduler, credits=100):
+    result = []
+    while True:
+        futures = scheduler.pop(credits)
+        if futures is None:
+            return result
+        result.extend(futures)
+
+
+def test_priority_order():
+    scheduler = model.SendScheduler()
+    push(scheduler, "read", priority=model.PRIORITY_BULK, flow="a")
+    push(scheduler, "create", flow="b")
+    push(scheduler, "ack", priority=model.PRIORITY_URGENT, flow="c")
+    push(scheduler, "close", flow="b")
+    assert drain(scheduler) == ["ack", "create", "close", "read"]
+    assert len(scheduler) == 0
+
+
+def test_flow_keeps_order():
+    scheduler = model.SendScheduler()
+    push(scheduler, "write", priority=model.PRIORITY_BULK)
+    push(scheduler, "flush")
+    push(scheduler, "close")
+    push(scheduler, "lease_ack", priority=model.PRIORITY_URGENT)
+    assert drain(scheduler) == ["write", "flush", "close", "lease_ack"]
+
+
+def test_priority_applies_to_flow_heads():
+    scheduler = model.SendScheduler()
+    push(scheduler, "a_write", priority=model.PRIORITY_BULK, flow="a")
+    push(scheduler, "a_ack", priority=model.PRIORITY_URGENT, flow="a")
+    push(scheduler, "b_read", priority=model.PRIORITY_BULK, flow="b")
+    push(scheduler, "c_ack", priority=model.PRIORITY_URGENT, flow="c")
+    # an urgent frame only overtakes other flows, never its own
+    assert drain(scheduler) == ["c_ack", "a_write", "a_ack", "b_read"]
+
+
+def test_flows_take_turns():
+    scheduler = model.SendScheduler()
+    for ix in range(3):
+        push(scheduler, "a%d" % ix, flow="a")
+    push(scheduler, "b0", flow="b")
+    push(scheduler, "c0", flow="c")
+    push(scheduler, "b1", flow="b")
+    assert drain(scheduler) == ["a0", "b0", "c0", "a1", "b1", "a2"]
+
+
+def test_credit_stall():
+    scheduler = model.SendScheduler()
+    push(scheduler, "small")
+    push(scheduler, "large", charge=8)
+    assert scheduler.pop(4) == ["small"]
+    assert scheduler.pop(4) is None
+    assert scheduler.pop(4) is None
+    assert scheduler.stalled
+    # an idle connection sends regardless, or it would never get credits
+    assert scheduler.pop(4, idle=True) == ["large"]
+    assert not scheduler.stalled
+    stats = scheduler.stats()
+    assert stats["credit_stalls"] == 1
+    assert stats["stall_time"] >= 0
+    assert stats["max_queued"] == 2
+    assert stats["queued"] == 0
+
+
+def test_stats_by_priority():
+    scheduler = model.SendScheduler()
+    scheduler.push(["r1", "r2"], 2, model.PRIORITY_BULK)
+    push(scheduler, "ack", priority=model.PRIORITY_URGENT)
+    assert scheduler.stats()["queued_by_priority"] == {
+        model.PRIORITY_URGENT: 1,
+        model.PRIORITY_BULK: 2,
+    }
+    assert scheduler.stats()["queued_credits"] == 3
+    assert sorted(scheduler) == ["ack", "r1", "r2"]
+    scheduler.clear()
+    assert len(scheduler) == 0
+    assert scheduler.pop(100) is None
+
+
+class CreditConnection(object):
+    """The connection state a credit policy reads"""
+
+    def __init__(self):
+        self.credits = 0
+        self._out_queue = model.SendScheduler()
+
+
+class Smb2(object):
+    def __init__(self, message_id, credit_charge=1, credit_response=0):
+        self.message_id = message_id
+        self.credit_charge = credit_charge
+        self.credit_response = credit_response
+
+
+def send(policy, conn, message_id, charge=1):
+    conn.credits -= charge
+    return policy.credit_request(conn, Smb2(message_id, charge))
+
+
+def receive(policy, conn, message_id, grant, charge=1):
+    conn.credits += grant
+    policy.credit_response(conn, Smb2(message_id, charge, grant))
+
+
+def test_adaptive_credits_ramp_with_demand():
+    policy = model.AdaptiveCreditPolicy(initial=4, max_credits=64)
+    conn = CreditConnection()
+    conn._out_queue.push(["queued"], 1000)
+    requests = [send(policy, conn, mid) for mid in range(4)]
+    assert policy.window == 64
+    # each request asks for the rest of a doubling window
+    assert requests == [9, 9, 17, 33]
+    for mid, request in enumerate(requests):
+        receive(policy, conn, mid, request)
+    assert conn.credits == 64
+    assert policy.in_flight == policy.requested == 0
+
+
+def test_adaptive_credits_limited_by_server():
+    policy = model.AdaptiveCreditPolicy(initial=4, max_credits=64)
+    conn = CreditConnection()
+    conn._out_queue.push(["queued"], 1000)
+    assert send(policy, conn, 0, charge=2) == 10
+    receive(policy, conn, 0, 3, charge=2)
+    # the server granted less than asked: hold what was granted
+    assert policy.window == 4
+    assert not policy._requested
+
+
+def test_adaptive_credits_back_off_when_idle():
+    policy = model.AdaptiveCreditPolicy(initial=4)
+    policy.window = 64
+    conn = CreditConnection()
+    conn.credits = 64
+    assert send(policy, conn, 0) == 1
+    assert policy.window == 32
+    receive(policy, conn, 0, 1)
+    assert send(policy, conn, 1) == 1
+    assert policy.window == 16
+    # a cancel is not charged and gets no response
+    assert send(policy, conn, 1, charge=0) == 0
+    assert policy.in_flight == 1
+
+
+def test_adaptive_credits_default_initial(monkeypatch):
+    # read when the policy is created, so the module setting applies
+    monkeypatch.setattr(model, "default_credit_request", 3)
+    policy = model.AdaptiveCreditPolicy()
+    assert policy.initial == policy.window == 3
@@ -0,0 +1,380 @@
+#
+# Copyright (c) 2020, Dell Inc. or its subsidiaries.
+# All rights reserved.
+# See file LICENSE for licensing information.
+#
+
+import array
+import os
+import select
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+import pike.transport as transport
+
+
+POLLERS = [transport.SelectPoller]
+if hasattr(select, "poll"):
+    POLLERS.append(transport.PollPoller)
+if hasattr(select, "epoll"):
+    POLLERS.append(transport.EpollPoller)
+
+
+class RecordingTransport(transport.Transport):
+    """Reads one byte per handle_read, like a frame reader behind a watermark"""
+
+    def __init__(self, poller, sock):
+        super(RecordingTransport, self).__init__(alternate_poller=poller)
+        self.connected = True
+        self.received = b""
+        self.writes = 0
+        sock.setblocking(0)
+        self.set_socket(sock)
+
+    def handle_read(self):
+        self.received += self.recv(1)
+
+    def handle_write(self):
+        self.writes += 1
+
+
+@pytest.fixture(params=POLLERS, ids=lambda cls: cls.__name__)
+def pair(request):
+    poller = request.param()
+    local, remote = socket.socketpair()
+    t = RecordingTransport(poller, local)
+    yield poller, t, remote
+    t.close()
+    remote.close()
+
+
+def test_poller_reads_all_pending_data(pair):
+    poller, t, remote = pair
+    remote.sendall(b"abc")
+    poller.loop(count=5)
+    assert t.received == b"abc"
+    # nothing more is delivered once the socket is drained
+    poller.loop(count=2)
+    assert t.received == b"abc"
+    remote.sendall(b"d")
+    poller.loop(count=2)
+    assert t.received == b"abcd"
+
+
+def test_poller_deferred_write_is_one_shot(pair):
+    poller, t, remote = pair
+    # pollers may report the initial connect as a single write event
+    poller.loop(count=3)
+    initial = t.writes
+    assert initial <= 1
+    poller.loop(count=3)
+    assert t.writes == initial
+    poller.defer_write(t)
+    poller.loop(count=3)
+    assert t.writes == initial + 1
+
+
+@pytest.mark.skipif(not hasattr(select, "epoll"), reason="epoll not available")
+def test_epoll_is_default_poller():
+    assert isinstance(transport.poller, transport.EpollPoller) or hasattr(
+        select, "kqueue"
+    )
+
+
+def test_poll_blocks_until_timeout(pair):
+    poller, t, remote = pair
+    poller.loop(count=3)
+    start, cpu = time.time(), sum(os.times()[:2])
+    poller.poll(0.2)
+    assert time.time() - start >= 0.15
+    assert sum(os.times()[:2]) - cpu < 0.1
+
+
+def test_poll_returns_when_data_arrives(pair):
+    poller, t, remote = pair
+    poller.loop(count=3)
+    timer = threading.Timer(0.05, remote.sendall, (b"x",))
+    timer.start()
+    start = time.time()
+    poller.loop(timeout=5, count=1)
+    timer.join()
+    assert time.time() - start < 2
+    assert t.received == b"x"
+
+
+def test_client_owns_poller():
+    import pike.model as model
+
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    own = transport.new_poller()
+    client = model.Client(poller=own)
+    conn = model.Connection(client, "127.0.0.1", listener.getsockname()[1])
+    try:
+        assert conn.poller is own
+        assert conn.connection_future.poller is own
+        assert conn._fileno in own.connections
+        assert conn._fileno not in transport.poller.connections
+        # waiting on the future drives the client's poller only
+        assert conn.connection_future.result(timeout=5) is conn
+    finally:
+        conn.close()
+        listener.close()
+    assert not own.connections
+
+
+def test_poller_per_thread():
+    import pike.model as model
+
+    results = []
+
+    def worker():
+        own = transport.new_poller()
+        local, remote = socket.socketpair()
+        t = RecordingTransport(own, local)
+        future = model.Future(poller=own)
+        t.handle_read = lambda: future.complete(t.recv(16))
+        remote.sendall(b"ping")
+        results.append(future.result(timeout=5))
+        t.close()
+        remote.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [b"ping"] * 4
+
+
+def test_timers_run_in_order(pair):
+    poller, t, remote = pair
+    fired = []
+    poller.call_later(0.06, fired.append, 3)
+    poller.call_later(0.02, fired.append, 1)
+    poller.call_later(0.04, fired.append, 2)
+    poller.call_later(0.03, fired.append, "cancelled").cancel()
+    poller.loop(timeout=0.2)
+    assert fired == [1, 2, 3]
+    assert not poller._timers
+
+
+def test_poll_wakes_for_timer(pair):
+    poller, t, remote = pair
+    poller.loop(count=3)
+    fired = []
+    poller.call_at(poller.time() + 0.05, fired.append, True)
+    start = time.time()
+    # blocks until the timer is due, not forever
+    poller.poll(None)
+    assert fired == [True]
+    assert 0.04 <= time.time() - start < 2
+
+
+def test_timer_cancelled_from_callback(pair):
+    poller, t, remote = pair
+    fired = []
+    when = poller.time()
+    poller.call_at(when, lambda: timers[0].cancel())
+    timers = [poller.call_at(when, fired.append, 2)]
+    # scheduled by a callback, runs on a later iteration
+    poller.call_at(when, lambda: poller.call_at(when, fired.append, 3))
+    poller.poll(0)
+    assert fired == []
+    poller.poll(0)
+    assert fired == [3]
+    assert poller._cancelled_timers == 0
+
+
+def test_cancelled_timers_are_discarded():
+    poller = transport.new_poller()
+    timers = [poller.call_later(60, lambda: None) for _ in range(1000)]
+    for timer in timers[:900]:
+        timer.cancel()
+    assert len(poller._timers) < 500
+    assert poller.timer_timeout(None) > 50
+
+
+@pytest.fixture
+def local_conn():
+    """A Connection with its own poller, and the server end of its socket"""
+    import pike.model as model
+
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    own = transport.new_poller()
+    client = model.Client(poller=own)
+    conn = model.Connection(client, "127.0.0.1", listener.getsockname()[1])
+    server, _ = listener.accept()
+    server.settimeout(5)
+    conn.connection_future.wait(timeout=5)
+    yield conn, server
+    conn.close()
+    server.close()
+    listener.close()
+
+
+def echo(conn, timeout=None):
+    import pike.smb2 as smb2
+
+    smb_req = conn.request()
+    smb2.EchoRequest(smb_req)
+    return conn.submit(smb_req.parent, timeout=timeout)[0]
+
+
+def read_requests(server, count):
+    """Return (command, flags, message_id, async_id) of count requests"""
+    import pike.smb2 as smb2
+
+    data = b""
+    result = []
+    while len(result) < count:
+        data += server.recv(4096)
+        while len(data) >= 4:
+            size = 4 + struct.unpack(">L", data[:4])[0]
+            if len(data) < size:
+                break
+            command, flags, mid, async_id = struct.unpack_from("<H2xL4xQQ", data, 16)
+            result.append((smb2.CommandId(command), flags, mid, async_id))
+            data = data[size:]
+    return result
+
+
+def test_connection_keepalive(local_conn):
+    import pike.smb2 as smb2
+
+    conn, server = local_conn
+    conn.keepalive(0.05)
+    start = time.time()
+    while not conn._future_map and time.time() - start < 5:
+        conn.poller.poll(1)
+    (future,) = conn._future_map.values()
+    assert isinstance(future.request[0], smb2.EchoRequest)
+    assert read_requests(server, 1)[0][0] == smb2.SMB2_ECHO
+    conn.close()
+    assert conn._keepalive is None
+    assert not conn.poller._timers
+
+
+def test_request_deadline_cancels_by_message_id(local_conn):
+    import pike.exceptions
+    import pike.smb2 as smb2
+
+    conn, server = local_conn
+    future = echo(conn, timeout=0.05)
+    mid = future.request.message_id
+    with pytest.raises(pike.exceptions.TimeoutError):
+        future.result(timeout=5)
+    assert mid not in conn._future_map
+    (echo_req, cancel_req) = read_requests(server, 2)
+    assert echo_req[0] == smb2.SMB2_ECHO
+    assert cancel_req[0] == smb2.SMB2_CANCEL
+    assert cancel_req[2] == mid
+
+
+def test_request_deadline_cancels_by_async_id(local_conn):
+    import pike.exceptions
+    import pike.smb2 as smb2
+
+    class Interim(object):
+        async_id = 0x1234
+
+    conn, server = local_conn
+    future = echo(conn, timeout=0.05)
+    future.interim(Interim())
+    with pytest.raises(pike.exceptions.TimeoutError):
+        future.result(timeout=5)
+    cancel_req = read_requests(server, 2)[1]
+    assert cancel_req[0] == smb2.SMB2_CANCEL
+    assert cancel_req[1] & smb2.SMB2_FLAGS_ASYNC_COMMAND
+    assert cancel_req[3] == 0x1234
+
+
+def test_request_deadline_cleared_on_response(local_conn):
+    conn, server = local_conn
+    futures = [echo(conn, timeout=60) for _ in range(1000)]
+    assert len(conn.poller._timers) == 1000
+    for future in futures:
+        future.complete(None)
+    # completed requests leave no live timers behind
+    assert conn.poller.timer_timeout(None) is None
+
+
+def interim_response(conn, message_id, async_id):
+    import pike.ntstatus as ntstatus
+    import pike.smb2 as smb2
+
+    header = struct.pack(
+        "<4sHHLHHLLQQQ16s",
+        b"\xfeSMB",
+        64,
+        1,
+        ntstatus.STATUS_PENDING,
+        smb2.SMB2_ECHO,
+        1,
+        smb2.SMB2_FLAGS_SERVER_TO_REDIR | smb2.SMB2_FLAGS_ASYNC_COMMAND,
+        0,
+        message_id,
+        async_id,
+        0,
+        b"\0" * 16,
+    )
+    body = struct.pack("<HBBLB", 9, 0, 0, 0, 0)
+    nb = conn.frame()
+    nb.parse(array.array("B", struct.pack(">L", 73) + header + body))
+    return nb
+
+
+def test_cancel_lookup_indexes(local_conn):
+    import pike.smb2 as smb2
+
+    conn, server = local_conn
+
+    def cancel(**attrs):
+        smb_req = conn.request()
+        for name, value in attrs.items():
+            setattr(smb_req, name, value)
+        smb2.Cancel(smb_req)
+        return conn.submit(smb_req.parent)[0]
+
+    with conn.batch():
+        smb_req = conn.request()
+        smb_req.message_id = 5
+        smb2.EchoRequest(smb_req)
+        (future,) = conn.submit(smb_req.parent)
+        # queued, found by message id
+        assert cancel(message_id=5) is future
+    assert not conn._queued_mids
+    conn._dispatch_incoming(interim_response(conn, 5, 0x77))
+    assert future.interim_response.async_id == 0x77
+    assert cancel(async_id=0x77, flags=smb2.SMB2_FLAGS_ASYNC_COMMAND) is future
+    future.complete(None)
+
+
+def test_send_credit_gating(local_conn):
+    import pike.smb2 as smb2
+
+    conn, server = local_conn
+    conn.credits = 1
+    futures = [echo(conn) for _ in range(3)]
+    assert read_requests(server, 1)[0][0] == smb2.SMB2_ECHO
+    stats = conn.send_queue_stats()
+    assert stats["queued"] == 2
+    assert stats["credit_stalls"] == 1
+    # cancels are not charged credits and are not held
+    smb_req = conn.request()
+    smb_req.message_id = futures[0].request.message_id
+    smb2.Cancel(smb_req)
+    conn.submit(smb_req.parent)
+    assert read_requests(server, 1)[0][0] == smb2.SMB2_CANCEL
+    # an interim response grants one credit, which releases one request
+    conn._dispatch_incoming(interim_response(conn, smb_req.message_id, 0x10))
+    assert read_requests(server, 1)[0][2] == futures[1].request.message_id
+    assert conn.send_queue_stats()["queued"] == 1
+    assert futures[2].request.message_id is None
@@ -8,10 +8,13 @@ from __future__ import unicode_literals
 from builtins import str
 
 import array
+import collections
 
 import pytest
 
+import pike.core
 import pike.model
+import pike.netbios
 import pike.smb2
 
 
@@ -67,3 +70,119 @@ def test_write_request_buffer_type(mock_chan, buf, expected_exception, recwarn):
         assert write_req.buffer == buf
     except expected_exception:
         pass
+
+
+def write_packet(buf, flags=0):
+    nb = pike.netbios.Netbios()
+    smb_req = pike.smb2.Smb2(nb)
+    smb_req.credit_charge = 1
+    smb_req.credit_request = 1
+    smb_req.message_id = 7
+    smb_req.flags = flags
+    write_req = pike.smb2.WriteRequest(smb_req)
+    write_req.file_id = (1, 2)
+    write_req.buffer = buf
+    return nb
+
+
+def test_write_segments_reference_payload():
+    payload = bytearray(b"\xa5" * 8192)
+    segments = write_packet(payload).serialize_segments()
+    assert len(segments) == 2
+    expected = write_packet(payload).serialize().tobytes()
+    assert b"".join(seg.tobytes() for seg in segments) == expected
+    # the payload segment is a view, not a copy
+    payload[0] = 0
+    assert segments[1].tobytes()[:1] == b"\0"
+
+
+def test_write_segments_signed_not_detached():
+    nb = write_packet(b"\xa5" * 16, flags=pike.smb2.SMB2_FLAGS_SIGNED)
+    nb[0].signature = array.array("B", b"\0" * 16)
+    segments = nb.serialize_segments()
+    assert len(segments) == 1
+
+
+class MockConnection(pike.model.Connection):
+    """Connection that records what would be written to the socket"""
+
+    def __init__(self, packets, chunk):
+        self.callbacks = {}
+        self.client = None
+        self._out_queue = list(packets)
+        self._out_buffer = collections.deque()
+        self._out_frames = collections.deque()
+        self._out_pending = 0
+        self._buffer_pool = pike.core.BufferPool()
+        self.send_buffer_size = 262144
+        self.chunk = chunk
+        self.wire = bytearray()
+        self.calls = []
+
+    def _prepare_outgoing(self):
+        if not self._out_queue:
+            return None
+        nb = self._out_queue.pop(0)
+        return nb, nb.serialize_segments(self._buffer_pool)
+
+    def send(self, data):
+        return self.sendmsg([data])
+
+    def sendmsg(self, buffers):
+        # Accept at most `chunk` bytes per call
+        self.calls.append(len(buffers))
+        budget = self.chunk
+        for buf in buffers:
+            take = buf[:budget].tobytes()
+            self.wire.extend(take)
+            budget -= len(take)
+            if not budget:
+                break
+        return self.chunk - budget
+
+
+@pytest.mark.parametrize("chunk", (7, 4096, 1 << 20))
+def test_handle_write_partial_sends(chunk):
+    payloads = [b"\x01" * 5000, b"\x02" * 300]
+    conn = MockConnection([write_packet(p) for p in payloads], chunk)
+    conn.handle_write()
+    expected = b"".join(write_packet(p).serialize().tobytes() for p in payloads)
+    assert bytes(conn.wire) == expected
+    assert not conn._out_buffer
+    assert not conn._out_frames
+    assert conn._out_pending == 0
+    # Header buffers are recycled once sent
+    assert sum(len(b) for b in conn._buffer_pool._free.values()) == 2
+
+
+def test_handle_write_coalesces_frames():
+    packets = [write_packet(b"\x03" * 16) for _ in range(300)]
+    expected = b"".join(nb.serialize().tobytes() for nb in packets)
+    conn = MockConnection(packets, 1 << 20)
+    conn.handle_write()
+    assert bytes(conn.wire) == expected
+    # header and payload of each frame, up to the segment limit per call
+    assert conn.calls == [pike.model._max_send_segments, 88]
+
+
+def test_handle_write_flush_size():
+    packets = [write_packet(b"\x03" * 16) for _ in range(300)]
+    size = len(packets[0].serialize())
+    conn = MockConnection(packets, 1 << 20)
+    conn.send_buffer_size = 100 * size
+    conn.handle_write()
+    assert conn.calls == [200, 200, 200]
+
+
+def test_handle_write_pre_send_buffer():
+    packets = [write_packet(b"\x04" * 16) for _ in range(300)]
+    expected = b"".join(nb.serialize().tobytes() for nb in packets)
+    conn = MockConnection(packets, 4096)
+    offered = []
+    conn.callbacks[pike.model.EV_REQ_PRE_SEND] = [offered.append]
+    conn.handle_write()
+    # one contiguous buffer per send, whether or not frames were coalesced
+    assert len(offered) == len(conn.calls)
+    assert all(type(buf) is array.array for buf in offered)
+    assert offered[0].tobytes() == expected[: len(offered[0])]
+    assert bytes(conn.wire) == expected